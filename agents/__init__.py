@@ -3,7 +3,9 @@ AI Tool Hub - Agents Package
 Contains intelligent agents for model selection and task optimization
 """
 
-from .model_selector import ModelSelector
+from .model_selector import ModelSelector, KnowledgeWatcher, KnowledgeError, model_selector
+from .telemetry import ModelTelemetry, OBJECTIVES
+from .bandit import BanditRouter, compute_reward
 from pathlib import Path
 
 # Ensure knowledge directories exist
@@ -21,4 +23,4 @@ def init_knowledge_dirs():
 # Initialize package
 init_knowledge_dirs()
 
-__all__ = ['ModelSelector'] 
\ No newline at end of file
+__all__ = ['ModelSelector', 'KnowledgeWatcher', 'KnowledgeError', 'model_selector', 'ModelTelemetry', 'OBJECTIVES', 'BanditRouter', 'compute_reward'] 
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""
+Bandit Router
+Thompson sampling or UCB exploration over the candidate models of each tool and provider
+"""
+import os
+import math
+import random
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+
+from .model_selector import ModelSelector, model_selector, normalize_tool_type
+
+logger = logging.getLogger("bandit_router")
+
+ALGORITHMS = ("thompson", "ucb")
+
+
+def compute_reward(success: bool,
+                   latency: Optional[float],
+                   latency_target: float = 10.0,
+                   regenerated: bool = False,
+                   rating: Optional[float] = None,
+                   weights: Tuple[float, float, float] = (0.5, 0.3, 0.2)) -> float:
+    """
+    Score one generation between 0 and 1
+
+    Failures score 0. Otherwise the success, latency and user-signal terms
+    are mixed by weights. Latency scores 0.5 at the target and approaches 1
+    as the call gets faster. A 1-5 rating is used when there is one;
+    otherwise a re-generation counts as an unhappy user.
+
+    Args:
+        success: Whether the generation succeeded
+        latency: Response time in seconds
+        latency_target: Response time that scores half the latency term
+        regenerated: Whether the user asked again straight afterwards
+        rating: Optional 1-5 user rating
+        weights: (success, latency, user signal) weights summing to 1
+
+    Returns:
+        Reward between 0 and 1
+    """
+    if not success:
+        return 0.0
+    success_weight, latency_weight, user_weight = weights
+    latency_score = latency_target / (latency_target + latency) if latency is not None and latency >= 0 else 0.5
+    if rating is not None:
+        user_score = (min(max(rating, 1), 5) - 1) / 4
+    else:
+        user_score = 0.0 if regenerated else 1.0
+    return success_weight + latency_weight * latency_score + user_weight * user_score
+
+
+class _Arm:
+    """Reward totals for one candidate model"""
+
+    __slots__ = ("pulls", "reward_sum")
+
+    def __init__(self):
+        self.pulls = 0.0
+        self.reward_sum = 0.0
+
+    def mean(self) -> float:
+        return self.reward_sum / self.pulls if self.pulls else 0.0
+
+
+class BanditRouter:
+    """Explores among each tool's configured models and learns which serves best
+
+    Arms are the distinct models in a tool's optimal_models for a provider.
+    Thompson sampling draws from a Beta posterior over each arm's reward;
+    UCB picks the best mean plus an exploration bonus. With discount below 1
+    older rewards fade, so the router follows models whose behaviour drifts.
+    The router also implements the policy interface of the offline replay
+    evaluator, so it can be scored on recorded traces before it routes traffic.
+    """
+
+    def __init__(self,
+                 selector: Optional[ModelSelector] = None,
+                 algorithm: str = "thompson",
+                 latency_target: float = 10.0,
+                 exploration: float = 1.0,
+                 discount: float = 1.0,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            selector: Model selector whose knowledge supplies the candidates
+            algorithm: "thompson" or "ucb"
+            latency_target: Response time in seconds that scores half the latency reward
+            exploration: UCB exploration coefficient
+            discount: Factor applied to a context's past rewards on every update
+            seed: Optional random seed, for reproducible replays
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown bandit algorithm '{algorithm}', expected one of {ALGORITHMS}")
+        self.selector = selector or model_selector
+        self.algorithm = algorithm
+        self.latency_target = latency_target
+        self.exploration = exploration
+        self.discount = discount
+        self._random = random.Random(seed)
+        self._arms: Dict[Tuple[str, str], Dict[str, _Arm]] = {}
+        self._lock = threading.Lock()
+        self.choices = 0
+        self.updates = 0
+
+    @classmethod
+    def from_env(cls, selector: Optional[ModelSelector] = None) -> "BanditRouter":
+        return cls(
+            selector=selector,
+            algorithm=os.getenv("BANDIT_ALGORITHM", "thompson"),
+            latency_target=float(os.getenv("BANDIT_LATENCY_TARGET", "10")),
+            exploration=float(os.getenv("BANDIT_EXPLORATION", "1.0")),
+            discount=float(os.getenv("BANDIT_DISCOUNT", "1.0"))
+        )
+
+    def candidates(self, tool_type: str, provider: str, context_length: Optional[int] = None) -> List[str]:
+        """Get the configured models for a tool and provider that fit the context"""
+        knowledge = self.selector.knowledge
+        task_models = knowledge.provider_models.get((normalize_tool_type(tool_type), provider), {})
+        models = list(dict.fromkeys(task_models.values()))
+        if context_length:
+            fitting = [model_id for model_id in models if knowledge.get_model_info(model_id).get("context_length", 0) >= context_length]
+            models = fitting or models
+        return models
+
+    def choose(self, tool_type: str, provider: str, context_length: Optional[int] = None) -> Optional[str]:
+        """
+        Pick the model to try next
+
+        Returns:
+            A candidate model ID, or None if the tool has no models for the provider
+        """
+        models = self.candidates(tool_type, provider, context_length)
+        if not models:
+            return None
+        with self._lock:
+            self.choices += 1
+            arms = self._arms.get((normalize_tool_type(tool_type), provider), {})
+            if self.algorithm == "thompson":
+                # Fractional rewards update a Beta(1, 1) prior as partial successes
+                def score(model_id: str) -> float:
+                    arm = arms.get(model_id) or _Arm()
+                    return self._random.betavariate(1 + arm.reward_sum, 1 + arm.pulls - arm.reward_sum)
+                return max(models, key=score)
+
+            untried = [model_id for model_id in models if model_id not in arms or arms[model_id].pulls <= 0]
+            if untried:
+                return untried[0]
+            total = sum(arms[model_id].pulls for model_id in models)
+            return max(models, key=lambda model_id: (
+                arms[model_id].mean() + self.exploration * math.sqrt(2 * math.log(max(total, 1)) / arms[model_id].pulls)
+            ))
+
+    def update(self, tool_type: str, provider: str, model: str, reward: float):
+        """Credit a model with a reward between 0 and 1"""
+        reward = min(max(reward, 0.0), 1.0)
+        with self._lock:
+            self.updates += 1
+            arms = self._arms.setdefault((normalize_tool_type(tool_type), provider), {})
+            if self.discount < 1.0:
+                for arm in arms.values():
+                    arm.pulls *= self.discount
+                    arm.reward_sum *= self.discount
+            arm = arms.get(model)
+            if arm is None:
+                arm = arms[model] = _Arm()
+            arm.pulls += 1
+            arm.reward_sum += reward
+
+    def record(self,
+               tool_type: str,
+               provider: str,
+               model: str,
+               success: bool,
+               latency: Optional[float],
+               regenerated: bool = False,
+               rating: Optional[float] = None) -> float:
+        """
+        Score a finished generation and credit the model with it
+
+        Returns:
+            The reward that was applied
+        """
+        reward = compute_reward(success, latency, self.latency_target, regenerated, rating)
+        self.update(tool_type, provider, model, reward)
+        return reward
+
+    def stats(self) -> Dict[str, Any]:
+        """Get per-context arm means and pull counts"""
+        with self._lock:
+            return {
+                "algorithm": self.algorithm,
+                "choices": self.choices,
+                "updates": self.updates,
+                "arms": {
+                    f"{tool_type}/{provider}": {
+                        model_id: {"pulls": arm.pulls, "mean_reward": arm.mean()}
+                        for model_id, arm in arms.items()
+                    }
+                    for (tool_type, provider), arms in self._arms.items()
+                }
+            }
@@ -2,32 +2,260 @@
 Model Selector Agent
 Intelligently selects the optimal model for each task based on internal and external knowledge
 """
-import json
 import os
-from typing import Dict, Any, Optional, List, Tuple
+import json
+import time
+import bisect
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple, Callable
 from pathlib import Path
 
+from .telemetry import ModelTelemetry, OBJECTIVES
+
+logger = logging.getLogger("model_selector")
+
+INTERNAL_KNOWLEDGE = "knowledge/internal/tool_capabilities.json"
+EXTERNAL_KNOWLEDGE = "knowledge/external/model_capabilities.json"
+
+# Most memoized selections kept per knowledge version
+SELECTION_CACHE_SIZE = 1024
+
+
+def normalize_tool_type(tool_type: str) -> str:
+    """Knowledge keys use tool IDs ("text-generation"); callers also pass "text_generation\""""
+    return tool_type.replace("_", "-")
+
+
+class KnowledgeError(ValueError):
+    """Raised when a knowledge file cannot be read or fails validation"""
+
+
+def _expect(condition: bool, path: str, message: str):
+    if not condition:
+        raise KnowledgeError(f"{path}: {message}")
+
+
+def validate_internal_knowledge(data: Any):
+    """Check tool_capabilities.json has the shape the compiler relies on"""
+    _expect(isinstance(data, dict), "tool_capabilities", "must be an object")
+    for tool_type, tool_info in data.items():
+        path = f"tool_capabilities.{tool_type}"
+        _expect(isinstance(tool_info, dict), path, "must be an object")
+        optimal_models = tool_info.get("optimal_models", {})
+        _expect(isinstance(optimal_models, dict), f"{path}.optimal_models", "must be an object")
+        for provider, task_models in optimal_models.items():
+            provider_path = f"{path}.optimal_models.{provider}"
+            _expect(isinstance(task_models, dict), provider_path, "must be an object")
+            _expect("default" in task_models, provider_path, "needs a default model")
+            for task_type, model_id in task_models.items():
+                _expect(isinstance(model_id, str) and bool(model_id), f"{provider_path}.{task_type}", "must be a model ID")
+        for key in ("best_providers", "capabilities"):
+            _expect(isinstance(tool_info.get(key, []), list), f"{path}.{key}", "must be a list")
+
+
+def validate_external_knowledge(data: Any):
+    """Check model_capabilities.json has the shape the compiler relies on"""
+    _expect(isinstance(data, dict), "model_capabilities", "must be an object")
+    for section in ("language_models", "image_models"):
+        models = data.get(section, {})
+        _expect(isinstance(models, dict), f"model_capabilities.{section}", "must be an object")
+        for name, info in models.items():
+            path = f"model_capabilities.{section}.{name}"
+            _expect(isinstance(info, dict), path, "must be an object")
+            context_length = info.get("context_length", 0)
+            _expect(isinstance(context_length, int) and context_length >= 0, f"{path}.context_length", "must be a non-negative integer")
+            _expect(isinstance(info.get("capabilities", []), list), f"{path}.capabilities", "must be a list")
+            cost = info.get("cost_per_1k_tokens")
+            _expect(cost is None or (isinstance(cost, (int, float)) and cost >= 0), f"{path}.cost_per_1k_tokens", "must be a non-negative number")
+
+
+def context_bucket(context_length: Optional[int]) -> Optional[int]:
+    """Round a context requirement up to a power of two so similar requests share a selection"""
+    if not context_length:
+        return None
+    return 1 << (int(context_length) - 1).bit_length()
+
+
+class CompiledKnowledge:
+    """Both knowledge files flattened into lookup tables
+
+    Built once per load so selection never walks the raw JSON:
+    (tool_type, provider, task_type) -> model_id, model_id and base name ->
+    model_info, and each tool/provider's models sorted by context length.
+    """
+
+    def __init__(self, internal: Dict[str, Any], external: Dict[str, Any], version: str = "empty"):
+        self.internal = internal
+        self.external = external
+        self.version = version
+        self.loaded_at = time.time()
+        self.signatures: Dict[str, Optional[Tuple[int, int]]] = {}
+
+        # Base name -> info; language models win over image models of the same name
+        self.base_info: Dict[str, Dict[str, Any]] = {}
+        for section in ("image_models", "language_models"):
+            self.base_info.update(external.get(section, {}))
+
+        self.models: Dict[Tuple[str, str, str], str] = {}
+        self.provider_models: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self.model_info: Dict[str, Dict[str, Any]] = {}
+        self.by_context: Dict[Tuple[str, str], Tuple[List[int], List[str]]] = {}
+        self.best_providers: Dict[str, List[str]] = {}
+        self.provider_index: Dict[str, List[Tuple[str, str]]] = {}
+        # Memoized selections live and die with the tables they were computed from
+        self.selections: "OrderedDict[Tuple, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+
+        for tool_type, tool_info in internal.items():
+            tool_type = normalize_tool_type(tool_type)
+            self.best_providers[tool_type] = tool_info.get("best_providers", [])
+            for provider, task_models in tool_info.get("optimal_models", {}).items():
+                self.provider_models[(tool_type, provider)] = task_models
+                for task_type, model_id in task_models.items():
+                    self.models[(tool_type, provider, task_type)] = model_id
+                    if model_id not in self.model_info:
+                        self.model_info[model_id] = self.base_info.get(model_id.split("/")[-1], {})
+                    pairs = self.provider_index.setdefault(provider, [])
+                    if (tool_type, model_id) not in pairs:
+                        pairs.append((tool_type, model_id))
+
+                ranked = sorted(
+                    (self.model_info[model_id].get("context_length", 0), model_id)
+                    for model_id in dict.fromkeys(task_models.values())
+                )
+                self.by_context[(tool_type, provider)] = (
+                    [length for length, _ in ranked],
+                    [model_id for _, model_id in ranked]
+                )
+
+    def get_model_info(self, model_id: str) -> Dict[str, Any]:
+        info = self.model_info.get(model_id)
+        if info is None:
+            # Models outside the internal knowledge, e.g. chosen by hand
+            info = self.base_info.get(model_id.split("/")[-1], {})
+        return info
+
+
 class ModelSelector:
-    def __init__(self):
+    def __init__(self,
+                 warmth: Optional[Callable[[str], Optional[bool]]] = None,
+                 telemetry: Optional[ModelTelemetry] = None):
+        """
+        Args:
+            warmth: Optional lookup returning True (loaded), False (cold-starting) or None (unknown) for a model
+            telemetry: Optional live call statistics used by objective-driven selection
+        """
+        self.warmth = warmth
+        self.telemetry = telemetry
+        # tool_type -> {"kept": n, "switched": n} for objective-driven selections
+        self.objective_choices: Dict[str, Dict[str, int]] = {}
+        # (tool_type, provider) pairs already warned about having no candidates for their objective
+        self._objective_unavailable: set = set()
         self.base_path = Path(__file__).parent
-        self.internal_knowledge = self._load_json("knowledge/internal/tool_capabilities.json")
-        self.external_knowledge = self._load_json("knowledge/external/model_capabilities.json")
+        self.cache_size = SELECTION_CACHE_SIZE
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.reloads = 0
+        self.reload_failures = 0
+        self.last_error: Optional[str] = None
+        try:
+            self.knowledge = self._compile()
+        except KnowledgeError as e:
+            logger.error(f"Starting without model knowledge: {e}")
+            self.last_error = str(e)
+            self.knowledge = CompiledKnowledge({}, {})
+            self.knowledge.signatures = self._file_signatures()
+        self._seen_signatures = self.knowledge.signatures
+    
+    def _file_signatures(self) -> Dict[str, Optional[Tuple[int, int]]]:
+        """(mtime, size) of each knowledge file, None if missing"""
+        signatures = {}
+        for relative_path in (INTERNAL_KNOWLEDGE, EXTERNAL_KNOWLEDGE):
+            try:
+                stat = (self.base_path / relative_path).stat()
+                signatures[relative_path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signatures[relative_path] = None
+        return signatures
+    
+    def _read_json(self, relative_path: str) -> Tuple[Any, bytes]:
+        """Read a knowledge file, returning the parsed JSON and the raw bytes"""
+        try:
+            raw = (self.base_path / relative_path).read_bytes()
+            return json.loads(raw), raw
+        except (OSError, ValueError) as e:
+            raise KnowledgeError(f"{relative_path}: {e}")
+    
+    def _compile(self) -> CompiledKnowledge:
+        """
+        Read, validate and compile both knowledge files
         
-    def _load_json(self, relative_path: str) -> Dict[str, Any]:
-        """Load JSON knowledge file"""
-        file_path = self.base_path / relative_path
+        Raises:
+            KnowledgeError: If either file cannot be read or is invalid
+        """
+        signatures = self._file_signatures()
+        internal, internal_raw = self._read_json(INTERNAL_KNOWLEDGE)
+        external, external_raw = self._read_json(EXTERNAL_KNOWLEDGE)
+        validate_internal_knowledge(internal)
+        validate_external_knowledge(external)
+        
+        version = hashlib.sha256(internal_raw + b"\0" + external_raw).hexdigest()[:12]
+        knowledge = CompiledKnowledge(internal, external, version)
+        knowledge.signatures = signatures
+        return knowledge
+    
+    def files_changed(self) -> bool:
+        """Whether either knowledge file changed since it was last loaded or rejected"""
+        return self._file_signatures() != self._seen_signatures
+    
+    def reload(self) -> bool:
+        """
+        Re-read the knowledge files and swap them in if they are valid
+        
+        The new tables, and with them an empty selection cache, replace the old
+        ones in a single assignment. An invalid file never replaces a good one.
+        
+        Returns:
+            True if new knowledge is active, False if it was rejected
+        """
         try:
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading {relative_path}: {e}")
-            return {}
+            knowledge = self._compile()
+        except KnowledgeError as e:
+            # Do not retry the same broken files on every poll
+            self._seen_signatures = self._file_signatures()
+            self.reload_failures += 1
+            self.last_error = str(e)
+            logger.error(f"Keeping model knowledge {self.knowledge.version}: {e}")
+            return False
+        
+        self.knowledge = knowledge
+        self._seen_signatures = knowledge.signatures
+        self.reloads += 1
+        self.invalidations += 1
+        self.last_error = None
+        logger.info(f"Loaded model knowledge {knowledge.version}")
+        return True
+
+    @property
+    def internal_knowledge(self) -> Dict[str, Any]:
+        return self.knowledge.internal
+
+    @property
+    def external_knowledge(self) -> Dict[str, Any]:
+        return self.knowledge.external
 
     def select_model(self, 
                     tool_type: str, 
                     provider: str, 
                     task_type: Optional[str] = None,
-                    context_length: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+                    context_length: Optional[int] = None,
+                    objective: Optional[str] = None,
+                    latency_slo: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
         """
         Select the optimal model based on tool type, provider, and requirements
         
@@ -36,35 +264,157 @@ class ModelSelector:
             provider: Provider name (e.g., "openai", "openrouter")
             task_type: Specific type of task (e.g., "creative", "technical")
             context_length: Required context length if any
+            objective: Optional "fastest", "cheapest" or "quality" to weigh in live telemetry
+            latency_slo: Latency target in seconds for the "quality" objective
             
         Returns:
             Tuple of (selected_model_id, model_info)
         """
-        # Get tool-specific knowledge
-        tool_info = self.internal_knowledge.get(tool_type, {})
-        if not tool_info:
-            return self._get_fallback_model(provider), {}
-            
-        # Get optimal models for this tool and provider
-        provider_models = tool_info.get("optimal_models", {}).get(provider, {})
-        if not provider_models:
-            return self._get_fallback_model(provider), {}
-            
+        knowledge = self.knowledge
+        tool_type = normalize_tool_type(tool_type)
+        key = (tool_type, provider, task_type, context_bucket(context_length))
+        
+        with self._lock:
+            selection = knowledge.selections.get(key)
+            if selection is not None:
+                knowledge.selections.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        
+        if selection is None:
+            selection = self._select(knowledge, *key)
+            with self._lock:
+                knowledge.selections[key] = selection
+                while len(knowledge.selections) > self.cache_size:
+                    knowledge.selections.popitem(last=False)
+        
+        model_id, model_info = selection
+        
+        # Prefer a loaded model over one that is cold-starting; warmth changes too often to memoize
+        if self.warmth is not None and self.warmth(model_id) is False:
+            warm_model = self._find_warm_model(knowledge.provider_models.get((tool_type, provider), {}), model_id, context_length)
+            if warm_model:
+                model_id = warm_model
+                model_info = knowledge.get_model_info(model_id)
+        
+        if objective and self.telemetry is not None and (tool_type, provider) not in knowledge.provider_models:
+            if (tool_type, provider) not in self._objective_unavailable:
+                self._objective_unavailable.add((tool_type, provider))
+                logger.warning(
+                    f"Objective '{objective}' for {tool_type}/{provider} ignored: "
+                    f"no candidate models in {INTERNAL_KNOWLEDGE}"
+                )
+        elif objective and self.telemetry is not None:
+            chosen, reason = self._apply_objective(knowledge, tool_type, provider, model_id, context_length, objective, latency_slo)
+            with self._lock:
+                counts = self.objective_choices.setdefault(tool_type, {"kept": 0, "switched": 0})
+                counts["kept" if chosen == model_id else "switched"] += 1
+            logger.info(f"Selected {chosen} for {tool_type}/{provider} ({objective}): {reason}")
+            if chosen != model_id:
+                model_id = chosen
+                model_info = knowledge.get_model_info(model_id)
+        
+        return model_id, model_info
+    
+    def _apply_objective(self,
+                         knowledge: CompiledKnowledge,
+                         tool_type: str,
+                         provider: str,
+                         preferred: str,
+                         context_length: Optional[int],
+                         objective: str,
+                         latency_slo: Optional[float]) -> Tuple[str, str]:
+        """Weigh the statically preferred model against its alternatives using live telemetry
+        
+        Candidates are the tool's configured models for the provider, in
+        preference order, minus those known to be too small for the context
+        or known to be cold. Models erroring above the telemetry threshold are dropped
+        whenever something healthier remains.
+        
+        Returns:
+            Tuple of (model_id, reason)
+        """
+        if objective not in OBJECTIVES:
+            return preferred, f"unknown objective '{objective}'"
+        
+        candidates = [preferred]
+        for model_id in knowledge.provider_models[(tool_type, provider)].values():
+            if model_id in candidates:
+                continue
+            # Only a known context length can rule a model out; most configured models have none recorded
+            known_length = knowledge.get_model_info(model_id).get("context_length", 0)
+            if context_length and 0 < known_length < context_length:
+                continue
+            if self.warmth is not None and self.warmth(model_id) is False:
+                continue
+            candidates.append(model_id)
+        
+        telemetry = self.telemetry
+        observed = {model_id: telemetry.get(provider, model_id) for model_id in candidates}
+        healthy = [model_id for model_id in candidates if telemetry.healthy(observed[model_id])]
+        if not healthy:
+            return preferred, "every candidate is erroring"
+        measured = [model_id for model_id in healthy if observed[model_id] is not None and observed[model_id].latency is not None]
+        
+        def describe(model_id: str) -> str:
+            stats = observed[model_id]
+            if stats is None or stats.latency is None:
+                return "no telemetry yet"
+            throughput = f", {stats.tokens_per_sec:.1f} tok/s" if stats.tokens_per_sec else ""
+            return f"{stats.latency:.2f}s EWMA{throughput}, {stats.error_rate:.0%} errors"
+        
+        if objective == "fastest":
+            if not measured:
+                return healthy[0], "no telemetry yet, using static preference"
+            chosen = min(measured, key=lambda model_id: observed[model_id].latency)
+            return chosen, f"fastest healthy model ({describe(chosen)})"
+        
+        if objective == "cheapest":
+            priced = [model_id for model_id in healthy if knowledge.get_model_info(model_id).get("cost_per_1k_tokens") is not None]
+            if not priced:
+                return healthy[0], "no cost data, using static preference"
+            chosen = min(priced, key=lambda model_id: (
+                knowledge.get_model_info(model_id)["cost_per_1k_tokens"],
+                observed[model_id].latency if observed[model_id] and observed[model_id].latency is not None else float("inf")
+            ))
+            return chosen, f"cheapest healthy model (${knowledge.get_model_info(chosen)['cost_per_1k_tokens']}/1k tokens, {describe(chosen)})"
+        
+        # "quality": the highest-preference healthy model that keeps within the SLO
+        for model_id in healthy:
+            stats = observed[model_id]
+            if latency_slo is None or stats is None or stats.latency is None or stats.latency <= latency_slo:
+                reason = "preferred model" if model_id == preferred else "best-ranked healthy model"
+                if latency_slo is not None:
+                    reason += f" within {latency_slo}s SLO"
+                return model_id, f"{reason} ({describe(model_id)})"
+        chosen = min(measured, key=lambda model_id: observed[model_id].latency)
+        return chosen, f"no model within {latency_slo}s SLO, using fastest ({describe(chosen)})"
+    
+    def _select(self,
+                knowledge: CompiledKnowledge,
+                tool_type: str,
+                provider: str,
+                task_type: Optional[str],
+                context_length: Optional[int]) -> Tuple[str, Dict[str, Any]]:
+        """Pick a model from the knowledge tables alone"""
         # Select model based on task type
-        model_id = provider_models.get(task_type or "default", provider_models.get("default"))
+        model_id = knowledge.models.get((tool_type, provider, task_type or "default"))
+        if not model_id:
+            model_id = knowledge.models.get((tool_type, provider, "default"))
         if not model_id:
             return self._get_fallback_model(provider), {}
             
         # Get external knowledge about the model
-        model_info = self._get_model_info(model_id)
+        model_info = knowledge.get_model_info(model_id)
         
         # Validate context length requirement if specified
         if context_length and model_info.get("context_length", 0) < context_length:
             # Try to find a model with sufficient context length
-            alt_model = self._find_model_with_context(provider_models, context_length)
+            alt_model = self._find_model_with_context(knowledge, tool_type, provider, context_length)
             if alt_model:
                 model_id = alt_model
-                model_info = self._get_model_info(model_id)
+                model_info = knowledge.get_model_info(model_id)
         
         return model_id, model_info
     
@@ -78,31 +428,35 @@ class ModelSelector:
         }
         return fallbacks.get(provider, "gpt-3.5-turbo")
     
+    def get_fallback_model(self, tool_type: str, provider: str) -> str:
+        """Get the configured fallback model for a tool and provider"""
+        model_id = self.knowledge.models.get((normalize_tool_type(tool_type), provider, "fallback"))
+        return model_id or self._get_fallback_model(provider)
+    
     def _get_model_info(self, model_id: str) -> Dict[str, Any]:
         """Get external knowledge about a model"""
-        # Extract base model name from full path if needed
-        base_name = model_id.split('/')[-1]
-        
-        # Check language models
-        model_info = self.external_knowledge.get("language_models", {}).get(base_name, {})
-        if model_info:
-            return model_info
-            
-        # Check image models
-        model_info = self.external_knowledge.get("image_models", {}).get(base_name, {})
-        if model_info:
-            return model_info
-            
-        return {}
-    
-    def _find_model_with_context(self, provider_models: Dict[str, str], required_length: int) -> Optional[str]:
-        """Find a model that satisfies the context length requirement"""
-        for model_id in provider_models.values():
-            model_info = self._get_model_info(model_id)
-            if model_info.get("context_length", 0) >= required_length:
-                return model_id
+        return self.knowledge.get_model_info(model_id)
+    
+    def _find_model_with_context(self, knowledge: CompiledKnowledge, tool_type: str, provider: str, required_length: int) -> Optional[str]:
+        """Find the configured model with the smallest context length that satisfies the requirement"""
+        lengths, model_ids = knowledge.by_context.get((tool_type, provider), ([], []))
+        index = bisect.bisect_left(lengths, required_length)
+        return model_ids[index] if index < len(model_ids) else None
+    
+    def _find_warm_model(self, provider_models: Dict[str, str], cold_model: str, required_length: Optional[int]) -> Optional[str]:
+        """Find another configured model that is known to be loaded"""
+        for model_id in dict.fromkeys(provider_models.values()):
+            if model_id == cold_model or not self.warmth(model_id):
+                continue
+            if required_length and self._get_model_info(model_id).get("context_length", 0) < required_length:
+                continue
+            return model_id
         return None
     
+    def get_provider_models(self, provider: str) -> List[Tuple[str, str]]:
+        """Get every (tool_type, model_id) configured for a provider"""
+        return list(self.knowledge.provider_index.get(provider, []))
+    
     def get_model_capabilities(self, model_id: str) -> List[str]:
         """Get the capabilities of a specific model"""
         model_info = self._get_model_info(model_id)
@@ -110,5 +464,91 @@ class ModelSelector:
     
     def get_recommended_providers(self, tool_type: str) -> List[str]:
         """Get recommended providers for a tool type"""
-        tool_info = self.internal_knowledge.get(tool_type, {})
-        return tool_info.get("best_providers", []) 
\ No newline at end of file
+        return self.knowledge.best_providers.get(normalize_tool_type(tool_type), [])
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get memoization counters"""
+        lookups = self.hits + self.misses
+        return {
+            "cached_selections": len(self.knowledge.selections),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "objective_choices": {tool_type: dict(counts) for tool_type, counts in self.objective_choices.items()}
+        }
+    
+    def version_info(self) -> Dict[str, Any]:
+        """Describe the active knowledge and recent reloads"""
+        knowledge = self.knowledge
+        return {
+            "version": knowledge.version,
+            "loaded_at": knowledge.loaded_at,
+            "tool_types": len(knowledge.best_providers),
+            "models": len(knowledge.model_info),
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+            "last_error": self.last_error
+        }
+
+
+class KnowledgeWatcher:
+    """Polls the knowledge files and reloads the selector when they change
+
+    Reading, validating and compiling run in a worker thread, so requests
+    keep using the current tables until the new ones are swapped in.
+    """
+
+    def __init__(self, selector: ModelSelector, interval: float = 5.0):
+        """
+        Args:
+            selector: Selector to reload
+            interval: Seconds between checks of the files' mtime and size
+        """
+        self.selector = selector
+        self.interval = interval
+        self.checks = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, selector: ModelSelector) -> "KnowledgeWatcher":
+        """Build a watcher configured from KNOWLEDGE_RELOAD_INTERVAL"""
+        return cls(selector, interval=float(os.getenv("KNOWLEDGE_RELOAD_INTERVAL", "5")))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            self.checks += 1
+            try:
+                if self.selector.files_changed():
+                    await loop.run_in_executor(None, self.selector.reload)
+            except Exception as e:
+                logger.error(f"Knowledge reload check failed: {e}")
+
+    def start(self):
+        """Start watching in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Stop the background task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "checks": self.checks
+        }
+
+
+# Shared by every tool and the app, so the knowledge files are loaded and compiled once
+model_selector = ModelSelector()
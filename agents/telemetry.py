@@ -0,0 +1,116 @@
+"""
+Model Telemetry
+Live per-(provider, model) latency, throughput, error rate and cost used to steer model selection
+"""
+import os
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+# Selection objectives a tool can ask for
+OBJECTIVES = ("fastest", "cheapest", "quality")
+
+
+class ModelStats:
+    """Exponentially weighted averages for one provider/model pair"""
+
+    __slots__ = ("latency", "tokens_per_sec", "error_rate", "samples", "failures", "tokens")
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.tokens_per_sec: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.failures = 0
+        self.tokens = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency,
+            "tokens_per_sec": self.tokens_per_sec,
+            "error_rate": self.error_rate,
+            "samples": self.samples,
+            "failures": self.failures,
+            "tokens": self.tokens
+        }
+
+
+def _ewma(current: Optional[float], value: float, alpha: float) -> float:
+    return value if current is None else current + alpha * (value - current)
+
+
+class ModelTelemetry:
+    """Rolling call statistics per (provider, model)
+
+    The dispatcher records every provider attempt here; the model selector
+    reads it to trade the static preferences off against how each model is
+    actually behaving. Latency and throughput only average successful calls,
+    while the error rate averages every attempt.
+    """
+
+    def __init__(self, alpha: float = 0.2, min_samples: int = 5, max_error_rate: float = 0.25):
+        """
+        Args:
+            alpha: EWMA weight of the newest observation
+            min_samples: Calls needed before a model's numbers are trusted
+            max_error_rate: Error rate above which a model is avoided when alternatives exist
+        """
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self._stats: Dict[Tuple[str, str], ModelStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ModelTelemetry":
+        return cls(
+            alpha=float(os.getenv("MODEL_TELEMETRY_ALPHA", "0.2")),
+            min_samples=int(os.getenv("MODEL_TELEMETRY_MIN_SAMPLES", "5")),
+            max_error_rate=float(os.getenv("MODEL_TELEMETRY_MAX_ERROR_RATE", "0.25"))
+        )
+
+    def record(self,
+               provider: str,
+               model: str,
+               success: bool,
+               latency: float,
+               completion_tokens: Optional[int] = None):
+        """
+        Record one provider attempt
+
+        Args:
+            provider: Provider name
+            model: Model ID that was called
+            success: Whether the call succeeded
+            latency: Call duration in seconds
+            completion_tokens: Generated tokens, if the provider reported them
+        """
+        with self._lock:
+            stats = self._stats.get((provider, model))
+            if stats is None:
+                stats = self._stats[(provider, model)] = ModelStats()
+            stats.samples += 1
+            stats.error_rate = _ewma(stats.error_rate if stats.samples > 1 else None, 0.0 if success else 1.0, self.alpha)
+            if not success:
+                stats.failures += 1
+                return
+            stats.latency = _ewma(stats.latency, latency, self.alpha)
+            if completion_tokens:
+                stats.tokens += completion_tokens
+                if latency > 0:
+                    stats.tokens_per_sec = _ewma(stats.tokens_per_sec, completion_tokens / latency, self.alpha)
+
+    def get(self, provider: str, model: str) -> Optional[ModelStats]:
+        """Get a model's statistics once it has enough samples to be trusted"""
+        stats = self._stats.get((provider, model))
+        if stats is None or stats.samples < self.min_samples:
+            return None
+        return stats
+
+    def healthy(self, stats: Optional[ModelStats]) -> bool:
+        """Unobserved models count as healthy until they prove otherwise"""
+        return stats is None or stats.error_rate <= self.max_error_rate
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get the current averages for every provider/model pair"""
+        with self._lock:
+            return {f"{provider}/{model}": stats.to_dict() for (provider, model), stats in self._stats.items()}
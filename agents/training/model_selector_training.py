@@ -1,15 +1,78 @@
 """
 Training module for the Model Selector Agent
 """
+import sys
 import json
 import random
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, Union
 from pathlib import Path
-from ..model_selector import ModelSelector
+from ..model_selector import model_selector, normalize_tool_type
+from ..bandit import BanditRouter, compute_reward
+
+# Log event written by the app for every generation (LOG_FORMAT=json makes it one JSON line)
+TRACE_EVENT = "generation.trace"
+
+# A repeat of the same tool by the same user within this many seconds counts as a re-generation
+REGENERATION_WINDOW = 120.0
+
+
+def load_traces(path: Union[str, Path], regeneration_window: float = REGENERATION_WINDOW) -> List[Dict[str, Any]]:
+    """
+    Load recorded generation traces from a JSON-lines file
+
+    Accepts the app's JSON log output, keeping only generation.trace events,
+    or bare trace objects with at least tool_type, provider and model.
+    Cached results are dropped since no model was called for them. Traces
+    are ordered by time and marked regenerated when the same user ran the
+    same tool again shortly afterwards.
+    """
+    traces = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(record, dict) or record.get("event", TRACE_EVENT) != TRACE_EVENT:
+                continue
+            if not all(record.get(key) for key in ("tool_type", "provider", "model")) or record.get("cached"):
+                continue
+            traces.append(record)
+    
+    traces.sort(key=lambda trace: trace.get("ts", 0))
+    last_seen: Dict[Tuple[Any, str], Dict[str, Any]] = {}
+    for trace in traces:
+        trace.setdefault("regenerated", False)
+        user_id = trace.get("user_id")
+        if user_id is None or "ts" not in trace:
+            continue
+        key = (user_id, normalize_tool_type(trace["tool_type"]))
+        previous = last_seen.get(key)
+        if previous is not None and trace["ts"] - previous["ts"] <= regeneration_window:
+            previous["regenerated"] = True
+        last_seen[key] = trace
+    return traces
+
+
+class StaticPolicy:
+    """The rule-based selector wrapped in the replay policy interface"""
+
+    def __init__(self, selector=None):
+        self.selector = selector or model_selector
+
+    def choose(self, tool_type: str, provider: str, context_length: Optional[int] = None) -> Optional[str]:
+        model_id, _ = self.selector.select_model(tool_type=tool_type, provider=provider, context_length=context_length)
+        return model_id
+
+    def update(self, tool_type: str, provider: str, model: str, reward: float):
+        pass
 
 class ModelSelectorTrainer:
     def __init__(self):
-        self.model_selector = ModelSelector()
+        self.model_selector = model_selector
         self.training_data_path = Path(__file__).parent / "data"
         self.training_scenarios = self._load_training_scenarios()
         
@@ -165,6 +228,108 @@ class ModelSelectorTrainer:
         
         results["success_rate"] = results["successful"] / results["total_tests"]
         return results
+    
+    def _trace_cost(self, trace: Dict[str, Any]) -> Optional[float]:
+        """Use the recorded cost, else price the tokens from the model knowledge"""
+        if trace.get("cost") is not None:
+            return trace["cost"]
+        price = self.model_selector.knowledge.get_model_info(trace["model"]).get("cost_per_1k_tokens")
+        if price is None or not trace.get("tokens"):
+            return None
+        return trace["tokens"] / 1000 * price
+    
+    def _summarize(self, traces: List[Dict[str, Any]], rewards: List[float]) -> Dict[str, Any]:
+        count = len(traces)
+        latencies = [trace["latency"] for trace in traces if trace.get("success") and trace.get("latency") is not None]
+        costs = [cost for cost in (self._trace_cost(trace) for trace in traces) if cost is not None]
+        return {
+            "traces": count,
+            "avg_reward": sum(rewards) / count if count else 0.0,
+            "success_rate": sum(1 for trace in traces if trace.get("success")) / count if count else 0.0,
+            "avg_latency": sum(latencies) / len(latencies) if latencies else None,
+            "avg_cost": sum(costs) / len(costs) if costs else None
+        }
+    
+    def replay_evaluate(self, policy, traces: List[Dict[str, Any]], latency_target: float = 10.0) -> Dict[str, Any]:
+        """
+        Score a routing policy offline against recorded traces
+        
+        Uses the replay method: the policy picks a model for each trace's
+        tool and provider, and only traces where it agrees with the model
+        that was actually logged count towards its score and are fed back to
+        it. With logs from a policy that explored, this gives an unbiased
+        estimate of how the new policy would have fared. No provider is called.
+        
+        Args:
+            policy: Object with choose(tool_type, provider, context_length) and
+                update(tool_type, provider, model, reward), e.g. a BanditRouter
+            traces: Traces from load_traces, in time order
+            latency_target: Response time that scores half the latency reward
+            
+        Returns:
+            Match rate plus average reward, success rate, latency and cost over matched traces
+        """
+        matched = []
+        rewards = []
+        for trace in traces:
+            chosen = policy.choose(trace["tool_type"], trace["provider"], trace.get("context_length"))
+            if chosen != trace["model"]:
+                continue
+            reward = compute_reward(
+                bool(trace.get("success")),
+                trace.get("latency"),
+                latency_target,
+                trace.get("regenerated", False),
+                trace.get("rating")
+            )
+            policy.update(trace["tool_type"], trace["provider"], trace["model"], reward)
+            matched.append(trace)
+            rewards.append(reward)
+        
+        summary = self._summarize(matched, rewards)
+        summary["matched"] = summary.pop("traces")
+        summary["match_rate"] = len(matched) / len(traces) if traces else 0.0
+        return summary
+    
+    def compare_policies(self,
+                         traces: List[Dict[str, Any]],
+                         policies: Optional[Dict[str, Any]] = None,
+                         latency_target: float = 10.0,
+                         seed: int = 0) -> Dict[str, Any]:
+        """
+        Replay several policies over the same traces and compare them with what was logged
+        
+        Args:
+            traces: Traces from load_traces, in time order
+            policies: Name -> policy; defaults to the static selector, Thompson sampling and UCB
+            latency_target: Response time that scores half the latency reward
+            seed: Random seed for the default bandit policies
+            
+        Returns:
+            The logged baseline and each policy's replay summary, with latency and cost deltas
+        """
+        if policies is None:
+            policies = {
+                "static": StaticPolicy(self.model_selector),
+                "thompson": BanditRouter(self.model_selector, "thompson", latency_target, seed=seed),
+                "ucb": BanditRouter(self.model_selector, "ucb", latency_target, seed=seed)
+            }
+        
+        baseline_rewards = [
+            compute_reward(bool(trace.get("success")), trace.get("latency"), latency_target,
+                           trace.get("regenerated", False), trace.get("rating"))
+            for trace in traces
+        ]
+        baseline = self._summarize(traces, baseline_rewards)
+        
+        results = {"baseline": baseline, "policies": {}}
+        for name, policy in policies.items():
+            summary = self.replay_evaluate(policy, traces, latency_target)
+            for metric in ("avg_latency", "avg_cost"):
+                if summary[metric] is not None and baseline[metric]:
+                    summary[f"{metric}_change"] = (summary[metric] - baseline[metric]) / baseline[metric]
+            results["policies"][name] = summary
+        return results
 
 if __name__ == "__main__":
     # Run training evaluation
@@ -176,4 +341,16 @@ if __name__ == "__main__":
     # Run random tests
     print("\nRunning random tests...")
     test_results = trainer.run_random_tests(num_tests=20)
-    print(f"Random test success rate: {test_results['success_rate']*100:.1f}%") 
\ No newline at end of file
+    print(f"Random test success rate: {test_results['success_rate']*100:.1f}%")
+    
+    # Replay routing policies against recorded traces, if given
+    if len(sys.argv) > 1:
+        traces = load_traces(sys.argv[1])
+        print(f"\nReplaying {len(traces)} traces...")
+        comparison = trainer.compare_policies(traces)
+        print(f"Logged: reward {comparison['baseline']['avg_reward']:.3f}, latency {comparison['baseline']['avg_latency']}")
+        for name, summary in comparison["policies"].items():
+            print(
+                f"{name}: matched {summary['match_rate']*100:.1f}%, reward {summary['avg_reward']:.3f}, "
+                f"latency {summary['avg_latency']}, cost {summary['avg_cost']}"
+            ) 
\ No newline at end of file
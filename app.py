@@ -6,9 +6,12 @@ import os
 import json
 import uuid
 import secrets
+import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Union
+from contextlib import asynccontextmanager
+from collections.abc import Mapping
 import requests
 from pathlib import Path
 
@@ -17,7 +20,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import FastAPI, Request, Response, Depends, HTTPException, Form, Cookie, status
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.security import APIKeyHeader, HTTPBearer, HTTPAuthorizationCredentials
@@ -28,6 +31,12 @@ from sqlalchemy.orm import sessionmaker
 
 # Import provider modules
 from providers import get_provider, HuggingFaceProvider, OpenAIProvider, DeepSeekProvider, OpenRouterProvider
+from providers import ProviderExecutor, ProviderBusyError, provider_registry
+from providers import GenerationDispatcher, ResponseCache, CircuitBreakerBoard, CircuitOpenError
+from providers import Hedger, LatencyTracker, TimeoutManager, DeadlineExceededError, deadline_scope
+from providers import RateLimiter, RetryPolicy, estimate_tokens, PROVIDERS
+from providers import WarmupPinger, model_warmth, JobQueue, ImagePipeline, media_store
+from providers import log_sampler, start_log_queue, stop_log_queue, log_event
 
 # Import prompt modules
 from prompts import PromptTemplate, PromptTemplateManager, PromptMarketplace
@@ -48,12 +57,17 @@ from models import Base, User
 from tools import TOOLS
 
 # Import the model selector
-from agents.model_selector import ModelSelector
+from agents.model_selector import model_selector, KnowledgeWatcher
+from agents.telemetry import ModelTelemetry
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("app")
 
+# Log writes happen on a background thread so they never block request handling
+if os.getenv("LOG_QUEUE_ENABLED", "true").lower() == "true":
+    start_log_queue(json_format=os.getenv("LOG_FORMAT", "text").lower() == "json")
+
 # Get the current directory
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -65,11 +79,33 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create the database tables
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm shared provider instances on startup and release them on shutdown"""
+    await provider_registry.warm()
+    # Only ping Hugging Face models when we can actually call them
+    if os.getenv("WARMUP_ENABLED", "true").lower() == "true" and getattr(get_provider("huggingface"), "api_key", None):
+        warmup_pinger.start()
+    job_queue.start()
+    if os.getenv("KNOWLEDGE_RELOAD_ENABLED", "true").lower() == "true":
+        knowledge_watcher.start()
+    yield
+    await knowledge_watcher.stop()
+    await job_queue.stop()
+    await warmup_pinger.stop()
+    provider_executor.shutdown(wait=False)
+    response_cache.close()
+    job_queue.close()
+    image_pipeline.shutdown()
+    stop_log_queue()
+    await provider_registry.close()
+
 # Create the FastAPI app
 app = FastAPI(
     title="AI Tool Hub",
     description="A platform for using AI models with various tools and prompt templates",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -160,6 +196,24 @@ class ImageGenerateRequest(BaseModel):
     prompt_template_id: Optional[str] = None
     template_variables: Optional[Dict[str, Any]] = None
 
+class BatchGenerateRequest(BaseModel):
+    tool_id: str
+    provider: str
+    model: str = "default"
+    prompts: Optional[List[str]] = None  # Either explicit prompts...
+    prompt_template_id: Optional[str] = None  # ...or a stored or inline template
+    template: Optional[str] = None
+    system_message: Optional[str] = None
+    variables: Optional[List[Dict[str, Any]]] = None  # One rendered prompt per dict
+    max_tokens: Optional[int] = 1000
+    temperature: Optional[float] = 0.7
+
+class JobRequest(BaseModel):
+    tool_id: str
+    prompt: str
+    provider: str
+    model: str = "default"
+
 class UserInfo(BaseModel):
     id: str
     username: str
@@ -393,6 +447,10 @@ def require_session_user(admin_required: bool = False, session_user: Optional[Us
     
     return session_user
 
+def require_admin_user(session_user: Optional[UserInfo] = Depends(get_session_user)) -> UserInfo:
+    """Require a logged-in admin user"""
+    return require_session_user(admin_required=True, session_user=session_user)
+
 def verify_api_key(api_key: str = Depends(api_key_header), 
                  credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserInfo:
     """Verify API key from header or Bearer token"""
@@ -446,8 +504,225 @@ GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
 
-# Initialize model selector
-model_selector = ModelSelector()
+def get_result_type(tool_id: str) -> str:
+    """Determine the kind of output a tool produces from its ID"""
+    if "image" in tool_id or "logo" in tool_id or "avatar" in tool_id:
+        return "image"
+    elif "code" in tool_id or "debugging" in tool_id:
+        return "code"
+    elif "chat" in tool_id:
+        return "chat"
+    return "text"
+
+# The model selector is shared with the tools; prefer Hugging Face models that are already loaded
+model_selector.warmth = model_warmth.is_warm
+
+# Live per-model latency and error rates, fed by the dispatcher, for tools with a selection objective
+model_telemetry = ModelTelemetry.from_env()
+model_selector.telemetry = model_telemetry
+
+# Picks up edits to the model knowledge files without a restart
+knowledge_watcher = KnowledgeWatcher.from_env(model_selector)
+
+# Keeps the Hugging Face models from the tool knowledge base loaded during business hours
+huggingface_models = model_selector.get_provider_models("huggingface")
+warmup_pinger = WarmupPinger.from_env(
+    get_provider("huggingface"),
+    text_models=[model_id for tool_type, model_id in huggingface_models if get_result_type(tool_type) != "image"],
+    image_models=[model_id for tool_type, model_id in huggingface_models if get_result_type(tool_type) == "image"]
+)
+
+# Bounded per-provider execution layer for blocking provider calls
+provider_executor = ProviderExecutor()
+
+# Opt-in cache for repeat generations (see RESPONSE_CACHE_* settings)
+response_cache = ResponseCache.from_env()
+
+# Per (provider, model) latency histograms, shared by hedging and the admin view
+provider_latencies = LatencyTracker()
+
+# Entry point for all non-streaming generations
+dispatcher = GenerationDispatcher(
+    provider_registry,
+    provider_executor,
+    response_cache,
+    coalesce=os.getenv("PROVIDER_COALESCE_ENABLED", "true").lower() == "true",
+    latencies=provider_latencies,
+    breakers=CircuitBreakerBoard.from_env(),
+    hedger=Hedger.from_env(provider_latencies),
+    timeouts=TimeoutManager.from_env(
+        tool_overrides={tool.id: tool.timeout for tool in TOOLS if tool.timeout is not None}
+    ),
+    rate_limiter=RateLimiter.from_env(list(PROVIDERS)),
+    retry_policy=RetryPolicy.from_env(),
+    telemetry=model_telemetry
+)
+
+def get_request_timeout(request: Request) -> Optional[float]:
+    """Get the caller's time budget in seconds from X-Request-Timeout, or the configured default"""
+    value = request.headers.get("X-Request-Timeout") or os.getenv("REQUEST_DEADLINE_SECONDS")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        logger.warning(f"Ignoring invalid request timeout: {value}")
+        return None
+
+# Batch generation limits
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+# Items pay the tool's flat cost, so they get the same output cap as single requests
+BATCH_MAX_TOKENS = 1000
+# Batch items queue behind interactive requests for rate limit budget
+BATCH_PRIORITY = -1.0
+
+def get_request_priority(tool, user: Optional[UserInfo]) -> float:
+    """Priority of a call waiting for rate limit budget: admins first, then costlier tools"""
+    priority = tool.cost
+    if getattr(user, "role", "user") == "admin":
+        priority += 100.0
+    return priority
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format a Server-Sent Event"""
+    message = f"event: {event}\n" if event else ""
+    return f"{message}data: {json.dumps(data)}\n\n"
+
+def find_session_user(user_id: str) -> Optional[UserInfo]:
+    """Find a logged-in user by ID"""
+    for session in SESSIONS.values():
+        if "user" in session and session["user"].id == user_id:
+            return session["user"]
+    return None
+
+# Durable background jobs for generations too slow to hold a request open (see JOB_* settings)
+job_queue = JobQueue.from_env()
+
+# Generated images are written once by content hash to the shared media store and served as cacheable URLs
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Smaller, metadata-free WebP/AVIF variants and thumbnails of generated images (see IMAGE_* settings)
+image_pipeline = ImagePipeline.from_env(media_store)
+
+async def run_generation_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a queued generation, refunding the credits taken at submit if nothing was charged for"""
+    fallbacks = [tuple(candidate) for candidate in params["fallbacks"]]
+    try:
+        if params["result_type"] == "image":
+            result = await dispatcher.generate_image(
+                params["provider"],
+                prompt=params["prompt"],
+                model=params["model"],
+                fallbacks=fallbacks,
+                tool_id=params["tool_id"],
+                priority=params["priority"]
+            )
+        else:
+            result = await dispatcher.generate_text(
+                params["provider"],
+                prompt=params["prompt"],
+                model=params["model"],
+                max_tokens=1000,
+                temperature=0.7,
+                fallbacks=fallbacks,
+                tool_id=params["tool_id"],
+                priority=params["priority"]
+            )
+    except Exception:
+        refund_job_credits(params)
+        raise
+    log_generation_trace(params["tool_id"], params["provider"], params["model"], result, params["user_id"])
+    
+    # Providers report most failures in the result rather than raising; the job must still fail
+    if not result.get("success"):
+        refund_job_credits(params)
+        raise RuntimeError(result.get("error") or "Generation failed")
+    
+    # Same charging rule as synchronous requests: cache hits only when configured
+    if result.get("cached") and not response_cache.charge_hits:
+        refund_job_credits(params)
+    
+    # Store the image as a file so the job row and result page only carry its URL
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, media_store.externalize, result)
+    if result.get("media_path"):
+        result["variants"] = await image_pipeline.process(result["media_path"])
+    return result
+
+def log_generation_trace(tool_id: str, provider: str, model: str, result: Mapping, user_id: str):
+    """Record one generation for offline replay of model routing policies (see agents/training)"""
+    log_event(
+        logger,
+        "generation.trace",
+        tool_type=tool_id,
+        provider=result.get("provider", provider),
+        model=result.get("model", model),
+        success=bool(result.get("success")),
+        latency=result.get("response_time"),
+        tokens=(result.get("tokens") or {}).get("total"),
+        cached=bool(result.get("cached")),
+        user_id=user_id
+    )
+
+def refund_job_credits(params: Dict[str, Any]):
+    """Give back the credits reserved for a job, if its owner is still logged in"""
+    owner = find_session_user(params["user_id"])
+    if owner:
+        owner.credits += params["cost"]
+    else:
+        logger.warning(f"Could not refund {params['cost']} credits to user {params['user_id']}: not logged in")
+
+# Jobs that keep dying mid-run are failed by the queue; give their credits back too
+job_queue.register("generate", run_generation_job, on_abandon=refund_job_credits)
+
+async def submit_generation_job(tool, provider: str, prompt: str, selected_model: str,
+                          model_info: Dict[str, Any], fallbacks: List, user: UserInfo) -> str:
+    """Take the tool's cost from the user and queue the generation, returning the job ID"""
+    user.credits -= tool.cost
+    return await job_queue.asubmit(
+        "generate",
+        {
+            "user_id": user.id,
+            "tool_id": tool.id,
+            "tool_name": tool.name,
+            "result_type": get_result_type(tool.id),
+            "provider": provider,
+            "prompt": prompt,
+            "model": selected_model,
+            "model_capabilities": model_info.get("capabilities", []),
+            "fallbacks": fallbacks,
+            "cost": tool.cost,
+            "priority": get_request_priority(tool, user)
+        },
+        user_id=user.id,
+        priority=get_request_priority(tool, user)
+    )
+
+def format_job_result(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a job and its result for result.html"""
+    params = job["params"]
+    result = job["result"] or {}
+    # Variants are served through /images so each client gets the best format it accepts
+    if result.get("variants"):
+        result = {**result, "image_url": f"/images/{job['id']}/full", "thumbnail_url": f"/images/{job['id']}/history"}
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "type": params["result_type"],
+        "tool_name": params["tool_name"],
+        "tool_id": params["tool_id"],
+        "provider": result.get("provider", params["provider"]),
+        "prompt": params["prompt"],
+        "result": result.get("text", ""),
+        "image_url": result.get("image_url") if params["result_type"] == "image" else None,
+        "thumbnail_url": result.get("thumbnail_url") if params["result_type"] == "image" else None,
+        "image_data": result.get("image_data", "") if params["result_type"] == "image" else None,
+        "response_time": result.get("response_time", 0),
+        "ai_probability": result.get("ai_probability", None),
+        "model_used": result.get("model", params["model"]),
+        "model_capabilities": params["model_capabilities"],
+        "cached": result.get("cached", False),
+        "created_at": datetime.fromtimestamp(job["created_at"]).isoformat()
+    }
 
 # Add error handler for connection reset errors
 @app.middleware("http")
@@ -526,6 +801,7 @@ async def tool_page(
             "has_enough_credits": has_enough_credits,
             "suggestions": suggestions,
             "providers": providers,
+            "supports_streaming": get_result_type(tool.id) != "image",
             "tools": TOOLS  # Include all tools for sidebar navigation
         }
     )
@@ -536,41 +812,73 @@ async def result_page(
     result_id: str,
     session_user: Optional[UserInfo] = Depends(get_session_user)
 ):
-    """Result display page"""
-    # In a real app, you'd fetch the result from a database
-    # Here, we'll use a mock result for demonstration
-    result = {
-        "id": result_id,
-        "type": "text",  # or "image" or "code"
-        "provider": "openai",
-        "model": "gpt-4",
-        "prompt": "Write a short poem about AI",
-        "result": """
-        Silicon dreams in neural space,
-        Learning patterns, quickening pace.
-        Algorithms dance with grace divine,
-        In zeros and ones, intelligence shine.
-        
-        Human-made yet growing beyond,
-        Of our creations, we grow fond.
-        Partners in progress, AI and we,
-        Crafting together what's yet to be.
-        """,
-        "created_at": datetime.now().isoformat(),
-        "response_time": 2.3  # seconds
-    }
+    """Result display page for a background job; shows a waiting state until the job finishes"""
+    job = await job_queue.aget(result_id)
+    
+    # Results are only visible to their owner and to admins
+    if not job or not session_user or (job["user_id"] != session_user.id and getattr(session_user, "role", "") != "admin"):
+        return templates.TemplateResponse(
+            "error.html",
+            {
+                "request": request,
+                "app_name": "AI Tool Hub",
+                "error_title": "Result Not Found",
+                "error_description": "The requested result does not exist.",
+                "user": session_user,
+                "user_credits": session_user.credits if session_user else 0,
+                "tools": TOOLS
+            },
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    
+    if job["status"] == "failed":
+        return templates.TemplateResponse(
+            "error.html",
+            {
+                "request": request,
+                "app_name": "AI Tool Hub",
+                "error_title": "Generation Error",
+                "error_description": f"Error generating content: {job['error']}",
+                "user": session_user,
+                "user_credits": session_user.credits,
+                "tools": TOOLS
+            }
+        )
     
     return templates.TemplateResponse(
         "result.html", 
         {
             "request": request, 
             "app_name": "AI Tool Hub",
-            "result": result,
+            "result": format_job_result(job),
+            "pending": job["status"] in ("queued", "running"),
+            "queue_position": await job_queue.aposition(result_id),
             "user": session_user,
-            "user_credits": session_user.credits if session_user else 0
+            "user_credits": session_user.credits,
+            "tools": TOOLS,
+            "json_data": job["result"] or {}
         }
     )
 
+@app.get("/media/{media_path:path}")
+async def media_file(media_path: str):
+    """Serve a stored image; paths are content hashes, so responses never change"""
+    path = media_store.resolve(media_path)
+    if not path:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+    return FileResponse(path, headers={"Cache-Control": MEDIA_CACHE_CONTROL})
+
+@app.get("/images/{result_id}/{view}")
+async def result_image(request: Request, result_id: str, view: str):
+    """Serve a view of a generated image in the best format the client accepts"""
+    job = await job_queue.aget(result_id)
+    variants = (job["result"] or {}).get("variants") if job else None
+    chosen = image_pipeline.choose(variants, view, request.headers.get("accept", "")) if variants else None
+    path = media_store.resolve(chosen[0]) if chosen else None
+    if not path:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
+    return FileResponse(path, media_type=chosen[1], headers={"Cache-Control": MEDIA_CACHE_CONTROL, "Vary": "Accept"})
+
 @app.get("/marketplace", response_class=HTMLResponse)
 async def marketplace_page(
     request: Request,
@@ -1031,6 +1339,61 @@ async def admin_update_credits(
         }
     )
 
+@app.get("/api/admin/provider-stats")
+async def admin_provider_stats(user: UserInfo = Depends(require_admin_user)):
+    """Admin endpoint reporting provider health, queue depth and throughput"""
+    return JSONResponse(
+        content={
+            "success": True,
+            "providers": provider_registry.health(),
+            "executor": provider_executor.stats(),
+            "cache": response_cache.stats(),
+            "coalescing": dispatcher.singleflight.stats() if dispatcher.singleflight else None,
+            "circuits": dispatcher.breakers.stats(),
+            "latency": dispatcher.latencies.stats(),
+            "hedging": dispatcher.hedger.stats(),
+            "timeouts": dispatcher.timeouts.stats(),
+            "rate_limits": dispatcher.rate_limiter.stats(),
+            "api_keys": dispatcher.key_pools.stats(),
+            "retries": dispatcher.retry_policy.stats(),
+            "warmup": {
+                "models": model_warmth.stats(),
+                "pinger": warmup_pinger.stats()
+            },
+            "jobs": await job_queue.astats(),
+            "media": media_store.stats(),
+            "images": image_pipeline.stats(),
+            "logging": log_sampler.stats(),
+            "model_selector": model_selector.stats(),
+            "model_telemetry": model_telemetry.stats()
+        }
+    )
+
+@app.get("/api/admin/knowledge")
+async def admin_knowledge_version(user: UserInfo = Depends(require_admin_user)):
+    """Admin endpoint reporting the active model knowledge version"""
+    return JSONResponse(
+        content={
+            "success": True,
+            "knowledge": model_selector.version_info(),
+            "watcher": knowledge_watcher.stats()
+        }
+    )
+
+@app.post("/api/admin/knowledge/reload")
+async def admin_reload_knowledge(user: UserInfo = Depends(require_admin_user)):
+    """Admin endpoint forcing a reload of the model knowledge files"""
+    loop = asyncio.get_running_loop()
+    reloaded = await loop.run_in_executor(None, model_selector.reload)
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if reloaded else status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={
+            "success": reloaded,
+            "knowledge": model_selector.version_info(),
+            "error": None if reloaded else model_selector.last_error
+        }
+    )
+
 @app.post("/process-request", response_class=HTMLResponse)
 async def process_request(
     request: Request,
@@ -1131,34 +1494,50 @@ async def process_request(
             tool_type=tool_type,
             provider=provider,
             task_type=model if model != "default" else None,
-            context_length=len(prompt) * 4  # Rough estimate of required context length
+            context_length=len(prompt) * 4,  # Rough estimate of required context length
+            objective=tool.objective,
+            latency_slo=tool.latency_slo
         )
         
         # Log model selection
         logger.info(f"Model selector chose {selected_model} for {tool_id} with provider {provider}")
         logger.info(f"Model capabilities: {model_info.get('capabilities', [])}")
         
-        # Determine result type based on tool ID and model info
-        if "image" in tool_id or "logo" in tool_id or "avatar" in tool_id:
-            result_type = "image"
-        elif "code" in tool_id or "debugging" in tool_id:
-            result_type = "code"
-        elif "chat" in tool_id:
-            result_type = "chat"
+        # Determine result type based on tool ID
+        result_type = get_result_type(tool_id)
+        
+        # Candidates to fail over to if the selected model is failing
+        fallbacks = tool.get_fallback_candidates(
+            provider,
+            selected_model,
+            task_type=model if model != "default" else None,
+            context_length=len(prompt) * 4
+        )
+        
+        # Provider calls must finish within the caller's deadline, if one was given
+        request_timeout = get_request_timeout(request)
         
         # Process the request based on tool type
         try:
             if result_type == "text" or result_type == "chat" or result_type == "code":
-                result = provider_instance.generate_text(
-                    prompt=prompt,
-                    model=selected_model,
-                    max_tokens=1000,
-                    temperature=0.7
-                )
+                with deadline_scope(request_timeout):
+                    result = await dispatcher.generate_text(
+                        provider,
+                        prompt=prompt,
+                        model=selected_model,
+                        max_tokens=1000,
+                        temperature=0.7,
+                        fallbacks=fallbacks,
+                        hedge_group=tool.id if tool.hedge else None,
+                        max_hedge_rate=tool.max_hedge_rate,
+                        tool_id=tool.id,
+                        priority=get_request_priority(tool, session_user)
+                    )
                 
                 logger.info(f"Provider response success: {result.get('success')}")
                 if not result.get('success'):
                     logger.error(f"Provider error: {result.get('error')}")
+                log_generation_trace(tool.id, provider, selected_model, result, session_user.id)
                 
             elif result_type == "image":
                 if not hasattr(provider_instance, 'generate_image'):
@@ -1174,27 +1553,28 @@ async def process_request(
                             "tools": TOOLS
                         }
                     )
-                result = provider_instance.generate_image(
-                    prompt=prompt,
-                    model=selected_model
-                )
+                # Images take long enough to run as a background job; the result page waits for it
+                job_id = await submit_generation_job(tool, provider, prompt, selected_model, model_info, fallbacks, session_user)
+                return RedirectResponse(url=f"/result/{job_id}", status_code=status.HTTP_303_SEE_OTHER)
             
-            # Deduct credits
-            session_user.credits -= tool.cost
+            # Deduct credits; cache hits are only charged when configured to be
+            if not result.get("cached") or response_cache.charge_hits:
+                session_user.credits -= tool.cost
             
             # Format the result for display
             formatted_result = {
                 "type": result_type,
                 "tool_name": tool.name,
-                "provider": provider,
+                "provider": result.get("provider", provider),
                 "prompt": prompt,
-                "result": result.get("text", "") if isinstance(result, dict) else str(result),
+                "result": result.get("text", "") if isinstance(result, Mapping) else str(result),
                 "image_data": result.get("image_data", "") if result_type == "image" else None,
-                "response_time": result.get("response_time", 0) if isinstance(result, dict) else 0,
+                "response_time": result.get("response_time", 0) if isinstance(result, Mapping) else 0,
                 "tool_id": tool_id,
                 "ai_probability": result.get("ai_probability", None),
-                "model_used": selected_model,
-                "model_capabilities": model_info.get("capabilities", [])
+                "model_used": result.get("model", selected_model),
+                "model_capabilities": model_info.get("capabilities", []),
+                "cached": result.get("cached", False)
             }
             
             return templates.TemplateResponse(
@@ -1208,10 +1588,57 @@ async def process_request(
                     "prompt": prompt,
                     "result": formatted_result,
                     "tools": TOOLS,
-                    "json_data": result if isinstance(result, dict) else {"raw_response": str(result)}
+                    "json_data": dict(result) if isinstance(result, Mapping) else {"raw_response": str(result)}
                 }
             )
             
+        except ProviderBusyError as busy_error:
+            return templates.TemplateResponse(
+                "error.html",
+                {
+                    "request": request,
+                    "app_name": "AI Tool Hub",
+                    "error_title": "Provider Busy",
+                    "error_description": f"The provider '{provider}' is handling too many requests. Please try again in {busy_error.retry_after} seconds.",
+                    "user": session_user,
+                    "user_credits": session_user.credits,
+                    "tools": TOOLS
+                },
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(busy_error.retry_after)}
+            )
+            
+        except DeadlineExceededError:
+            return templates.TemplateResponse(
+                "error.html",
+                {
+                    "request": request,
+                    "app_name": "AI Tool Hub",
+                    "error_title": "Request Timed Out",
+                    "error_description": f"The provider '{provider}' did not respond in time. Please try again.",
+                    "user": session_user,
+                    "user_credits": session_user.credits,
+                    "tools": TOOLS
+                },
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT
+            )
+            
+        except CircuitOpenError:
+            return templates.TemplateResponse(
+                "error.html",
+                {
+                    "request": request,
+                    "app_name": "AI Tool Hub",
+                    "error_title": "Provider Unavailable",
+                    "error_description": f"The provider '{provider}' and its fallbacks are temporarily unavailable. Please try again shortly.",
+                    "user": session_user,
+                    "user_credits": session_user.credits,
+                    "tools": TOOLS
+                },
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": os.getenv("CIRCUIT_OPEN_SECONDS", "30")}
+            )
+            
         except Exception as generate_error:
             return templates.TemplateResponse(
                 "error.html",
@@ -1240,6 +1667,364 @@ async def process_request(
             }
         )
 
+@app.post("/api/stream-request")
+async def stream_request(
+    request: Request,
+    tool_id: str = Form(...),
+    prompt: str = Form(...),
+    provider: str = Form(...),
+    model: str = Form("default"),
+    session_user: Optional[UserInfo] = Depends(get_session_user)
+):
+    """Stream a text, chat or code tool's output token by token over Server-Sent Events"""
+    tool = next((t for t in TOOLS if t.id == tool_id), None)
+    
+    if not tool:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"success": False, "error": "The requested tool does not exist"}
+        )
+    
+    if provider not in tool.providers:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "error": f"The provider '{provider}' is not supported for this tool"}
+        )
+    
+    if not session_user:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={"success": False, "error": "Authentication required"}
+        )
+    
+    if get_result_type(tool_id) == "image":
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "error": "Streaming is only available for text, chat and code tools"}
+        )
+    
+    provider_instance = get_provider(provider)
+    if not provider_instance or not hasattr(provider_instance, "astream_text"):
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "error": f"The provider '{provider}' does not support streaming"}
+        )
+    
+    if session_user.credits < tool.cost:
+        return JSONResponse(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            content={"success": False, "error": "Insufficient credits"}
+        )
+    
+    # Reserve the cost before any await so concurrent streams cannot overdraw the session
+    session_user.credits -= tool.cost
+    
+    try:
+        provider_executor.check_capacity(provider)
+        # Streams bypass the dispatcher, so they take their rate limit budget here
+        await dispatcher.rate_limiter.acquire(
+            provider,
+            getattr(provider_instance, "api_key", None),
+            estimate_tokens(prompt, 1000),
+            get_request_priority(tool, session_user)
+        )
+    except ProviderBusyError as busy_error:
+        session_user.credits += tool.cost
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"success": False, "error": str(busy_error)},
+            headers={"Retry-After": str(busy_error.retry_after)}
+        )
+    
+    tool_type = tool_id.replace("-", "_")
+    selected_model, model_info = model_selector.select_model(
+        tool_type=tool_type,
+        provider=provider,
+        task_type=model if model != "default" else None,
+        context_length=len(prompt) * 4,
+        objective=tool.objective,
+        latency_slo=tool.latency_slo
+    )
+    logger.info(f"Model selector chose {selected_model} for streaming {tool_id} with provider {provider}")
+    
+    # Streams go out directly rather than through the dispatcher, but still respect and feed its circuit breaker
+    breaker = dispatcher.breakers.get(provider, selected_model)
+    if not breaker.allow():
+        session_user.credits += tool.cost
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"success": False, "error": f"The provider '{provider}' is temporarily unavailable"},
+            headers={"Retry-After": os.getenv("CIRCUIT_OPEN_SECONDS", "30")}
+        )
+    
+    async def event_stream():
+        start_time = time.time()
+        completed = False
+        outcome = None
+        try:
+            try:
+                async with provider_executor.slot(provider):
+                    async for token in provider_instance.astream_text(
+                        prompt=prompt,
+                        model=selected_model,
+                        max_tokens=1000,
+                        temperature=0.7
+                    ):
+                        yield sse_event({"token": token})
+            except Exception as stream_error:
+                logger.error(f"Streaming error with provider {provider}: {stream_error}")
+                outcome = {
+                    "success": False,
+                    "error": str(stream_error),
+                    "response_time": time.time() - start_time
+                }
+                yield sse_event({"error": f"Error generating content: {str(stream_error)}"}, event="error")
+                return
+            
+            outcome = {"success": True, "response_time": time.time() - start_time}
+            completed = True
+            yield sse_event({
+                "model_used": selected_model,
+                "response_time": outcome["response_time"],
+                "user_credits": session_user.credits
+            }, event="done")
+        finally:
+            if outcome is None:
+                # The client went away before the stream finished
+                breaker.cancel()
+            else:
+                breaker.record(outcome["success"], outcome["response_time"])
+                provider_registry.record_call(provider, outcome)
+                if dispatcher.telemetry is not None:
+                    dispatcher.telemetry.record(provider, selected_model, outcome["success"], outcome["response_time"])
+                log_generation_trace(tool.id, provider, selected_model, outcome, session_user.id)
+            # Failed and abandoned streams give back the credits reserved up front
+            if not completed:
+                session_user.credits += tool.cost
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/batch-generate")
+async def batch_generate(
+    batch: BatchGenerateRequest,
+    session_user: Optional[UserInfo] = Depends(get_session_user)
+):
+    """Run a text tool over many prompts, streaming each result over Server-Sent Events as it finishes"""
+    tool = next((t for t in TOOLS if t.id == batch.tool_id), None)
+    
+    if not tool:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"success": False, "error": "The requested tool does not exist"}
+        )
+    
+    if batch.provider not in tool.providers:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "error": f"The provider '{batch.provider}' is not supported for this tool"}
+        )
+    
+    if not session_user:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={"success": False, "error": "Authentication required"}
+        )
+    
+    if get_result_type(tool.id) == "image":
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "error": "Batch generation is only available for text, chat and code tools"}
+        )
+    
+    # Build the items from explicit prompts, or render the template once per variables dict
+    if batch.prompts:
+        items = [{"prompt": prompt, "system_message": batch.system_message} for prompt in batch.prompts]
+    elif batch.variables is not None and (batch.prompt_template_id or batch.template):
+        if batch.prompt_template_id:
+            template = template_manager.get_template(batch.prompt_template_id)
+        else:
+            template = PromptTemplate(template=batch.template, system_message=batch.system_message or "")
+        if not template:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"success": False, "error": "The requested prompt template does not exist"}
+            )
+        items = []
+        for variables in batch.variables:
+            rendered = template.render(variables)
+            items.append({"prompt": rendered["prompt"], "system_message": rendered["system_message"] or None})
+    else:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "error": "Provide either prompts, or a template with a list of variables"}
+        )
+    
+    if not items or len(items) > BATCH_MAX_ITEMS:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "error": f"A batch must contain between 1 and {BATCH_MAX_ITEMS} items"}
+        )
+    
+    # One credit reservation covers the whole batch; unused credits are refunded at the end
+    reserved = tool.cost * len(items)
+    if session_user.credits < reserved:
+        return JSONResponse(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            content={"success": False, "error": f"Insufficient credits: this batch needs {reserved:.2f}"}
+        )
+    
+    selected_model, model_info = model_selector.select_model(
+        tool_type=tool.id.replace("-", "_"),
+        provider=batch.provider,
+        task_type=batch.model if batch.model != "default" else None,
+        context_length=max(len(item["prompt"]) for item in items) * 4,
+        objective=tool.objective,
+        latency_slo=tool.latency_slo
+    )
+    fallbacks = tool.get_fallback_candidates(
+        batch.provider,
+        selected_model,
+        task_type=batch.model if batch.model != "default" else None
+    )
+    logger.info(f"Batch of {len(items)} items for {tool.id} with {batch.provider}/{selected_model}")
+    
+    session_user.credits -= reserved
+    
+    async def event_stream():
+        delivered = 0
+        charged = 0
+        refund = reserved
+        try:
+            async for result in dispatcher.generate_batch(
+                batch.provider,
+                items,
+                model=selected_model,
+                max_tokens=min(max(batch.max_tokens or BATCH_MAX_TOKENS, 1), BATCH_MAX_TOKENS),
+                temperature=batch.temperature if batch.temperature is not None else 0.7,
+                concurrency=BATCH_MAX_CONCURRENCY,
+                fallbacks=fallbacks,
+                tool_id=tool.id,
+                priority=BATCH_PRIORITY
+            ):
+                delivered += 1
+                # Same charging rule as single requests: cache hits only when configured
+                if result.get("success") and (not result.get("cached") or response_cache.charge_hits):
+                    charged += 1
+                yield sse_event({
+                    "index": result["index"],
+                    "success": bool(result.get("success")),
+                    "text": result.get("text", ""),
+                    "error": result.get("error"),
+                    "provider": result.get("provider", batch.provider),
+                    "model_used": result.get("model", selected_model),
+                    "cached": result.get("cached", False),
+                    "deduplicated": result.get("deduplicated", False)
+                }, event="result")
+        finally:
+            # Failures, free cache hits and items never delivered are refunded
+            refund = reserved - charged * tool.cost
+            session_user.credits += refund
+        
+        yield sse_event({
+            "completed": delivered,
+            "charged": charged * tool.cost,
+            "refunded": refund,
+            "user_credits": session_user.credits
+        }, event="done")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/jobs")
+async def submit_job(
+    job: JobRequest,
+    session_user: Optional[UserInfo] = Depends(get_session_user)
+):
+    """Queue a generation as a background job and return its ID straight away"""
+    tool = next((t for t in TOOLS if t.id == job.tool_id), None)
+    
+    if not tool:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"success": False, "error": "The requested tool does not exist"}
+        )
+    
+    if job.provider not in tool.providers:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "error": f"The provider '{job.provider}' is not supported for this tool"}
+        )
+    
+    if not session_user:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={"success": False, "error": "Authentication required"}
+        )
+    
+    if session_user.credits < tool.cost:
+        return JSONResponse(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            content={"success": False, "error": "Insufficient credits"}
+        )
+    
+    selected_model, model_info = model_selector.select_model(
+        tool_type=tool.id.replace("-", "_"),
+        provider=job.provider,
+        task_type=job.model if job.model != "default" else None,
+        context_length=len(job.prompt) * 4,
+        objective=tool.objective,
+        latency_slo=tool.latency_slo
+    )
+    fallbacks = tool.get_fallback_candidates(
+        job.provider,
+        selected_model,
+        task_type=job.model if job.model != "default" else None,
+        context_length=len(job.prompt) * 4
+    )
+    
+    job_id = await submit_generation_job(tool, job.provider, job.prompt, selected_model, model_info, fallbacks, session_user)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "success": True,
+            "job_id": job_id,
+            "status_url": f"/api/jobs/{job_id}",
+            "result_url": f"/result/{job_id}",
+            "user_credits": session_user.credits
+        }
+    )
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(
+    job_id: str,
+    session_user: Optional[UserInfo] = Depends(get_session_user)
+):
+    """Poll a background job"""
+    job = await job_queue.aget(job_id)
+    if not job or not session_user or (job["user_id"] != session_user.id and getattr(session_user, "role", "") != "admin"):
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"success": False, "error": "Job not found"}
+        )
+    
+    return JSONResponse(
+        content={
+            "success": True,
+            "job_id": job_id,
+            "status": job["status"],
+            "queue_position": await job_queue.aposition(job_id),
+            "error": job["error"],
+            "result_url": f"/result/{job_id}"
+        }
+    )
+
 @app.get("/register", response_class=HTMLResponse)
 async def register_page(request: Request):
     """Render the registration page"""
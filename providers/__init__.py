@@ -7,12 +7,67 @@ from providers.huggingface import HuggingFaceProvider
 from providers.openai import OpenAIProvider
 from providers.deepseek import DeepSeekProvider
 from providers.openrouter import OpenRouterProvider
+from providers.executor import ProviderExecutor, ProviderBusyError
+from providers.result import GenerationResult
+from providers.logs import log_event, log_payload, log_sampler, start_log_queue, stop_log_queue
+from providers.http_client import close_clients
+from providers.registry import ProviderRegistry
+from providers.cache import ResponseCache, make_cache_key
+from providers.circuit_breaker import CircuitBreaker, CircuitBreakerBoard, CircuitOpenError
+from providers.latency import LatencyHistogram, LatencyTracker
+from providers.hedging import Hedger
+from providers.timeouts import TimeoutManager, DeadlineExceededError, deadline_scope
+from providers.key_pool import ApiKeyPool, ApiKeyPools
+from providers.rate_limiter import RateLimiter, RateLimitExceededError, estimate_tokens
+from providers.retry import RetryPolicy, RetryBudget
+from providers.warmup import ModelWarmth, WarmupPinger, model_warmth
+from providers.dispatcher import GenerationDispatcher
+from providers.jobs import JobQueue
+from providers.media import MediaStore, media_store
+from providers.images import ImagePipeline
 
 __all__ = [
     'HuggingFaceProvider',
     'OpenAIProvider',
     'DeepSeekProvider', 
-    'OpenRouterProvider'
+    'OpenRouterProvider',
+    'ProviderExecutor',
+    'ProviderBusyError',
+    'GenerationResult',
+    'log_event',
+    'log_payload',
+    'log_sampler',
+    'start_log_queue',
+    'stop_log_queue',
+    'close_clients',
+    'ProviderRegistry',
+    'provider_registry',
+    'ResponseCache',
+    'make_cache_key',
+    'CircuitBreaker',
+    'CircuitBreakerBoard',
+    'CircuitOpenError',
+    'LatencyHistogram',
+    'LatencyTracker',
+    'Hedger',
+    'TimeoutManager',
+    'DeadlineExceededError',
+    'deadline_scope',
+    'RateLimiter',
+    'RateLimitExceededError',
+    'estimate_tokens',
+    'ApiKeyPool',
+    'ApiKeyPools',
+    'RetryPolicy',
+    'RetryBudget',
+    'ModelWarmth',
+    'WarmupPinger',
+    'model_warmth',
+    'GenerationDispatcher',
+    'JobQueue',
+    'MediaStore',
+    'media_store',
+    'ImagePipeline'
 ]
 
 # Provider registry for easy access
@@ -23,9 +78,12 @@ PROVIDERS = {
     'openrouter': OpenRouterProvider
 }
 
+# Shared provider instances, built once per (provider, api_key)
+provider_registry = ProviderRegistry(PROVIDERS)
+
 def get_provider(provider_name: str, api_key: str = None):
     """
-    Get a provider instance by name
+    Get the shared provider instance by name
     
     Args:
         provider_name: Name of the provider ('huggingface', 'openai', etc.)
@@ -34,8 +92,4 @@ def get_provider(provider_name: str, api_key: str = None):
     Returns:
         Provider instance or None if provider not found
     """
-    provider_class = PROVIDERS.get(provider_name.lower())
-    if not provider_class:
-        return None
-    
-    return provider_class(api_key=api_key) 
\ No newline at end of file
+    return provider_registry.get(provider_name, api_key=api_key) 
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""
+Response Cache
+Caches generation results keyed on provider, model, prompt and parameters
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Any, Optional, Tuple
+
+# Setup logging
+logger = logging.getLogger("cache")
+
+
+def make_cache_key(provider: str,
+                   model: str,
+                   prompt: str,
+                   system_message: Optional[str] = None,
+                   max_tokens: Optional[int] = None,
+                   temperature: Optional[float] = None,
+                   **params) -> str:
+    """
+    Build a normalized hash for a generation request
+
+    Args:
+        provider: Provider name
+        model: Selected model ID
+        prompt: User prompt
+        system_message: Optional system message
+        max_tokens: Maximum tokens to generate
+        temperature: Sampling temperature
+        **params: Any other parameters that change the output (e.g. image size)
+
+    Returns:
+        Hex SHA-256 digest identifying the request
+    """
+    normalized = {
+        "provider": provider.lower().strip(),
+        "model": (model or "").strip(),
+        "prompt": " ".join(prompt.split()),
+        "system_message": " ".join(system_message.split()) if system_message else None,
+        "max_tokens": max_tokens,
+        "temperature": round(float(temperature), 3) if temperature is not None else None,
+        "params": params
+    }
+    encoded = json.dumps(normalized, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier cache for generation results
+
+    An in-memory LRU bounded by total payload bytes sits in front of an
+    optional SQLite tier that survives restarts. Entries expire after the TTL
+    in both tiers. Only successful results are stored. Async callers use
+    aget()/aset(), which run the SQLite tier in the default executor so disk
+    I/O never blocks the event loop.
+    """
+
+    def __init__(self,
+                 enabled: bool = False,
+                 ttl: float = 3600,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 max_entry_bytes: Optional[int] = None,
+                 db_path: Optional[str] = None,
+                 charge_hits: bool = True):
+        """
+        Args:
+            enabled: Whether lookups and stores are performed at all
+            ttl: Seconds an entry stays valid
+            max_bytes: Memory budget for the LRU tier
+            max_entry_bytes: Largest single entry kept in memory (default max_bytes / 4)
+            db_path: Optional SQLite file for the persistent tier
+            charge_hits: Whether users are charged for results served from cache
+        """
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 4
+        self.charge_hits = charge_hits
+        self.db_path = db_path
+
+        self._entries: "OrderedDict[str, Tuple[float, int, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # SQLite has its own lock so a slow disk call never holds up the memory tier
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.enabled and self.db_path:
+            self._init_db()
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Build a cache configured from RESPONSE_CACHE_* environment variables"""
+        return cls(
+            enabled=os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true",
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            db_path=os.getenv("RESPONSE_CACHE_DB") or None,
+            charge_hits=os.getenv("RESPONSE_CACHE_CHARGE_HITS", "true").lower() == "true"
+        )
+
+    def _init_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+        self._db.commit()
+
+    def _store_memory(self, key: str, expires_at: float, payload: str):
+        size = len(payload)
+        if size > self.max_entry_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (expires_at, size, payload)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _get_memory(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, size, payload = entry
+            if expires_at < now:
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def _get_disk(self, key: str, now: float) -> Optional[str]:
+        """Blocking SQLite lookup, promoting a hit into the memory tier"""
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ? AND expires_at >= ?",
+                (key, now)
+            ).fetchone()
+        if not row:
+            return None
+        with self._lock:
+            self._store_memory(key, row[1], row[0])
+            self.disk_hits += 1
+        return row[0]
+
+    def _set_disk(self, key: str, payload: str, expires_at: float):
+        """Blocking SQLite write"""
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, expires_at)
+            )
+            self._db.commit()
+
+    def _result(self, payload: Optional[str]) -> Optional[Dict[str, Any]]:
+        if payload is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        result = json.loads(payload)
+        result["cached"] = True
+        return result
+
+    def _payload(self, result: Dict[str, Any]) -> Optional[str]:
+        """Serialize a result worth caching, or return None"""
+        if not self.enabled or not isinstance(result, Mapping) or not result.get("success"):
+            return None
+        try:
+            return json.dumps({k: v for k, v in result.items() if k != "cached"}, default=str)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Result not cacheable: {e}")
+            return None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result, blocking on the SQLite tier if needed
+
+        Returns:
+            A copy of the cached result flagged with "cached": True, or None
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        payload = self._get_memory(key, now)
+        if payload is None and self._db is not None:
+            payload = self._get_disk(key, now)
+        return self._result(payload)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached result from the event loop; see get()"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        payload = self._get_memory(key, now)
+        if payload is None and self._db is not None:
+            loop = asyncio.get_running_loop()
+            payload = await loop.run_in_executor(None, self._get_disk, key, now)
+        return self._result(payload)
+
+    def set(self, key: str, result: Dict[str, Any]):
+        """Store a successful result under a key, blocking on the SQLite tier if enabled"""
+        payload = self._payload(result)
+        if payload is None:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store_memory(key, expires_at, payload)
+        if self._db is not None:
+            self._set_disk(key, payload, expires_at)
+
+    async def aset(self, key: str, result: Dict[str, Any]):
+        """Store a successful result from the event loop; see set()"""
+        payload = self._payload(result)
+        if payload is None:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store_memory(key, expires_at, payload)
+        if self._db is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._set_disk, key, payload, expires_at)
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and memory usage"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "charge_hits": self.charge_hits
+        }
+
+    def close(self):
+        """Close the SQLite tier"""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,187 @@
+"""
+Circuit Breakers
+Tracks rolling error rate and latency per (provider, model) and stops sending
+traffic to upstreams that are failing
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Tuple
+
+# Setup logging
+logger = logging.getLogger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when every candidate for a request has an open circuit"""
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one (provider, model)
+
+    Calls slower than slow_call_seconds count as failures. Once the window
+    holds at least min_calls outcomes and the failure rate reaches
+    error_threshold the circuit opens; after open_seconds a limited number of
+    probe calls are let through (half-open) and the first probe outcome
+    decides whether the circuit closes again.
+    """
+
+    def __init__(self,
+                 name: str,
+                 error_threshold: float = 0.5,
+                 min_calls: int = 5,
+                 window_seconds: float = 60,
+                 open_seconds: float = 30,
+                 slow_call_seconds: float = 20,
+                 half_open_probes: int = 1):
+        self.name = name
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.times_opened = 0
+        self._outcomes: deque = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit {self.name}: {self.state} -> {state}")
+            self.state = state
+
+    def allow(self) -> bool:
+        """Check whether a call may be sent, reserving a probe slot when half-open"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    return False
+                self._transition(HALF_OPEN)
+                self.probes_in_flight = 0
+
+            if self.state == HALF_OPEN:
+                if self.probes_in_flight >= self.half_open_probes:
+                    return False
+                self.probes_in_flight += 1
+            return True
+
+    def cancel(self):
+        """Release a reserved probe slot for a call that never reached the upstream"""
+        with self._lock:
+            if self.state == HALF_OPEN and self.probes_in_flight > 0:
+                self.probes_in_flight -= 1
+
+    def record(self, success: bool, latency: float):
+        """Record the outcome of a call"""
+        ok = success and latency < self.slow_call_seconds
+        now = time.monotonic()
+        with self._lock:
+            self._outcomes.append((now, ok, latency))
+            self._trim(now)
+
+            if self.state == HALF_OPEN:
+                self.probes_in_flight = max(0, self.probes_in_flight - 1)
+                if ok:
+                    self._outcomes.clear()
+                    self._transition(CLOSED)
+                else:
+                    self._open(now)
+            elif self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                if self._error_rate() >= self.error_threshold:
+                    self._open(now)
+
+    def _open(self, now: float):
+        self.opened_at = now
+        self.times_opened += 1
+        self._transition(OPEN)
+
+    def _error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, ok, _ in self._outcomes if not ok) / len(self._outcomes)
+
+    def _avg_latency(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(latency for _, _, latency in self._outcomes) / len(self._outcomes)
+
+    def health_score(self) -> float:
+        """Score from 0 (unusable) to 1 (healthy and fast) used to rank failover targets"""
+        with self._lock:
+            self._trim(time.monotonic())
+            if self.state == OPEN:
+                return 0.0
+            latency_factor = 1.0 / (1.0 + self._avg_latency() / self.slow_call_seconds)
+            return (1.0 - self._error_rate()) * latency_factor
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                "state": self.state,
+                "calls_in_window": len(self._outcomes),
+                "error_rate": self._error_rate(),
+                "avg_latency": self._avg_latency(),
+                "times_opened": self.times_opened
+            }
+
+
+class CircuitBreakerBoard:
+    """Holds one circuit breaker per (provider, model)"""
+
+    def __init__(self, **breaker_options):
+        """
+        Args:
+            **breaker_options: Options passed to every CircuitBreaker
+        """
+        self.breaker_options = breaker_options
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreakerBoard":
+        """Build a board configured from CIRCUIT_* environment variables"""
+        return cls(
+            error_threshold=float(os.getenv("CIRCUIT_ERROR_THRESHOLD", "0.5")),
+            min_calls=int(os.getenv("CIRCUIT_MIN_CALLS", "5")),
+            window_seconds=float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60")),
+            open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "30")),
+            slow_call_seconds=float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "20"))
+        )
+
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        """Get the breaker for a (provider, model), creating it on first use"""
+        key = (provider, model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    key, CircuitBreaker(f"{provider}/{model}", **self.breaker_options)
+                )
+        return breaker
+
+    def health_score(self, provider: str, model: str) -> float:
+        """Health score for a (provider, model); unseen pairs count as healthy"""
+        breaker = self._breakers.get((provider, model))
+        return breaker.health_score() if breaker else 1.0
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get state and rolling stats for every breaker"""
+        return {
+            breaker.name: {**breaker.stats(), "health_score": breaker.health_score()}
+            for breaker in list(self._breakers.values())
+        }
@@ -3,11 +3,14 @@ DeepSeek Provider Integration
 Handles API calls to DeepSeek for AI model inference
 """
 import os
-import requests
 import time
 import json
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+
+from providers.http_client import get_async_client, get_session, iter_chat_deltas, request_timeout, httpx_timeout
+from providers.rate_limiter import parse_rate_limit_headers
+from providers.result import GenerationResult
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -28,12 +31,90 @@ class DeepSeekProvider:
             "Content-Type": "application/json"
         }
     
+    @property
+    def session(self):
+        """Shared keep-alive session for blocking calls"""
+        return get_session("deepseek")
+    
+    @property
+    def async_client(self):
+        """Shared pooled client for async calls"""
+        return get_async_client("deepseek")
+    
+    def _chat_payload(self, 
+                    prompt: str, 
+                    model: str, 
+                    max_tokens: int, 
+                    temperature: float, 
+                    system_message: str, 
+                    **kwargs) -> Dict[str, Any]:
+        """Build the chat completions request payload"""
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt}
+        ]
+        
+        return {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            **kwargs
+        }
+    
+    def _chat_result(self, response, model: str, start_time: float) -> GenerationResult:
+        """Turn a chat completions HTTP response into a result dict"""
+        # Check for errors
+        if response.status_code != 200:
+            logger.error(f"Error from DeepSeek API: {response.status_code} - {response.text}")
+            return GenerationResult(
+                success=False,
+                error=f"DeepSeek API error: {response.status_code}",
+                response_time=time.time() - start_time,
+                model=model,
+                provider="deepseek",
+                status_code=response.status_code,
+                rate_limit=parse_rate_limit_headers(response.headers, response.status_code)
+            )
+        
+        result = response.json()
+        
+        # Extract the generated text
+        generated_text = result["choices"][0]["message"]["content"]
+        
+        return GenerationResult(
+            success=True,
+            text=generated_text,
+            model=model,
+            provider="deepseek",
+            response_time=time.time() - start_time,
+            tokens={
+                "prompt": result.get("usage", {}).get("prompt_tokens", 0),
+                "completion": result.get("usage", {}).get("completion_tokens", 0),
+                "total": result.get("usage", {}).get("total_tokens", 0)
+            },
+            raw_response=result,
+            rate_limit=parse_rate_limit_headers(response.headers)
+        )
+    
+    def _error_result(self, error: Exception, model: str, start_time: float) -> GenerationResult:
+        """Build a result dict for a failed call"""
+        return GenerationResult(
+            success=False,
+            error=str(error),
+            error_type=type(error).__name__,
+            response_time=time.time() - start_time,
+            model=model,
+            provider="deepseek"
+        )
+    
     def generate_text(self, 
                     prompt: str, 
                     model: str = "deepseek-chat", 
                     max_tokens: int = 1000, 
                     temperature: float = 0.7, 
                     system_message: str = "You are a helpful assistant.", 
+                    timeout: Optional[Tuple[float, float]] = None, 
                     **kwargs) -> Dict[str, Any]:
         """Generate text using DeepSeek models"""
         if not self.api_key:
@@ -42,70 +123,78 @@ class DeepSeekProvider:
         start_time = time.time()
         
         try:
-            messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ]
+            response = self.session.post(
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                json=self._chat_payload(prompt, model, max_tokens, temperature, system_message, **kwargs),
+                timeout=request_timeout(timeout)
+            )
+            return self._chat_result(response, model, start_time)
             
-            payload = {
-                "model": model,
-                "messages": messages,
-                "max_tokens": max_tokens,
-                "temperature": temperature,
-                **kwargs
-            }
+        except Exception as e:
+            logger.error(f"Error generating text with DeepSeek: {e}")
+            return self._error_result(e, model, start_time)
+    
+    async def agenerate_text(self, 
+                    prompt: str, 
+                    model: str = "deepseek-chat", 
+                    max_tokens: int = 1000, 
+                    temperature: float = 0.7, 
+                    system_message: str = "You are a helpful assistant.", 
+                    timeout: Optional[Tuple[float, float]] = None, 
+                    **kwargs) -> Dict[str, Any]:
+        """Generate text using DeepSeek models without blocking the event loop"""
+        if not self.api_key:
+            return {"success": False, "error": "DeepSeek API key not provided"}
             
-            response = requests.post(
+        start_time = time.time()
+        
+        try:
+            response = await self.async_client.post(
                 f"{self.base_url}/chat/completions",
                 headers=self.headers,
-                json=payload
+                json=self._chat_payload(prompt, model, max_tokens, temperature, system_message, **kwargs),
+                timeout=httpx_timeout(timeout)
             )
+            return self._chat_result(response, model, start_time)
             
-            # Check for errors
+        except Exception as e:
+            logger.error(f"Error generating text with DeepSeek: {e}")
+            return self._error_result(e, model, start_time)
+    
+    async def astream_text(self, 
+                    prompt: str, 
+                    model: str = "deepseek-chat", 
+                    max_tokens: int = 1000, 
+                    temperature: float = 0.7, 
+                    system_message: str = "You are a helpful assistant.", 
+                    **kwargs) -> AsyncIterator[str]:
+        """Stream generated text from DeepSeek models as it is produced"""
+        if not self.api_key:
+            raise ValueError("DeepSeek API key not provided")
+        
+        payload = self._chat_payload(prompt, model, max_tokens, temperature, system_message, stream=True, **kwargs)
+        
+        async with self.async_client.stream(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            headers=self.headers,
+            json=payload
+        ) as response:
             if response.status_code != 200:
+                await response.aread()
                 logger.error(f"Error from DeepSeek API: {response.status_code} - {response.text}")
-                return {
-                    "success": False,
-                    "error": f"DeepSeek API error: {response.status_code}",
-                    "response_time": time.time() - start_time,
-                    "model": model,
-                    "provider": "deepseek"
-                }
-            
-            result = response.json()
+                raise RuntimeError(f"DeepSeek API error: {response.status_code}")
             
-            # Extract the generated text
-            generated_text = result["choices"][0]["message"]["content"]
-            
-            return {
-                "success": True,
-                "text": generated_text,
-                "model": model,
-                "provider": "deepseek",
-                "response_time": time.time() - start_time,
-                "tokens": {
-                    "prompt": result.get("usage", {}).get("prompt_tokens", 0),
-                    "completion": result.get("usage", {}).get("completion_tokens", 0),
-                    "total": result.get("usage", {}).get("total_tokens", 0)
-                },
-                "raw_response": result
-            }
-            
-        except Exception as e:
-            logger.error(f"Error generating text with DeepSeek: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "response_time": time.time() - start_time,
-                "model": model,
-                "provider": "deepseek"
-            }
+            async for content in iter_chat_deltas(response):
+                yield content
     
     def generate_code(self, 
                     prompt: str, 
                     model: str = "deepseek-coder", 
                     max_tokens: int = 2000, 
                     temperature: float = 0.5, 
+                    timeout: Optional[Tuple[float, float]] = None, 
                     **kwargs) -> Dict[str, Any]:
         """Generate code using DeepSeek Coder models"""
         if not self.api_key:
@@ -114,64 +203,20 @@ class DeepSeekProvider:
         start_time = time.time()
         
         try:
-            messages = [
-                {"role": "system", "content": "You are a helpful coding assistant."},
-                {"role": "user", "content": prompt}
-            ]
-            
-            payload = {
-                "model": model,
-                "messages": messages,
-                "max_tokens": max_tokens,
-                "temperature": temperature,
-                **kwargs
-            }
-            
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/chat/completions",
                 headers=self.headers,
-                json=payload
+                json=self._chat_payload(
+                    prompt, model, max_tokens, temperature,
+                    "You are a helpful coding assistant.", **kwargs
+                ),
+                timeout=request_timeout(timeout)
             )
-            
-            # Check for errors
-            if response.status_code != 200:
-                logger.error(f"Error from DeepSeek API: {response.status_code} - {response.text}")
-                return {
-                    "success": False,
-                    "error": f"DeepSeek API error: {response.status_code}",
-                    "response_time": time.time() - start_time,
-                    "model": model,
-                    "provider": "deepseek"
-                }
-            
-            result = response.json()
-            
-            # Extract the generated code
-            generated_code = result["choices"][0]["message"]["content"]
-            
-            return {
-                "success": True,
-                "text": generated_code,
-                "model": model,
-                "provider": "deepseek",
-                "response_time": time.time() - start_time,
-                "tokens": {
-                    "prompt": result.get("usage", {}).get("prompt_tokens", 0),
-                    "completion": result.get("usage", {}).get("completion_tokens", 0),
-                    "total": result.get("usage", {}).get("total_tokens", 0)
-                },
-                "raw_response": result
-            }
+            return self._chat_result(response, model, start_time)
             
         except Exception as e:
             logger.error(f"Error generating code with DeepSeek: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "response_time": time.time() - start_time,
-                "model": model,
-                "provider": "deepseek"
-            }
+            return self._error_result(e, model, start_time)
     
     def get_available_models(self) -> List[Dict[str, Any]]:
         """Get available DeepSeek models"""
@@ -207,4 +252,4 @@ if __name__ == "__main__":
     # Test the provider
     provider = DeepSeekProvider()
     result = provider.generate_text("Write a short poem about AI.")
-    print(json.dumps(result, indent=2)) 
\ No newline at end of file
+    print(json.dumps(dict(result), indent=2)) 
\ No newline at end of file
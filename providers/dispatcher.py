@@ -0,0 +1,440 @@
+"""
+Generation Dispatcher
+Routes generation requests through the response cache, request coalescing,
+circuit breakers, hedging and the provider execution layer
+"""
+import time
+import asyncio
+import logging
+from collections.abc import Mapping
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable, AsyncIterator
+
+from providers.cache import ResponseCache, make_cache_key
+from providers.circuit_breaker import CircuitBreakerBoard, CircuitOpenError
+from providers.executor import ProviderExecutor, ProviderBusyError
+from providers.logs import log_event
+from providers.hedging import Hedger
+from providers.key_pool import ApiKeyPools
+from providers.rate_limiter import RateLimiter, estimate_tokens
+from providers.latency import LatencyTracker
+from providers.registry import ProviderRegistry
+from providers.retry import RetryPolicy
+from providers.singleflight import SingleFlight
+from providers.timeouts import TimeoutManager, DeadlineExceededError, TIMEOUT_ERROR_TYPES, remaining_time
+
+# Setup logging
+logger = logging.getLogger("dispatcher")
+
+
+class GenerationDispatcher:
+    """Single entry point for text and image generation
+
+    Resolves the shared provider instance, serves repeat requests from the
+    response cache, coalesces identical in-flight requests into one upstream
+    call and otherwise runs the call in the provider's execution lane,
+    preferring the native async methods when a provider has them.
+
+    Every (provider, model) has a circuit breaker. When the primary candidate
+    fails or its circuit is open, the request fails over to the fallback
+    candidates, healthiest first. Requests that opt into hedging race a
+    backup on another provider once the primary is slower than its p90.
+    Each call gets an adaptive timeout and is bounded by the request deadline,
+    and waits for its API key's rate limit budget before it goes upstream.
+    Providers configured with several API keys spread calls across them.
+    Transient failures are retried with jittered backoff under a retry budget.
+    """
+
+    def __init__(self,
+                 registry: ProviderRegistry,
+                 executor: ProviderExecutor,
+                 cache: Optional[ResponseCache] = None,
+                 coalesce: bool = True,
+                 breakers: Optional[CircuitBreakerBoard] = None,
+                 latencies: Optional[LatencyTracker] = None,
+                 hedger: Optional[Hedger] = None,
+                 timeouts: Optional[TimeoutManager] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 key_pools: Optional[ApiKeyPools] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 telemetry: Optional[Any] = None):
+        self.registry = registry
+        self.executor = executor
+        self.cache = cache
+        self.singleflight = SingleFlight() if coalesce else None
+        self.breakers = breakers or CircuitBreakerBoard()
+        self.latencies = latencies or LatencyTracker()
+        self.hedger = hedger or Hedger(self.latencies)
+        self.timeouts = timeouts or TimeoutManager()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # Multi-key pools come from the environment unless given explicitly
+        self.key_pools = key_pools if key_pools is not None else ApiKeyPools.from_env(list(registry.provider_classes))
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Anything with record(provider, model, success, latency, completion_tokens), e.g. agents.ModelTelemetry
+        self.telemetry = telemetry
+
+    def _get_instance(self, provider: str, api_key: Optional[str] = None):
+        instance = self.registry.get(provider, api_key=api_key)
+        if instance is None:
+            raise ValueError(f"Unknown provider '{provider}'")
+        return instance
+
+    def _supports(self, provider: str, method: str) -> bool:
+        instance = self.registry.get(provider)
+        return instance is not None and hasattr(instance, method)
+
+    async def _dispatch(self,
+                        provider: str,
+                        model: str,
+                        method: str,
+                        cache_key: str,
+                        tool_id: Optional[str] = None,
+                        priority: float = 0.0,
+                        **params) -> Dict[str, Any]:
+        # The candidate model is passed positionally, never in params
+        params["model"] = model
+        if self.cache is not None:
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                log_event(logger, "cache.hit", provider=provider, method=method)
+                return cached
+
+        breaker = self.breakers.get(provider, model)
+
+        max_tokens = params.get("max_tokens", 0)
+        tokens = estimate_tokens(params.get("prompt", ""), max_tokens)
+
+        async def attempt_once() -> Tuple[Any, Optional[float]]:
+            # Providers with several keys spread calls across them
+            pool = self.key_pools.get(provider)
+            pool_key = pool.acquire(lambda key: self.rate_limiter.headroom(provider, key)) if pool else None
+            status_code = None
+            rate_info = None
+            try:
+                instance = self._get_instance(provider, pool_key)
+                api_key = getattr(instance, "api_key", None)
+                # An open circuit rejects before the call spends or waits for rate limit budget
+                if not breaker.allow():
+                    raise CircuitOpenError(f"Circuit open for {provider}/{model}")
+                # Anything failing before the upstream call must hand back a half-open probe
+                try:
+                    await self.rate_limiter.acquire(provider, api_key, tokens, priority)
+                    timeout = self.timeouts.get_timeout(provider, model, max_tokens, tool_id)
+                except BaseException:
+                    breaker.cancel()
+                    raise
+
+                # Prefer the native async client; fall back to the blocking call
+                func = getattr(instance, f"a{method}", None) or getattr(instance, method)
+                start_time = time.monotonic()
+                try:
+                    # The read timeout bounds each socket read; the deadline bounds the whole call
+                    result = await asyncio.wait_for(
+                        self.executor.run(provider, func, timeout=timeout, **params),
+                        timeout=remaining_time()
+                    )
+                except ProviderBusyError:
+                    breaker.cancel()
+                    raise
+                except asyncio.TimeoutError:
+                    breaker.cancel()
+                    raise DeadlineExceededError(f"Request deadline passed waiting for {provider}/{model}")
+                except asyncio.CancelledError:
+                    # Losing hedges and abandoned coalesced calls must not hold a half-open probe
+                    breaker.cancel()
+                    raise
+                except Exception as e:
+                    if type(e).__name__ in TIMEOUT_ERROR_TYPES:
+                        self.timeouts.record_timeout(provider, model, max_tokens, timeout[1], time.monotonic() - start_time)
+                    breaker.record(False, time.monotonic() - start_time)
+                    if self.telemetry is not None:
+                        self.telemetry.record(provider, model, False, time.monotonic() - start_time)
+                    raise
+
+                elapsed = time.monotonic() - start_time
+                if isinstance(result, Mapping):
+                    rate_info = result.pop("rate_limit", None)
+                    self.rate_limiter.update(provider, api_key, rate_info)
+                    self.rate_limiter.settle(provider, api_key, tokens, (result.get("tokens") or {}).get("total"))
+                    if not result.get("success"):
+                        status_code = result.get("status_code")
+                success = not isinstance(result, Mapping) or bool(result.get("success"))
+                breaker.record(success, elapsed)
+                if success:
+                    self.latencies.record((provider, model), elapsed)
+                    self.timeouts.record(provider, model, max_tokens, elapsed)
+                elif result.get("error_type") in TIMEOUT_ERROR_TYPES:
+                    self.timeouts.record_timeout(provider, model, max_tokens, timeout[1], elapsed)
+                if self.telemetry is not None:
+                    completion_tokens = (result.get("tokens") or {}).get("completion") if isinstance(result, Mapping) else None
+                    self.telemetry.record(provider, model, success, elapsed, completion_tokens)
+                self.registry.record_call(provider, result, api_key=pool_key)
+                return result, (rate_info or {}).get("retry_after")
+            finally:
+                if pool is not None:
+                    pool.release(pool_key, status_code, (rate_info or {}).get("retry_after"))
+
+        async def call_provider():
+            self.retry_policy.start()
+            attempts = 1
+            while True:
+                error: Optional[Exception] = None
+                try:
+                    result, retry_after = await attempt_once()
+                except (ProviderBusyError, DeadlineExceededError, CircuitOpenError):
+                    raise
+                except Exception as e:
+                    # Transport errors raised by blocking clients go through the same policy
+                    result, retry_after, error = e, None, e
+                delay = self.retry_policy.next_delay(attempts, result, retry_after, remaining_time())
+                if delay is None:
+                    break
+                reason = type(error).__name__ if error is not None else result.get("status_code") or result.get("error_type")
+                logger.warning(f"Retrying {provider}/{model} in {delay:.2f}s after {reason} (attempt {attempts + 1})")
+                await asyncio.sleep(delay)
+                attempts += 1
+
+            if error is not None:
+                raise error
+
+            if isinstance(result, Mapping):
+                result["retries"] = attempts - 1
+                if attempts > 1 and result.get("success"):
+                    self.retry_policy.record_recovery()
+            if self.cache is not None and isinstance(result, Mapping):
+                await self.cache.aset(cache_key, result)
+            return result
+
+        if self.singleflight is not None:
+            result, shared = await self.singleflight.do(cache_key, call_provider)
+        else:
+            result, shared = await call_provider(), False
+
+        if isinstance(result, Mapping):
+            # Every waiter gets its own copy of a shared result
+            result = result.copy()
+            result["cached"] = False
+            result["coalesced"] = shared
+        return result
+
+    async def _with_failover(self,
+                             method: str,
+                             candidates: List[Tuple[str, str]],
+                             attempt: Callable[[str, str], Awaitable[Dict[str, Any]]],
+                             hedge_group: Optional[str] = None,
+                             max_hedge_rate: float = 0.1,
+                             estimated_tokens: int = 0) -> Dict[str, Any]:
+        primary = candidates[0]
+        # Healthiest alternatives are tried first; ties keep their given order
+        alternatives = sorted(
+            candidates[1:],
+            key=lambda candidate: self.breakers.health_score(*candidate),
+            reverse=True
+        )
+
+        # Hedges go to the healthiest alternative on a different provider; both
+        # sides need a native async client, as a cancelled blocking call keeps running
+        hedge_target = None
+        if hedge_group is not None and self._supports(primary[0], f"a{method}"):
+            hedge_target = next(
+                (c for c in alternatives if c[0] != primary[0] and self._supports(c[0], f"a{method}")),
+                None
+            )
+
+        last_result = None
+        last_error: Optional[Exception] = None
+        for provider, model in [primary] + alternatives:
+            if not self._supports(provider, method):
+                continue
+            try:
+                if (provider, model) == primary and hedge_target is not None:
+                    result = await self.hedger.race(
+                        hedge_group,
+                        primary,
+                        lambda: attempt(*primary),
+                        lambda: attempt(*hedge_target),
+                        max_hedge_rate=max_hedge_rate,
+                        estimated_tokens=estimated_tokens
+                    )
+                else:
+                    result = await attempt(provider, model)
+            except (ProviderBusyError, DeadlineExceededError):
+                raise
+            except CircuitOpenError as e:
+                logger.warning(str(e))
+                last_error = last_error or e
+                continue
+            except Exception as e:
+                logger.error(f"Error from {provider}/{model}: {e}")
+                last_error = e
+                continue
+
+            if not isinstance(result, Mapping) or result.get("success"):
+                if (provider, model) != primary and isinstance(result, Mapping):
+                    logger.warning(f"Failed over from {primary[0]}/{primary[1]} to {provider}/{model}")
+                    result["failover_from"] = f"{primary[0]}/{primary[1]}"
+                return result
+            last_result = result
+
+        if last_result is not None:
+            return last_result
+        raise last_error or CircuitOpenError(f"No available provider for {method}")
+
+    async def generate_text(self,
+                            provider: str,
+                            prompt: str,
+                            model: str,
+                            max_tokens: int = 1000,
+                            temperature: float = 0.7,
+                            system_message: Optional[str] = None,
+                            fallbacks: Optional[List[Tuple[str, str]]] = None,
+                            hedge_group: Optional[str] = None,
+                            max_hedge_rate: float = 0.1,
+                            tool_id: Optional[str] = None,
+                            priority: float = 0.0) -> Dict[str, Any]:
+        """
+        Generate text with a provider
+
+        Args:
+            provider: Provider name
+            prompt: User prompt
+            model: Model ID to use
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            system_message: Optional system message; the provider default is used if omitted
+            fallbacks: (provider, model) pairs to fail over to, in preference order
+            hedge_group: Enables hedging, with the hedge budget tracked under this name
+            max_hedge_rate: Largest share of requests in the group allowed to hedge
+            tool_id: Calling tool, for per-tool timeout overrides
+            priority: Queue priority while waiting for rate limit budget
+
+        Returns:
+            The provider's result dict, with "cached", "coalesced" and "retries"
+        """
+        async def attempt(candidate_provider: str, candidate_model: str) -> Dict[str, Any]:
+            params = {
+                "prompt": prompt,
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            }
+            if system_message is not None:
+                params["system_message"] = system_message
+
+            cache_key = make_cache_key(
+                candidate_provider, candidate_model, prompt,
+                system_message=system_message,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            return await self._dispatch(
+                candidate_provider, candidate_model, "generate_text", cache_key,
+                tool_id=tool_id, priority=priority, **params
+            )
+
+        return await self._with_failover(
+            "generate_text",
+            [(provider, model)] + list(fallbacks or []),
+            attempt,
+            hedge_group=hedge_group,
+            max_hedge_rate=max_hedge_rate,
+            estimated_tokens=estimate_tokens(prompt, max_tokens)
+        )
+
+    async def generate_batch(self,
+                             provider: str,
+                             items: List[Dict[str, Any]],
+                             model: str,
+                             max_tokens: int = 1000,
+                             temperature: float = 0.7,
+                             concurrency: int = 4,
+                             fallbacks: Optional[List[Tuple[str, str]]] = None,
+                             tool_id: Optional[str] = None,
+                             priority: float = 0.0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate text for many prompts, yielding each result as soon as it is ready
+
+        Identical prompts are generated once and their result is shared. At most
+        `concurrency` generations from the batch are in flight at a time, on top
+        of the provider's own execution limits.
+
+        Args:
+            provider: Provider name
+            items: Dicts with "prompt" and an optional "system_message"
+            model: Model ID to use
+            max_tokens: Maximum tokens to generate per item
+            temperature: Sampling temperature
+            concurrency: Most generations from this batch in flight at once
+            fallbacks: (provider, model) pairs to fail over to, in preference order
+            tool_id: Calling tool, for per-tool timeout overrides
+            priority: Queue priority while waiting for rate limit budget
+
+        Yields:
+            Result dicts with the item's "index"; failures are yielded, not raised
+        """
+        groups: Dict[Tuple[str, Optional[str]], List[int]] = {}
+        for index, item in enumerate(items):
+            groups.setdefault((item["prompt"], item.get("system_message")), []).append(index)
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(key: Tuple[str, Optional[str]]) -> Tuple[Tuple[str, Optional[str]], Dict[str, Any]]:
+            prompt, system_message = key
+            async with semaphore:
+                try:
+                    result = await self.generate_text(
+                        provider,
+                        prompt=prompt,
+                        model=model,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        system_message=system_message,
+                        fallbacks=fallbacks,
+                        tool_id=tool_id,
+                        priority=priority
+                    )
+                except Exception as e:
+                    logger.error(f"Batch item failed with {provider}/{model}: {e}")
+                    result = {"success": False, "error": str(e), "provider": provider, "model": model}
+            return key, result
+
+        tasks = [asyncio.ensure_future(run(key)) for key in groups]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, result = await next_done
+                for position, index in enumerate(groups[key]):
+                    yield {**result, "index": index, "deduplicated": position > 0}
+        finally:
+            # Stop outstanding work if the consumer goes away
+            for task in tasks:
+                task.cancel()
+
+    async def generate_image(self,
+                             provider: str,
+                             prompt: str,
+                             model: str,
+                             fallbacks: Optional[List[Tuple[str, str]]] = None,
+                             tool_id: Optional[str] = None,
+                             priority: float = 0.0,
+                             **kwargs) -> Dict[str, Any]:
+        """
+        Generate an image with a provider
+
+        Args:
+            provider: Provider name
+            prompt: Image description
+            model: Model ID to use
+            fallbacks: (provider, model) pairs to fail over to, in preference order
+            tool_id: Calling tool, for per-tool timeout overrides
+            priority: Queue priority while waiting for rate limit budget
+            **kwargs: Provider-specific options such as size
+
+        Returns:
+            The provider's result dict, with "cached" and "coalesced" flags
+        """
+        async def attempt(candidate_provider: str, candidate_model: str) -> Dict[str, Any]:
+            cache_key = make_cache_key(candidate_provider, candidate_model, prompt, kind="image", **kwargs)
+            return await self._dispatch(
+                candidate_provider, candidate_model, "generate_image", cache_key,
+                tool_id=tool_id, priority=priority, prompt=prompt, **kwargs
+            )
+
+        return await self._with_failover("generate_image", [(provider, model)] + list(fallbacks or []), attempt)
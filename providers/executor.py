@@ -0,0 +1,203 @@
+"""
+Provider Execution Layer
+Runs blocking provider calls off the event loop in bounded per-provider thread pools
+"""
+import os
+import time
+import asyncio
+import logging
+import functools
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, AsyncIterator
+
+# Setup logging
+logger = logging.getLogger("executor")
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("PROVIDER_MAX_CONCURRENCY", "8"))
+DEFAULT_MAX_QUEUE = int(os.getenv("PROVIDER_MAX_QUEUE", "32"))
+
+
+class ProviderBusyError(Exception):
+    """Raised when a provider's queue is full and the call is shed"""
+
+    def __init__(self, provider: str, retry_after: int):
+        super().__init__(f"Provider '{provider}' is at capacity, retry in {retry_after}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class _ProviderLane:
+    """Concurrency limit, queue and counters for a single provider"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix=f"provider-{name}"
+        )
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.queued = 0
+        self.max_queued_seen = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait_time = 0.0
+        self.total_run_time = 0.0
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.semaphore
+
+    def avg_run_time(self) -> float:
+        finished = self.completed + self.failed
+        return self.total_run_time / finished if finished else 0.0
+
+    def retry_after(self) -> int:
+        """Estimate how long until a queue slot frees up"""
+        backlog = (self.queued + self.active) / max(self.max_concurrency, 1)
+        return max(1, int(round(backlog * (self.avg_run_time() or 1.0))))
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queued_seen": self.max_queued_seen,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_time": self.total_wait_time / finished if finished else 0.0,
+            "avg_run_time": self.avg_run_time()
+        }
+
+
+class ProviderExecutor:
+    """Bounded execution layer for provider calls
+
+    Each provider gets its own thread pool and concurrency limit, so one slow
+    upstream cannot starve the event loop or the other providers. Calls beyond
+    the limit wait in a bounded queue; once that is full ProviderBusyError is
+    raised so the caller can answer 503 with Retry-After.
+    """
+
+    def __init__(self,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 max_queue: int = DEFAULT_MAX_QUEUE,
+                 limits: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            max_concurrency: Default number of concurrent calls per provider
+            max_queue: Default number of calls allowed to wait per provider
+            limits: Optional per-provider concurrency overrides
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.limits = limits or {}
+        self._lanes: Dict[str, _ProviderLane] = {}
+
+    def _get_lane(self, provider: str) -> _ProviderLane:
+        lane = self._lanes.get(provider)
+        if lane is None:
+            env_key = provider.upper()
+            max_concurrency = self.limits.get(
+                provider,
+                int(os.getenv(f"PROVIDER_MAX_CONCURRENCY_{env_key}", self.max_concurrency))
+            )
+            max_queue = int(os.getenv(f"PROVIDER_MAX_QUEUE_{env_key}", self.max_queue))
+            lane = _ProviderLane(provider, max_concurrency, max_queue)
+            self._lanes[provider] = lane
+        return lane
+
+    def check_capacity(self, provider: str):
+        """
+        Fail fast if a provider's queue is already full
+
+        Raises:
+            ProviderBusyError: If the provider's queue is full
+        """
+        lane = self._get_lane(provider)
+        if lane.get_semaphore().locked() and lane.queued >= lane.max_queue:
+            lane.rejected += 1
+            retry_after = lane.retry_after()
+            logger.warning(f"Shedding call to {provider}: {lane.queued} queued, retry after {retry_after}s")
+            raise ProviderBusyError(provider, retry_after)
+
+    @asynccontextmanager
+    async def slot(self, provider: str) -> AsyncIterator[None]:
+        """
+        Hold one of the provider's concurrency slots for the duration of the block
+
+        Used directly for long-lived calls such as streams; run() is built on it.
+
+        Raises:
+            ProviderBusyError: If the provider's queue is full
+        """
+        self.check_capacity(provider)
+        lane = self._get_lane(provider)
+        semaphore = lane.get_semaphore()
+
+        enqueued_at = time.monotonic()
+        lane.queued += 1
+        lane.max_queued_seen = max(lane.max_queued_seen, lane.queued)
+        try:
+            await semaphore.acquire()
+        finally:
+            lane.queued -= 1
+
+        started_at = time.monotonic()
+        lane.total_wait_time += started_at - enqueued_at
+        lane.active += 1
+        try:
+            yield
+            lane.completed += 1
+        except BaseException:
+            lane.failed += 1
+            raise
+        finally:
+            lane.active -= 1
+            lane.total_run_time += time.monotonic() - started_at
+            semaphore.release()
+
+    async def run(self, provider: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a provider call within the provider's concurrency limit
+
+        Blocking callables run in the provider's thread pool; coroutine
+        functions are awaited directly on the loop.
+
+        Args:
+            provider: Provider name used to pick the lane
+            func: Provider method to call
+            *args, **kwargs: Arguments for the call
+
+        Returns:
+            Whatever the provider call returns
+
+        Raises:
+            ProviderBusyError: If the provider's queue is full
+        """
+        async with self.slot(provider):
+            if asyncio.iscoroutinefunction(func):
+                return await func(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_lane(provider).pool, functools.partial(func, *args, **kwargs)
+            )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get queue depth and throughput counters for every provider"""
+        return {name: lane.stats() for name, lane in self._lanes.items()}
+
+    def shutdown(self, wait: bool = True):
+        """Shut down all provider thread pools"""
+        for lane in self._lanes.values():
+            lane.pool.shutdown(wait=wait)
+        self._lanes.clear()
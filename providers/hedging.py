@@ -0,0 +1,206 @@
+"""
+Hedged Requests
+Races a backup request against a slow primary for latency-critical tools
+"""
+import os
+import time
+import asyncio
+import logging
+from collections.abc import Mapping
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple, Hashable, Set
+
+from providers.latency import LatencyHistogram, LatencyTracker
+from providers.logs import log_event
+
+# Setup logging
+logger = logging.getLogger("hedging")
+
+
+class _HedgeStats:
+    """Hedging counters for one tool"""
+
+    def __init__(self):
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        # Tokens reported by losing attempts that finished anyway
+        self.loser_tokens = 0
+        # The same, plus the estimate of every loser cancelled mid-call
+        self.loser_tokens_estimate = 0
+        self.end_to_end = LatencyHistogram()
+        self.primary_key: Optional[Hashable] = None
+
+
+class Hedger:
+    """Issues a backup request when the primary exceeds its observed p90 latency
+
+    The hedge delay for a (provider, model) is its p90 from the shared latency
+    tracker, clamped to [min_delay, max_delay]; until enough samples exist
+    default_delay is used. Each tool has a hedge budget: once the share of its
+    requests that fired a hedge reaches max_hedge_rate, further requests wait
+    on the primary alone.
+
+    The losing attempt is cancelled, which only stops the upstream request for
+    native async clients; a blocking call keeps running in its executor thread
+    and is billed in full, so the dispatcher only hedges async providers.
+    Losers cannot report what a cancelled call cost, so the extra spend is
+    reported twice: tokens from losers that finished, and that plus the
+    caller's estimate for each loser cancelled mid-call. The p99 comparison
+    only counts successful requests on both sides, since the baseline comes
+    from successful primary calls.
+    """
+
+    def __init__(self,
+                 latencies: LatencyTracker,
+                 min_samples: int = 20,
+                 default_delay: float = 5.0,
+                 min_delay: float = 0.5,
+                 max_delay: float = 30.0):
+        self.latencies = latencies
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._stats: Dict[str, _HedgeStats] = {}
+
+    @classmethod
+    def from_env(cls, latencies: LatencyTracker) -> "Hedger":
+        """Build a hedger configured from HEDGE_* environment variables"""
+        return cls(
+            latencies,
+            min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+            default_delay=float(os.getenv("HEDGE_DEFAULT_DELAY", "5")),
+            min_delay=float(os.getenv("HEDGE_MIN_DELAY", "0.5")),
+            max_delay=float(os.getenv("HEDGE_MAX_DELAY", "30"))
+        )
+
+    def hedge_delay(self, primary_key: Hashable) -> float:
+        """Get how long to wait on the primary before firing the hedge"""
+        p90 = self.latencies.percentile(primary_key, 90, min_samples=self.min_samples)
+        if p90 is None:
+            return self.default_delay
+        return min(max(p90, self.min_delay), self.max_delay)
+
+    def _get_stats(self, name: str) -> _HedgeStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = _HedgeStats()
+        return stats
+
+    async def race(self,
+                   name: str,
+                   primary_key: Hashable,
+                   primary: Callable[[], Awaitable[Dict[str, Any]]],
+                   secondary: Callable[[], Awaitable[Dict[str, Any]]],
+                   max_hedge_rate: float = 0.1,
+                   estimated_tokens: int = 0) -> Dict[str, Any]:
+        """
+        Run the primary call, hedging with the secondary if it is slow
+
+        Args:
+            name: Budget bucket, usually the tool ID
+            primary_key: Latency tracker key of the primary (provider, model)
+            primary: Zero-argument coroutine function for the primary call
+            secondary: Zero-argument coroutine function for the backup call
+            max_hedge_rate: Largest share of requests allowed to fire a hedge
+            estimated_tokens: Expected tokens of one attempt, charged for a loser cancelled mid-call
+
+        Returns:
+            The first successful result; "hedged" is True when the backup won
+        """
+        stats = self._get_stats(name)
+        stats.requests += 1
+        stats.primary_key = primary_key
+        start_time = time.monotonic()
+
+        primary_task = asyncio.ensure_future(primary())
+        tasks = {primary_task}
+        winner: Optional[asyncio.Future] = None
+        succeeded = False
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(primary_key))
+            within_budget = stats.hedges < max_hedge_rate * stats.requests
+            if done or not within_budget:
+                winner = primary_task
+                result = await primary_task
+                succeeded = not isinstance(result, Mapping) or bool(result.get("success"))
+                return result
+
+            stats.hedges += 1
+            log_event(logger, "hedge.fired", name=name, primary=primary_key, delay=round(self.hedge_delay(primary_key), 3))
+            secondary_task = asyncio.ensure_future(secondary())
+            tasks.add(secondary_task)
+
+            pending = set(tasks)
+            last_result = None
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    result = task.result()
+                    if not isinstance(result, Mapping) or result.get("success"):
+                        winner = task
+                        succeeded = True
+                        if task is secondary_task:
+                            stats.hedge_wins += 1
+                            result["hedged"] = True
+                        return result
+                    last_result = result
+
+            if last_result is not None:
+                return last_result
+            raise last_error
+        finally:
+            # The loser (or everything, if the caller went away) is cancelled
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            if len(tasks) > 1:
+                self._charge_losers(stats, tasks, winner, estimated_tokens)
+            if succeeded:
+                stats.end_to_end.record(time.monotonic() - start_time)
+
+    @staticmethod
+    def _charge_losers(stats: _HedgeStats,
+                       tasks: Set[asyncio.Future],
+                       winner: Optional[asyncio.Future],
+                       estimated_tokens: int):
+        for task in tasks:
+            if task is winner:
+                continue
+            # Tasks cancelled just now are not done until the loop runs them again
+            if not task.done() or task.cancelled():
+                stats.loser_tokens_estimate += estimated_tokens
+                continue
+            if task.exception() is not None:
+                continue
+            result = task.result()
+            tokens = (result.get("tokens") or {}).get("total") if isinstance(result, Mapping) else None
+            if tokens:
+                stats.loser_tokens += tokens
+                stats.loser_tokens_estimate += tokens
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get hedge rate, win rate, the losers' token spend and the p99 latency change for every tool"""
+        report = {}
+        for name, stats in self._stats.items():
+            baseline = self.latencies.get(stats.primary_key) if stats.primary_key else None
+            baseline_p99 = baseline.percentile(99) if baseline else None
+            hedged_p99 = stats.end_to_end.percentile(99)
+            report[name] = {
+                "requests": stats.requests,
+                "hedges": stats.hedges,
+                "hedge_rate": stats.hedges / stats.requests if stats.requests else 0.0,
+                "hedge_wins": stats.hedge_wins,
+                # Every hedge is one extra upstream call
+                "extra_calls": stats.hedges,
+                "loser_tokens": stats.loser_tokens,
+                "loser_tokens_estimate": stats.loser_tokens_estimate,
+                "primary_p99": baseline_p99,
+                "hedged_p99": hedged_p99,
+                "p99_improvement": baseline_p99 - hedged_p99 if baseline_p99 is not None and hedged_p99 is not None else None
+            }
+        return report
@@ -0,0 +1,165 @@
+"""
+Shared HTTP Clients
+Long-lived, pooled HTTP clients shared by the provider integrations
+"""
+import os
+import json
+import logging
+from typing import Dict, AsyncIterator, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Setup logging
+logger = logging.getLogger("http_client")
+
+try:
+    import h2  # noqa: F401
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+# Pool configuration
+MAX_CONNECTIONS = int(os.getenv("PROVIDER_HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("PROVIDER_HTTP_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("PROVIDER_HTTP_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.getenv("PROVIDER_HTTP_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("PROVIDER_HTTP_READ_TIMEOUT", "120"))
+# Short metadata calls such as model listings
+METADATA_TIMEOUT = float(os.getenv("PROVIDER_HTTP_METADATA_TIMEOUT", "10"))
+
+_async_clients: Dict[str, httpx.AsyncClient] = {}
+_sessions: Dict[str, requests.Session] = {}
+
+
+def get_pool_limits() -> httpx.Limits:
+    """Get the connection pool limits for provider clients"""
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+
+
+def get_default_timeout() -> httpx.Timeout:
+    """Get the default timeout for provider clients"""
+    return httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def request_timeout(timeout: Optional[Tuple[float, float]] = None) -> Tuple[float, float]:
+    """
+    Get the (connect, read) timeout for a blocking requests call
+
+    Args:
+        timeout: Optional (connect, read) timeout, usually from the TimeoutManager
+
+    Returns:
+        The given timeout, or the configured defaults so no call can hang forever
+    """
+    return timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+
+def httpx_timeout(timeout: Optional[Tuple[float, float]] = None) -> httpx.Timeout:
+    """Convert an optional (connect, read) timeout into an httpx.Timeout"""
+    if timeout is None:
+        return get_default_timeout()
+    connect, read = timeout
+    return httpx.Timeout(read, connect=connect)
+
+
+def get_async_client(name: str, http2: bool = True) -> httpx.AsyncClient:
+    """
+    Get the shared async client for a provider, creating it on first use
+
+    Args:
+        name: Provider name the client is shared under
+        http2: Whether the upstream supports HTTP/2
+
+    Returns:
+        A long-lived httpx.AsyncClient with keep-alive connection pooling
+    """
+    client = _async_clients.get(name)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=http2 and HAS_HTTP2,
+            limits=get_pool_limits(),
+            timeout=get_default_timeout()
+        )
+        _async_clients[name] = client
+        logger.info(f"Created shared HTTP client for {name} (http2={http2 and HAS_HTTP2})")
+    return client
+
+
+def get_session(name: str) -> requests.Session:
+    """
+    Get the shared blocking session for a provider, creating it on first use
+
+    Args:
+        name: Provider name the session is shared under
+
+    Returns:
+        A requests.Session whose connection pool is reused across calls
+    """
+    session = _sessions.get(name)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=MAX_KEEPALIVE_CONNECTIONS,
+            pool_maxsize=MAX_CONNECTIONS
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _sessions[name] = session
+    return session
+
+
+async def iter_sse_data(response: httpx.Response) -> AsyncIterator[str]:
+    """
+    Yield the data payload of each Server-Sent Event in a streamed response
+
+    Comment lines (used by some upstreams as keep-alives) are skipped and
+    multi-line data fields are joined with newlines.
+    """
+    data_lines = []
+    async for line in response.aiter_lines():
+        if not line:
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+            continue
+        if line.startswith(":"):
+            continue
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+    if data_lines:
+        yield "\n".join(data_lines)
+
+
+async def iter_chat_deltas(response: httpx.Response) -> AsyncIterator[str]:
+    """Yield content deltas from an OpenAI-compatible streamed chat completion"""
+    async for data in iter_sse_data(response):
+        if data == "[DONE]":
+            break
+        chunk = json.loads(data)
+        if "error" in chunk:
+            error = chunk["error"]
+            raise RuntimeError(error.get("message", str(error)) if isinstance(error, dict) else str(error))
+        choices = chunk.get("choices") or [{}]
+        content = choices[0].get("delta", {}).get("content")
+        if content:
+            yield content
+
+
+async def close_clients():
+    """Close every shared client and session"""
+    for name, client in list(_async_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.error(f"Error closing HTTP client for {name}: {e}")
+    _async_clients.clear()
+
+    for session in _sessions.values():
+        session.close()
+    _sessions.clear()
@@ -3,11 +3,16 @@ Hugging Face Provider Integration
 Handles API calls to Hugging Face for AI model inference
 """
 import os
-import requests
 import time
 import json
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+
+from providers.http_client import get_async_client, get_session, iter_sse_data, request_timeout, httpx_timeout, METADATA_TIMEOUT
+from providers.rate_limiter import parse_rate_limit_headers
+from providers.result import GenerationResult
+from providers.warmup import model_warmth
+from providers.media import media_store, MEDIA_CHUNK_SIZE
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -24,134 +29,311 @@ class HuggingFaceProvider:
         
         self.base_url = "https://api-inference.huggingface.co/models"
         self.headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        # Load state of hosted models, shared across instances
+        self.warmth = model_warmth
+        # Generated images are streamed into the shared media store
+        self.media = media_store
+    
+    @property
+    def session(self):
+        """Shared keep-alive session for blocking calls"""
+        return get_session("huggingface")
+    
+    @property
+    def async_client(self):
+        """Shared pooled client for async calls"""
+        return get_async_client("huggingface")
+    
+    def _should_wait(self, model: str, wait_for_model: Optional[bool]) -> bool:
+        """Wait for a model known to be loading instead of taking another 503"""
+        if wait_for_model is not None:
+            return wait_for_model
+        return self.warmth.is_warm(model) is False
+    
+    def _wait_timeout(self, model: str, timeout: Optional[Tuple[float, float]]) -> Optional[Tuple[float, float]]:
+        """Stretch the read timeout by the model's expected load time"""
+        if timeout is None:
+            return None
+        connect, read = timeout
+        return connect, read + self.warmth.estimated_wait(model)
+    
+    def _options(self, wait: bool) -> Dict[str, Any]:
+        return {"options": {"wait_for_model": True}} if wait else {}
+    
+    def _text_payload(self, prompt: str, max_tokens: int, temperature: float, wait: bool = False, **kwargs) -> Dict[str, Any]:
+        """Build the request payload for text generation"""
+        return {
+            "inputs": prompt,
+            "parameters": {
+                "max_new_tokens": max_tokens,
+                "temperature": temperature,
+                "return_full_text": False,
+                **kwargs
+            },
+            **self._options(wait)
+        }
+    
+    def _http_error_result(self, response, model: str, start_time: float) -> GenerationResult:
+        """Turn a non-200 response into a result dict, noting cold starts"""
+        logger.error(f"Error from Hugging Face API: {response.status_code} - {response.text}")
+        result = GenerationResult(
+            success=False,
+            error=f"Hugging Face API error: {response.status_code}",
+            response_time=time.time() - start_time,
+            model=model,
+            provider="huggingface",
+            status_code=response.status_code,
+            rate_limit=parse_rate_limit_headers(response.headers, response.status_code)
+        )
+        
+        # A 503 with estimated_time means the model is being loaded
+        if response.status_code == 503:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if isinstance(body, dict) and "estimated_time" in body:
+                estimated_time = float(body["estimated_time"])
+                self.warmth.mark_loading(model, estimated_time)
+                result["error"] = f"Hugging Face model {model} is loading, ready in about {estimated_time:.0f}s"
+                result["loading"] = True
+                result["estimated_time"] = estimated_time
+        return result
+    
+    def _text_result(self, response, model: str, start_time: float) -> GenerationResult:
+        """Turn a text generation HTTP response into a result dict"""
+        # Check for errors
+        if response.status_code != 200:
+            return self._http_error_result(response, model, start_time)
+        
+        self.warmth.mark_warm(model)
+        result = response.json()
+        
+        # Handle different response formats
+        generated_text = ""
+        if isinstance(result, list) and len(result) > 0:
+            if "generated_text" in result[0]:
+                generated_text = result[0]["generated_text"]
+            else:
+                generated_text = result[0].get("text", "")
+        elif "generated_text" in result:
+            generated_text = result["generated_text"]
+        
+        return GenerationResult(
+            success=True,
+            text=generated_text,
+            model=model,
+            provider="huggingface",
+            response_time=time.time() - start_time,
+            raw_response=result
+        )
+    
+    def _error_result(self, error: Exception, model: str, start_time: float) -> GenerationResult:
+        """Build a result dict for a failed call"""
+        return GenerationResult(
+            success=False,
+            error=str(error),
+            error_type=type(error).__name__,
+            response_time=time.time() - start_time,
+            model=model,
+            provider="huggingface"
+        )
     
     def generate_text(self, 
                      prompt: str, 
                      model: str = "mistralai/Mistral-7B-Instruct-v0.2", 
                      max_tokens: int = 1000, 
                      temperature: float = 0.7, 
+                     wait_for_model: Optional[bool] = None, 
+                     timeout: Optional[Tuple[float, float]] = None, 
                      **kwargs) -> Dict[str, Any]:
         """Generate text using Hugging Face text generation models"""
         start_time = time.time()
+        wait = self._should_wait(model, wait_for_model)
         
         try:
-            url = f"{self.base_url}/{model}"
-            payload = {
-                "inputs": prompt,
-                "parameters": {
-                    "max_new_tokens": max_tokens,
-                    "temperature": temperature,
-                    "return_full_text": False,
-                    **kwargs
-                }
-            }
+            response = self.session.post(
+                f"{self.base_url}/{model}", 
+                headers=self.headers, 
+                json=self._text_payload(prompt, max_tokens, temperature, wait, **kwargs),
+                timeout=request_timeout(self._wait_timeout(model, timeout) if wait else timeout)
+            )
+            return self._text_result(response, model, start_time)
             
-            response = requests.post(
-                url, 
+        except Exception as e:
+            logger.error(f"Error generating text with Hugging Face: {e}")
+            return self._error_result(e, model, start_time)
+    
+    async def agenerate_text(self, 
+                     prompt: str, 
+                     model: str = "mistralai/Mistral-7B-Instruct-v0.2", 
+                     max_tokens: int = 1000, 
+                     temperature: float = 0.7, 
+                     wait_for_model: Optional[bool] = None, 
+                     timeout: Optional[Tuple[float, float]] = None, 
+                     **kwargs) -> Dict[str, Any]:
+        """Generate text using Hugging Face text generation models without blocking the event loop"""
+        start_time = time.time()
+        wait = self._should_wait(model, wait_for_model)
+        
+        try:
+            response = await self.async_client.post(
+                f"{self.base_url}/{model}", 
                 headers=self.headers, 
-                json=payload
+                json=self._text_payload(prompt, max_tokens, temperature, wait, **kwargs),
+                timeout=httpx_timeout(self._wait_timeout(model, timeout) if wait else timeout)
             )
+            return self._text_result(response, model, start_time)
             
-            # Check for errors
+        except Exception as e:
+            logger.error(f"Error generating text with Hugging Face: {e}")
+            return self._error_result(e, model, start_time)
+    
+    async def astream_text(self, 
+                     prompt: str, 
+                     model: str = "mistralai/Mistral-7B-Instruct-v0.2", 
+                     max_tokens: int = 1000, 
+                     temperature: float = 0.7, 
+                     **kwargs) -> AsyncIterator[str]:
+        """Stream generated tokens from a Text Generation Inference backed model"""
+        payload = self._text_payload(prompt, max_tokens, temperature, self._should_wait(model, None), **kwargs)
+        payload["stream"] = True
+        
+        async with self.async_client.stream(
+            "POST",
+            f"{self.base_url}/{model}",
+            headers=self.headers,
+            json=payload
+        ) as response:
             if response.status_code != 200:
+                await response.aread()
                 logger.error(f"Error from Hugging Face API: {response.status_code} - {response.text}")
-                return {
-                    "success": False,
-                    "error": f"Hugging Face API error: {response.status_code}",
-                    "response_time": time.time() - start_time,
-                    "model": model,
-                    "provider": "huggingface"
-                }
-            
-            result = response.json()
-            
-            # Handle different response formats
-            generated_text = ""
-            if isinstance(result, list) and len(result) > 0:
-                if "generated_text" in result[0]:
-                    generated_text = result[0]["generated_text"]
-                else:
-                    generated_text = result[0].get("text", "")
-            elif "generated_text" in result:
-                generated_text = result["generated_text"]
+                raise RuntimeError(f"Hugging Face API error: {response.status_code}")
             
-            return {
-                "success": True,
-                "text": generated_text,
-                "model": model,
-                "provider": "huggingface",
-                "response_time": time.time() - start_time,
-                "raw_response": result
-            }
-            
-        except Exception as e:
-            logger.error(f"Error generating text with Hugging Face: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "response_time": time.time() - start_time,
-                "model": model,
-                "provider": "huggingface"
-            }
+            async for data in iter_sse_data(response):
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    raise RuntimeError(f"Hugging Face API error: {chunk['error']}")
+                token = chunk.get("token", {})
+                if token.get("text") and not token.get("special"):
+                    yield token["text"]
+    
+    def _image_payload(self, prompt: str, height: int, width: int, wait: bool = False, **kwargs) -> Dict[str, Any]:
+        """Build the request payload for image generation"""
+        return {
+            "inputs": prompt,
+            "parameters": {
+                "height": height,
+                "width": width,
+                **kwargs
+            },
+            **self._options(wait)
+        }
+    
+    def _image_result(self, media_path: str, model: str, start_time: float) -> GenerationResult:
+        """Build the result dict for an image already written to the media store"""
+        self.warmth.mark_warm(model)
+        
+        return GenerationResult(
+            success=True,
+            media_path=media_path,
+            image_url=self.media.url(media_path),
+            model=model,
+            provider="huggingface",
+            response_time=time.time() - start_time
+        )
     
     def generate_image(self, 
                      prompt: str, 
                      model: str = "stabilityai/stable-diffusion-xl-base-1.0", 
                      height: int = 512, 
                      width: int = 512, 
+                     wait_for_model: Optional[bool] = None, 
+                     timeout: Optional[Tuple[float, float]] = None, 
                      **kwargs) -> Dict[str, Any]:
         """Generate image using Hugging Face image generation models"""
         start_time = time.time()
+        wait = self._should_wait(model, wait_for_model)
         
         try:
-            url = f"{self.base_url}/{model}"
-            payload = {
-                "inputs": prompt,
-                "parameters": {
-                    "height": height,
-                    "width": width,
-                    **kwargs
-                }
-            }
-            
-            response = requests.post(
-                url, 
+            # Image response is binary; write it to disk as it arrives instead of buffering it
+            with self.session.post(
+                f"{self.base_url}/{model}", 
                 headers=self.headers, 
-                json=payload
-            )
-            
-            # Image response is binary
-            if response.status_code != 200:
-                logger.error(f"Error from Hugging Face API: {response.status_code} - {response.text}")
-                return {
-                    "success": False,
-                    "error": f"Hugging Face API error: {response.status_code}",
-                    "response_time": time.time() - start_time,
-                    "model": model,
-                    "provider": "huggingface"
-                }
-            
-            # Return binary image data in base64
-            import base64
-            image_data = base64.b64encode(response.content).decode("utf-8")
+                json=self._image_payload(prompt, height, width, wait, **kwargs),
+                timeout=request_timeout(self._wait_timeout(model, timeout) if wait else timeout),
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    return self._http_error_result(response, model, start_time)
+                media_path = self.media.put_chunks(response.iter_content(chunk_size=MEDIA_CHUNK_SIZE))
+            return self._image_result(media_path, model, start_time)
             
-            return {
-                "success": True,
-                "image_data": image_data,
-                "model": model,
-                "provider": "huggingface",
-                "response_time": time.time() - start_time
-            }
+        except Exception as e:
+            logger.error(f"Error generating image with Hugging Face: {e}")
+            return self._error_result(e, model, start_time)
+    
+    async def agenerate_image(self, 
+                     prompt: str, 
+                     model: str = "stabilityai/stable-diffusion-xl-base-1.0", 
+                     height: int = 512, 
+                     width: int = 512, 
+                     wait_for_model: Optional[bool] = None, 
+                     timeout: Optional[Tuple[float, float]] = None, 
+                     **kwargs) -> Dict[str, Any]:
+        """Generate image using Hugging Face image generation models without blocking the event loop"""
+        start_time = time.time()
+        wait = self._should_wait(model, wait_for_model)
+        
+        try:
+            async with self.async_client.stream(
+                "POST",
+                f"{self.base_url}/{model}", 
+                headers=self.headers, 
+                json=self._image_payload(prompt, height, width, wait, **kwargs),
+                timeout=httpx_timeout(self._wait_timeout(model, timeout) if wait else timeout)
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    return self._http_error_result(response, model, start_time)
+                media_path = await self.media.aput_chunks(response.aiter_bytes(MEDIA_CHUNK_SIZE))
+            return self._image_result(media_path, model, start_time)
             
         except Exception as e:
             logger.error(f"Error generating image with Hugging Face: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "response_time": time.time() - start_time,
-                "model": model,
-                "provider": "huggingface"
-            }
+            return self._error_result(e, model, start_time)
+    
+    async def aping_model(self, model: str, image: bool = False) -> bool:
+        """
+        Send the cheapest possible request to a model so it gets or stays loaded
+        
+        Args:
+            model: Model ID to ping
+            image: Whether the model is an image generation model
+            
+        Returns:
+            True if the model answered, False if it is loading or failed
+        """
+        if image:
+            payload = self._image_payload("warm-up", 256, 256, num_inference_steps=1)
+        else:
+            payload = self._text_payload("ping", 1, 0.7)
+        
+        try:
+            response = await self.async_client.post(
+                f"{self.base_url}/{model}",
+                headers=self.headers,
+                json=payload
+            )
+        except Exception as e:
+            logger.warning(f"Warm-up ping to {model} failed: {e}")
+            return False
+        
+        if response.status_code == 200:
+            self.warmth.mark_warm(model)
+            return True
+        self._http_error_result(response, model, time.time())
+        return False
     
     def get_available_models(self, task: str = "text-generation") -> List[Dict[str, Any]]:
         """Get available models for a specific task"""
@@ -164,7 +346,7 @@ class HuggingFaceProvider:
                 "limit": 100
             }
             
-            response = requests.get(url, params=params)
+            response = self.session.get(url, params=params, timeout=METADATA_TIMEOUT)
             
             if response.status_code != 200:
                 logger.error(f"Error fetching models: {response.status_code} - {response.text}")
@@ -190,4 +372,4 @@ if __name__ == "__main__":
     # Test the provider
     provider = HuggingFaceProvider()
     result = provider.generate_text("Write a short poem about AI.")
-    print(json.dumps(result, indent=2)) 
\ No newline at end of file
+    print(json.dumps(dict(result), indent=2)) 
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+Image Pipeline
+Re-encodes generated images into metadata-free WebP/AVIF variants and thumbnails in a process pool
+"""
+import io
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+
+from providers.media import MediaStore
+
+# Setup logging
+logger = logging.getLogger("images")
+
+try:
+    from PIL import Image, ImageOps, features
+    HAS_PIL = True
+except ImportError:
+    logger.warning("Pillow not installed, image variants disabled. Install with: pip install pillow")
+    HAS_PIL = False
+
+MIME_TYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png"
+}
+
+EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg", "png": "png"}
+
+# View name -> longest side in pixels; None keeps the original size
+DEFAULT_SIZES = {"full": None, "marketplace": 512, "history": 256}
+
+
+def _parse_sizes(value: str) -> Dict[str, Optional[int]]:
+    """Parse "history:256,marketplace:512" into a sizes dict, always including the full size"""
+    sizes: Dict[str, Optional[int]] = {"full": None}
+    for item in value.split(","):
+        if ":" in item:
+            view, size = item.split(":", 1)
+            sizes[view.strip()] = int(size)
+    return sizes
+
+
+def format_supported(fmt: str) -> bool:
+    """Whether this Pillow build can encode a format"""
+    if not HAS_PIL:
+        return False
+    if fmt in ("jpeg", "png"):
+        return True
+    try:
+        return bool(features.check(fmt))
+    except ValueError:
+        return False
+
+
+def _encode(image, fmt: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    elif fmt == "png":
+        image.save(buffer, format="PNG", optimize=True)
+    elif fmt == "webp":
+        image.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        image.save(buffer, format=fmt.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def render_variants(store: MediaStore,
+                    media_path: str,
+                    sizes: Dict[str, Optional[int]],
+                    formats: Tuple[str, ...],
+                    quality: int) -> Dict[str, Dict[str, str]]:
+    """
+    Encode every size and format of a stored image and store the results
+
+    Runs in a worker process. Only pixel data is copied across, so EXIF, XMP,
+    ICC and PNG text chunks (which can hold the generation prompt) are dropped.
+
+    Args:
+        store: Media store the original lives in and the variants go to
+        media_path: Relative path of the original
+        sizes: View name -> longest side in pixels, None for full size
+        formats: Modern formats to encode, besides the PNG/JPEG fallback
+        quality: Encoder quality for lossy formats
+
+    Returns:
+        View name -> format -> relative media path
+    """
+    with Image.open(store.resolve(media_path)) as source:
+        fallback = "png" if source.format == "PNG" else "jpeg"
+        mode = "RGBA" if "A" in source.getbands() or "transparency" in source.info else "RGB"
+        oriented = ImageOps.exif_transpose(source).convert(mode)
+        image = Image.frombytes(mode, oriented.size, oriented.tobytes())
+
+    variants: Dict[str, Dict[str, str]] = {}
+    for view, size in sizes.items():
+        resized = image
+        if size and max(image.size) > size:
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+        variants[view] = {
+            fmt: store.put(_encode(resized, fmt, quality), EXTENSIONS[fmt])
+            for fmt in formats + (fallback,)
+        }
+        variants[view]["fallback"] = variants[view][fallback]
+    return variants
+
+
+class ImagePipeline:
+    """Post-processing stage for generated images
+
+    Variants are encoded in a process pool so the CPU-heavy work never runs
+    on the event loop, and are written to the media store like any other
+    file. choose() picks the best variant a client accepts.
+    """
+
+    def __init__(self,
+                 media_store: MediaStore,
+                 sizes: Optional[Dict[str, Optional[int]]] = None,
+                 formats: Tuple[str, ...] = ("avif", "webp"),
+                 quality: int = 80,
+                 workers: int = 2,
+                 enabled: bool = True):
+        """
+        Args:
+            media_store: Store holding the originals and the variants
+            sizes: View name -> longest side in pixels, None for full size
+            formats: Modern formats in order of preference; unsupported ones are skipped
+            quality: Encoder quality for lossy formats
+            workers: Number of encoder processes
+            enabled: Whether images are processed at all
+        """
+        self.media_store = media_store
+        self.sizes = sizes or dict(DEFAULT_SIZES)
+        self.formats = tuple(fmt for fmt in formats if format_supported(fmt))
+        self.quality = quality
+        self.workers = workers
+        self.enabled = enabled and HAS_PIL
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        self.processed = 0
+        self.failed = 0
+        self.total_time = 0.0
+
+        skipped = set(formats) - set(self.formats)
+        if self.enabled and skipped:
+            logger.warning(f"Pillow cannot encode {', '.join(sorted(skipped))}; serving {', '.join(self.formats) or 'fallback'} only")
+
+    @classmethod
+    def from_env(cls, media_store: MediaStore) -> "ImagePipeline":
+        """Build a pipeline configured from IMAGE_* environment variables"""
+        return cls(
+            media_store,
+            sizes=_parse_sizes(os.getenv("IMAGE_SIZES", "marketplace:512,history:256")),
+            formats=tuple(f.strip() for f in os.getenv("IMAGE_FORMATS", "avif,webp").split(",") if f.strip()),
+            quality=int(os.getenv("IMAGE_QUALITY", "80")),
+            workers=int(os.getenv("IMAGE_WORKERS", "2")),
+            enabled=os.getenv("IMAGE_PIPELINE_ENABLED", "true").lower() == "true"
+        )
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Created lazily so importing the app does not spawn processes
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def process(self, media_path: str) -> Optional[Dict[str, Dict[str, str]]]:
+        """
+        Build the variants of a stored image
+
+        Returns:
+            View name -> format -> relative media path, or None if disabled or the image could not be decoded
+        """
+        if not self.enabled:
+            return None
+
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            variants = await loop.run_in_executor(
+                self._get_pool(), render_variants,
+                self.media_store, media_path, self.sizes, self.formats, self.quality
+            )
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Could not build variants of {media_path}: {e}")
+            return None
+        self.processed += 1
+        self.total_time += time.monotonic() - started
+        return variants
+
+    def choose(self, variants: Dict[str, Dict[str, str]], view: str, accept: str = "") -> Optional[Tuple[str, str]]:
+        """
+        Pick the variant to serve for a view
+
+        Args:
+            variants: Result of process()
+            view: View name, e.g. "full" or "history"
+            accept: The client's Accept header
+
+        Returns:
+            (relative media path, MIME type), or None if the view does not exist
+        """
+        options = variants.get(view)
+        if not options:
+            return None
+        for fmt in self.formats:
+            if fmt in options and MIME_TYPES[fmt] in accept:
+                return options[fmt], MIME_TYPES[fmt]
+        fallback = options["fallback"]
+        return fallback, MIME_TYPES["png" if fallback.endswith(".png") else "jpeg"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "formats": list(self.formats),
+            "sizes": self.sizes,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_time": self.total_time / self.processed if self.processed else 0.0
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Stop the encoder processes, dropping images still waiting to be encoded"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
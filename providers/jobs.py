@@ -0,0 +1,342 @@
+"""
+Background Jobs
+Durable SQLite-backed queue for long-running generations, run by in-process asyncio workers
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import functools
+import threading
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+
+# Setup logging
+logger = logging.getLogger("jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class JobQueue:
+    """Durable queue of generation jobs
+
+    Submitting a job only writes a row and returns its ID, so the request that
+    asked for a slow image generation can answer straight away. A fixed number
+    of asyncio workers claim queued jobs highest priority first, skipping users
+    who already have max_per_user jobs running, and write the handler's result
+    back to the same row. Jobs left running by a crash or restart are queued
+    again on start, up to max_attempts runs, after which they are failed.
+
+    The workers, and async callers through asubmit/aget/aposition/astats, run
+    the SQLite calls in the default executor so the event loop never blocks
+    on disk.
+    """
+
+    def __init__(self,
+                 db_path: str = "jobs.db",
+                 workers: int = 4,
+                 max_per_user: int = 2,
+                 poll_interval: float = 1.0,
+                 retention: float = 7 * 86400,
+                 max_attempts: int = 3):
+        """
+        Args:
+            db_path: SQLite file holding the jobs table
+            workers: Number of jobs run at once
+            max_per_user: Number of jobs a single user may have running at once
+            poll_interval: Seconds an idle worker waits before looking for work again
+            retention: Seconds finished jobs are kept before being purged on start
+            max_attempts: Runs a job gets before an interrupted one is failed instead of requeued
+        """
+        self.db_path = db_path
+        self.workers = workers
+        self.max_per_user = max_per_user
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.max_attempts = max_attempts
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._abandon_handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        self._lock = threading.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.recovered = 0
+        self.abandoned = 0
+
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, user_id TEXT NOT NULL, "
+            "params TEXT NOT NULL, priority REAL NOT NULL DEFAULT 0, status TEXT NOT NULL, "
+            "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, created_at)")
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        """Build a queue configured from JOB_* environment variables"""
+        return cls(
+            db_path=os.getenv("JOB_QUEUE_DB", "jobs.db"),
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            max_per_user=int(os.getenv("JOB_MAX_PER_USER", "2")),
+            poll_interval=float(os.getenv("JOB_POLL_INTERVAL", "1.0")),
+            retention=float(os.getenv("JOB_RETENTION", str(7 * 86400))),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        )
+
+    def register(self, kind: str, handler: JobHandler, on_abandon: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Register the coroutine that runs jobs of a kind
+
+        Args:
+            kind: Job kind passed to submit()
+            handler: Coroutine function taking the job's params and returning its result
+            on_abandon: Optional callback given the params of a job failed after max_attempts interrupted runs
+        """
+        self._handlers[kind] = handler
+        if on_abandon is not None:
+            self._abandon_handlers[kind] = on_abandon
+
+    def submit(self, kind: str, params: Dict[str, Any], user_id: str, priority: float = 0.0) -> str:
+        """
+        Queue a job
+
+        Args:
+            kind: Registered job kind
+            params: JSON-serializable parameters for the handler
+            user_id: Owner of the job, used for the per-user cap and access checks
+            priority: Higher runs first
+
+        Returns:
+            The new job's ID
+        """
+        job_id = self._insert(kind, params, user_id, priority)
+        self._wake()
+        return job_id
+
+    async def asubmit(self, kind: str, params: Dict[str, Any], user_id: str, priority: float = 0.0) -> str:
+        """Queue a job from the event loop; see submit()"""
+        job_id = await self._blocking(self._insert, kind, params, user_id, priority)
+        self._wake()
+        return job_id
+
+    async def aget(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a job from the event loop; see get()"""
+        return await self._blocking(self.get, job_id)
+
+    async def aposition(self, job_id: str) -> Optional[int]:
+        """Queue position from the event loop; see position()"""
+        return await self._blocking(self.position, job_id)
+
+    async def astats(self) -> Dict[str, Any]:
+        """Job counts from the event loop; see stats()"""
+        return await self._blocking(self.stats)
+
+    async def _blocking(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking SQLite call in the default executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    def _insert(self, kind: str, params: Dict[str, Any], user_id: str, priority: float) -> str:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, user_id, params, priority, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, user_id, json.dumps(params, default=str), priority, QUEUED, time.time())
+            )
+            self._db.commit()
+            self.submitted += 1
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a job
+
+        Returns:
+            The job with decoded params and result, or None if it does not exist
+        """
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Number of queued jobs that will be claimed before this one, or None if it is not queued"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*) FROM jobs j, jobs me WHERE me.id = ? AND me.status = ? AND j.status = ? "
+                "AND (j.priority > me.priority OR (j.priority = me.priority AND j.created_at < me.created_at))",
+                (job_id, QUEUED, QUEUED)
+            ).fetchone()
+            queued = self._db.execute(
+                "SELECT 1 FROM jobs WHERE id = ? AND status = ?", (job_id, QUEUED)
+            ).fetchone()
+        return row[0] if queued else None
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Mark the best runnable job as running and return it"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs j WHERE j.status = ? AND "
+                "(SELECT COUNT(*) FROM jobs r WHERE r.user_id = j.user_id AND r.status = ?) < ? "
+                "ORDER BY j.priority DESC, j.created_at ASC LIMIT 1",
+                (QUEUED, RUNNING, self.max_per_user)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (RUNNING, time.time(), row["id"])
+            )
+            self._db.commit()
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def _finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (
+                    FAILED if error else SUCCEEDED,
+                    json.dumps(dict(result), default=str) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id
+                )
+            )
+            self._db.commit()
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run_job(self, job: Dict[str, Any]):
+        handler = self._handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind '{job['kind']}'")
+            result = await handler(job["params"])
+        except asyncio.CancelledError:
+            # Shutting down: leave the job running so it is queued again on start
+            raise
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['kind']}) failed: {e}")
+            self.failed += 1
+            await self._blocking(self._finish, job["id"], error=str(e) or type(e).__name__)
+        else:
+            self.succeeded += 1
+            await self._blocking(self._finish, job["id"], result=result)
+        finally:
+            # A finished job may have been holding back another job of the same user
+            self._wake()
+
+    async def _worker(self):
+        while True:
+            job = await self._blocking(self._claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run_job(job)
+
+    def recover(self) -> int:
+        """Queue jobs left running by a previous process again and purge old finished jobs
+
+        A job that has already been started max_attempts times is probably what
+        took the process down, so it is failed rather than run again.
+        """
+        with self._lock:
+            abandoned = self._db.execute(
+                "SELECT id, kind, params, attempts FROM jobs WHERE status = ? AND attempts >= ?",
+                (RUNNING, self.max_attempts)
+            ).fetchall()
+            for row in abandoned:
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (FAILED, f"Interrupted {row['attempts']} times, giving up", time.time(), row["id"])
+                )
+            recovered = self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (QUEUED, RUNNING)
+            ).rowcount
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, time.time() - self.retention)
+            )
+            self._db.commit()
+        for row in abandoned:
+            logger.error(f"Job {row['id']} ({row['kind']}) failed after {row['attempts']} interrupted attempts")
+            on_abandon = self._abandon_handlers.get(row["kind"])
+            if on_abandon is not None:
+                try:
+                    on_abandon(json.loads(row["params"]))
+                except Exception as e:
+                    logger.error(f"Abandon handler for job {row['id']} failed: {e}")
+        self.abandoned += len(abandoned)
+        self.failed += len(abandoned)
+        if recovered:
+            logger.info(f"Requeued {recovered} interrupted jobs")
+        self.recovered += recovered
+        return recovered
+
+    def start(self):
+        """Recover interrupted jobs and start the workers"""
+        if self._tasks:
+            return
+        self.recover()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Started {self.workers} job workers")
+
+    async def stop(self):
+        """Stop the workers; jobs they were running are picked up again on the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Get job counts by status and worker counters"""
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "workers": len(self._tasks),
+            "max_per_user": self.max_per_user,
+            "max_attempts": self.max_attempts,
+            "jobs": counts,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "recovered": self.recovered,
+            "abandoned": self.abandoned
+        }
+
+    def close(self):
+        """Close the SQLite file"""
+        with self._lock:
+            self._db.close()
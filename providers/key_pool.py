@@ -0,0 +1,174 @@
+"""
+API Key Pools
+Spreads provider calls across several API keys and quarantines failing ones
+"""
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Callable
+
+# Setup logging
+logger = logging.getLogger("key_pool")
+
+STRATEGIES = ("least_outstanding", "budget")
+
+
+def mask_key(api_key: Optional[str]) -> str:
+    """Label an API key for logs and reports without revealing it"""
+    return "default" if not api_key else f"...{api_key[-4:]}"
+
+
+class _PooledKey:
+    """Usage counters and quarantine state for one API key"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.outstanding = 0
+        self.calls = 0
+        self.failures = 0
+        self.quarantines = 0
+        self.quarantined_until = 0.0
+        self.last_status: Optional[int] = None
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "outstanding": self.outstanding,
+            "calls": self.calls,
+            "failures": self.failures,
+            "quarantines": self.quarantines,
+            "quarantined_for": max(0.0, self.quarantined_until - now),
+            "last_status": self.last_status
+        }
+
+
+class ApiKeyPool:
+    """Pool of API keys for one provider
+
+    Each call checks out the healthiest key: the one with the fewest calls in
+    flight, or with "budget" the one with the most rate limit headroom.
+    A 401/403 quarantines a key for auth_quarantine seconds and a 429 for its
+    Retry-After (or throttle_quarantine). When every key is quarantined the
+    one released soonest is used rather than failing outright.
+    """
+
+    def __init__(self,
+                 provider: str,
+                 keys: List[str],
+                 strategy: str = "least_outstanding",
+                 auth_quarantine: float = 3600.0,
+                 throttle_quarantine: float = 60.0):
+        """
+        Args:
+            provider: Provider name
+            keys: API keys in the pool
+            strategy: "least_outstanding" or "budget"
+            auth_quarantine: Seconds a rejected key is taken out of rotation
+            throttle_quarantine: Seconds a throttled key rests without Retry-After
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown key selection strategy '{strategy}'")
+        self.provider = provider
+        self.strategy = strategy
+        self.auth_quarantine = auth_quarantine
+        self.throttle_quarantine = throttle_quarantine
+        self._keys = [_PooledKey(key) for key in dict.fromkeys(keys)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def acquire(self, headroom: Optional[Callable[[str], float]] = None) -> str:
+        """
+        Check out a key for one call; release() must be called when it finishes
+
+        Args:
+            headroom: Returns a key's remaining rate limit share (0..1), used by "budget"
+
+        Returns:
+            The API key to use
+        """
+        now = time.monotonic()
+        with self._lock:
+            available = [entry for entry in self._keys if entry.quarantined_until <= now]
+            if not available:
+                entry = min(self._keys, key=lambda e: e.quarantined_until)
+            elif self.strategy == "budget" and headroom is not None:
+                entry = max(available, key=lambda e: (headroom(e.key), -e.outstanding))
+            else:
+                entry = min(available, key=lambda e: (e.outstanding, e.calls))
+            entry.outstanding += 1
+            entry.calls += 1
+            return entry.key
+
+    def release(self, key: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        """
+        Return a key after its call and quarantine it if it was rejected
+
+        Args:
+            key: Key returned by acquire()
+            status_code: Upstream HTTP status of a failed call, if known
+            retry_after: Seconds the upstream asked us to back off
+        """
+        with self._lock:
+            entry = next((e for e in self._keys if e.key == key), None)
+            if entry is None:
+                return
+            entry.outstanding = max(0, entry.outstanding - 1)
+            entry.last_status = status_code
+            if status_code is None or status_code < 400:
+                return
+
+            entry.failures += 1
+            if status_code in (401, 403):
+                duration = self.auth_quarantine
+            elif status_code == 429:
+                duration = retry_after or self.throttle_quarantine
+            else:
+                return
+            entry.quarantines += 1
+            entry.quarantined_until = time.monotonic() + duration
+        logger.warning(f"Quarantined {self.provider} key {mask_key(key)} for {duration:.0f}s after HTTP {status_code}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get usage and quarantine state for every key"""
+        now = time.monotonic()
+        with self._lock:
+            return {mask_key(entry.key): entry.to_dict(now) for entry in self._keys}
+
+
+class ApiKeyPools:
+    """Key pools for every provider configured with more than one key"""
+
+    def __init__(self, pools: Optional[Dict[str, ApiKeyPool]] = None):
+        self._pools = pools or {}
+
+    @classmethod
+    def from_env(cls, providers: List[str]) -> "ApiKeyPools":
+        """
+        Build pools from <PROVIDER>_API_KEYS (comma separated) plus <PROVIDER>_API_KEY
+
+        Providers left with a single key get no pool and keep using their default instance.
+        """
+        strategy = os.getenv("API_KEY_POOL_STRATEGY", "least_outstanding")
+        auth_quarantine = float(os.getenv("API_KEY_AUTH_QUARANTINE", "3600"))
+        throttle_quarantine = float(os.getenv("API_KEY_THROTTLE_QUARANTINE", "60"))
+        pools = {}
+        for provider in providers:
+            prefix = provider.upper()
+            keys = [key.strip() for key in os.getenv(f"{prefix}_API_KEYS", "").split(",") if key.strip()]
+            single = os.getenv(f"{prefix}_API_KEY")
+            if single and single not in keys:
+                keys.insert(0, single)
+            if len(keys) > 1:
+                pools[provider] = ApiKeyPool(provider, keys, strategy, auth_quarantine, throttle_quarantine)
+                logger.info(f"Using a pool of {len(keys)} API keys for {provider} ({strategy})")
+        return cls(pools)
+
+    def get(self, provider: str) -> Optional[ApiKeyPool]:
+        """Get a provider's key pool, or None if it uses a single key"""
+        return self._pools.get(provider)
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Get per-key usage for every pool"""
+        return {provider: pool.stats() for provider, pool in self._pools.items()}
@@ -0,0 +1,103 @@
+"""
+Latency Tracking
+Streaming latency histograms per provider call key
+"""
+import bisect
+import threading
+from typing import Dict, Any, Optional, Hashable, List
+
+# Bucket upper bounds from 50 ms growing by 25% per bucket up to ~5 minutes
+BUCKET_BOUNDS: List[float] = [0.05 * (1.25 ** i) for i in range(40)]
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with exponential forgetting
+
+    Recording is O(log buckets) and percentiles are O(buckets), so it is
+    cheap enough to update on every call. When the total weight exceeds
+    max_count all buckets are halved, which keeps the histogram biased
+    towards recent traffic.
+    """
+
+    def __init__(self, max_count: int = 1000):
+        self.max_count = max_count
+        self.counts = [0.0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0.0
+        self.samples = 0
+
+    def record(self, seconds: float):
+        """Record one observed latency in seconds"""
+        index = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        self.counts[index] += 1
+        self.total += 1
+        self.samples += 1
+        if self.total > self.max_count:
+            self.counts = [count / 2 for count in self.counts]
+            self.total /= 2
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Estimate a latency percentile
+
+        Args:
+            q: Percentile between 0 and 100
+
+        Returns:
+            Upper bound of the bucket holding the percentile, or None if empty
+        """
+        if self.total <= 0:
+            return None
+        target = self.total * q / 100.0
+        cumulative = 0.0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and count > 0:
+                return BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else BUCKET_BOUNDS[-1]
+        return BUCKET_BOUNDS[-1]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99)
+        }
+
+
+class LatencyTracker:
+    """Latency histograms keyed by an arbitrary hashable key such as (provider, model)"""
+
+    def __init__(self, max_count: int = 1000):
+        self.max_count = max_count
+        self._histograms: Dict[Hashable, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable, seconds: float):
+        """Record a latency observation for a key"""
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram(self.max_count)
+            histogram.record(seconds)
+
+    def get(self, key: Hashable) -> Optional[LatencyHistogram]:
+        """Get the histogram for a key, if any calls have been recorded"""
+        return self._histograms.get(key)
+
+    def keys(self) -> List[Hashable]:
+        """Get every key with recorded calls"""
+        return list(self._histograms)
+
+    def percentile(self, key: Hashable, q: float, min_samples: int = 1) -> Optional[float]:
+        """Get a percentile for a key, or None without enough samples"""
+        histogram = self._histograms.get(key)
+        if histogram is None or histogram.samples < min_samples:
+            return None
+        return histogram.percentile(q)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get percentile summaries for every key"""
+        return {
+            "/".join(str(part) for part in key) if isinstance(key, tuple) else str(key): histogram.summary()
+            for key, histogram in list(self._histograms.items())
+        }
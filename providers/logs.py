@@ -0,0 +1,196 @@
+"""
+Provider Logging
+Structured, sampled log events for provider calls, written from a background queue
+"""
+import os
+import copy
+import json
+import queue
+import random
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Optional
+
+
+def _parse_rates(value: str) -> Dict[str, float]:
+    """Parse "cache.hit=0.1,openrouter.request=0.01" into per-event sampling rates"""
+    rates = {}
+    for item in value.split(","):
+        if "=" in item:
+            event, rate = item.split("=", 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+class EventSampler:
+    """Per-event sampling rates for high-volume log events
+
+    Events without a configured rate are always logged. Full payloads are
+    logged at DEBUG, or for payload_rate of calls when INFO is enabled.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, payload_rate: float = 0.0):
+        """
+        Args:
+            rates: Event name -> fraction of events to log
+            payload_rate: Fraction of payloads logged when DEBUG is off
+        """
+        self.rates = rates or {}
+        self.payload_rate = payload_rate
+        self.logged: Dict[str, int] = {}
+        self.dropped: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "EventSampler":
+        """Build a sampler configured from PROVIDER_LOG_* environment variables"""
+        return cls(
+            rates=_parse_rates(os.getenv("PROVIDER_LOG_SAMPLING", "")),
+            payload_rate=float(os.getenv("PROVIDER_LOG_PAYLOAD_SAMPLE", "0"))
+        )
+
+    def should_log(self, event: str, rate: Optional[float] = None) -> bool:
+        rate = self.rates.get(event, 1.0) if rate is None else rate
+        keep = rate >= 1.0 or random.random() < rate
+        counts = self.logged if keep else self.dropped
+        counts[event] = counts.get(event, 0) + 1
+        return keep
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rates": self.rates,
+            "payload_rate": self.payload_rate,
+            "logged": dict(self.logged),
+            "dropped": dict(self.dropped)
+        }
+
+
+# Shared sampler for every provider module
+log_sampler = EventSampler.from_env()
+
+
+class _EventMessage:
+    """Log message rendered only if a handler actually formats the record"""
+
+    __slots__ = ("event", "fields")
+
+    def __init__(self, event: str, fields: Dict[str, Any]):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return " ".join([self.event] + [f"{key}={value}" for key, value in self.fields.items()])
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    """
+    Log a structured event, doing no work at all when it is disabled or sampled out
+
+    Args:
+        logger: Logger to write to
+        event: Dotted event name, also used to look up its sampling rate
+        level: Log level
+        **fields: Event fields, kept as a dict for the JSON formatter
+    """
+    if not logger.isEnabledFor(level) or not log_sampler.should_log(event):
+        return
+    logger.log(level, "%s", _EventMessage(event, fields), extra={"event": event, "fields": fields})
+
+
+def log_payload(logger: logging.Logger, event: str, payload: Any):
+    """
+    Log a full request or response body
+
+    Bodies are logged at DEBUG, or at INFO for PROVIDER_LOG_PAYLOAD_SAMPLE of
+    calls; otherwise nothing is formatted.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        level = logging.DEBUG
+    elif logger.isEnabledFor(logging.INFO) and log_sampler.should_log(event, log_sampler.payload_rate):
+        level = logging.INFO
+    else:
+        return
+    fields = {"payload": payload}
+    logger.log(level, "%s", _EventMessage(event, fields), extra={"event": event, "fields": fields})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with structured event fields merged in"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = getattr(record, "event", None)
+        data = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": event or record.getMessage()
+        }
+        if event:
+            data["event"] = event
+            data.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue handler that leaves most formatting to the listener thread
+
+    The stock handler runs the full formatter before queueing each record,
+    which puts the cost back on the caller. Only the message is merged here,
+    as the stock handler does, since its args may be mutated or unsafe to
+    read once the caller moves on; timestamps, JSON and tracebacks are still
+    formatted by the listener. Structured events keep their fields for the
+    JSON formatter.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def start_log_queue(json_format: bool = False) -> Optional[QueueListener]:
+    """
+    Move the root logger's handlers behind a queue so writes happen on a background thread
+
+    Args:
+        json_format: Switch the handlers to one JSON object per line
+
+    Returns:
+        The running listener
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    root = logging.getLogger()
+    handlers = root.handlers[:] or [logging.StreamHandler()]
+    for handler in handlers:
+        if json_format:
+            handler.setFormatter(JsonFormatter())
+        root.removeHandler(handler)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_log_queue():
+    """Flush the queue and put the original handlers back on the root logger"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, _DeferredQueueHandler):
+            root.removeHandler(handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
@@ -0,0 +1,242 @@
+"""
+Media Store
+Content-addressed storage for generated images, served by URL instead of inlined as base64
+"""
+import os
+import re
+import base64
+import hashlib
+import logging
+import tempfile
+from collections.abc import Mapping
+from typing import Dict, Any, Optional, Iterable, AsyncIterable
+
+from providers.http_client import get_session, request_timeout
+
+# Setup logging
+logger = logging.getLogger("media")
+
+# File signatures of the formats providers return, checked in order
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF8", "gif"),
+)
+
+# Read size when streaming provider responses to disk
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+_MEDIA_PATH = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+def sniff_extension(data: bytes) -> str:
+    """Guess a file extension from an image's leading bytes"""
+    for signature, extension in _SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "avif"
+    return "bin"
+
+
+class _StreamingWrite:
+    """Temporary file that hashes its contents as they are written"""
+
+    def __init__(self, directory: str):
+        # The store's root is only created once something is written to it
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        self.file = os.fdopen(fd, "wb")
+        self.digest = hashlib.sha256()
+        self.head = b""
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        if len(self.head) < 16:
+            self.head += chunk[:16 - len(self.head)]
+        self.digest.update(chunk)
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class MediaStore:
+    """Write-once store for media keyed on the SHA-256 of its bytes
+
+    Files live at <root>/<first two hex digits>/<digest>.<ext>, so identical
+    images are stored once and a file never changes after it is written. That
+    makes every URL safe to cache forever.
+    """
+
+    def __init__(self, root: str = "media", url_prefix: str = "/media"):
+        """
+        Args:
+            root: Directory holding the files
+            url_prefix: Path the files are served under
+        """
+        self.root = os.path.abspath(root)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.writes = 0
+        self.duplicates = 0
+        self.bytes_written = 0
+
+    @classmethod
+    def from_env(cls) -> "MediaStore":
+        """Build a store configured from MEDIA_* environment variables"""
+        return cls(
+            root=os.getenv("MEDIA_ROOT", "media"),
+            url_prefix=os.getenv("MEDIA_URL_PREFIX", "/media")
+        )
+
+    def put(self, data: bytes, extension: Optional[str] = None) -> str:
+        """
+        Store bytes unless an identical file already exists
+
+        Args:
+            data: File contents
+            extension: File extension, sniffed from the contents if not given
+
+        Returns:
+            The relative media path, e.g. "ab/ab12...ef.png"
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        relative = f"{digest[:2]}/{digest}.{extension or sniff_extension(data)}"
+        path = os.path.join(self.root, relative)
+
+        if os.path.exists(path):
+            self.duplicates += 1
+            return relative
+
+        # Write to a temporary file and rename so readers never see a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.writes += 1
+        self.bytes_written += len(data)
+        return relative
+
+    def _commit(self, write: _StreamingWrite, extension: Optional[str]) -> str:
+        """Move a finished streaming write to its content address"""
+        write.file.close()
+        digest = write.digest.hexdigest()
+        relative = f"{digest[:2]}/{digest}.{extension or sniff_extension(write.head)}"
+        path = os.path.join(self.root, relative)
+        if os.path.exists(path):
+            os.remove(write.path)
+            self.duplicates += 1
+            return relative
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(write.path, path)
+        self.writes += 1
+        self.bytes_written += write.size
+        return relative
+
+    def put_chunks(self, chunks: Iterable[bytes], extension: Optional[str] = None) -> str:
+        """
+        Store a file from an iterable of chunks without holding it in memory
+
+        Args:
+            chunks: File contents, e.g. a response's iter_content()
+            extension: File extension, sniffed from the contents if not given
+
+        Returns:
+            The relative media path
+        """
+        write = _StreamingWrite(self.root)
+        try:
+            for chunk in chunks:
+                write.write(chunk)
+        except BaseException:
+            write.discard()
+            raise
+        return self._commit(write, extension)
+
+    async def aput_chunks(self, chunks: AsyncIterable[bytes], extension: Optional[str] = None) -> str:
+        """Store a file from an async iterable of chunks, e.g. a response's aiter_bytes()"""
+        write = _StreamingWrite(self.root)
+        try:
+            async for chunk in chunks:
+                write.write(chunk)
+        except BaseException:
+            write.discard()
+            raise
+        return self._commit(write, extension)
+
+    def url(self, relative: str) -> str:
+        """Public URL of a stored file"""
+        return f"{self.url_prefix}/{relative}"
+
+    def resolve(self, relative: str) -> Optional[str]:
+        """
+        Map a media path from a URL back to a file
+
+        Returns:
+            The absolute file path, or None if the path is malformed or missing
+        """
+        if not _MEDIA_PATH.match(relative):
+            return None
+        path = os.path.join(self.root, relative)
+        return path if os.path.isfile(path) else None
+
+    def fetch(self, url: str) -> str:
+        """
+        Download a remote file into the store, streaming it to disk
+
+        Returns:
+            The relative media path
+        """
+        with get_session("media").get(url, timeout=request_timeout(), stream=True) as response:
+            response.raise_for_status()
+            return self.put_chunks(response.iter_content(chunk_size=MEDIA_CHUNK_SIZE))
+
+    def externalize(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Move a result's image into the store
+
+        Base64 image_data is decoded and written; a remote image_url, such as
+        OpenAI's signed links that expire within hours, is downloaded.
+
+        Returns:
+            A copy of the result with image_url (and media_path) pointing at the stored file
+        """
+        if not isinstance(result, Mapping) or result.get("media_path"):
+            return result
+        if result.get("image_data"):
+            relative = self.put(base64.b64decode(result["image_data"]))
+        elif str(result.get("image_url") or "").startswith(("http://", "https://")):
+            try:
+                relative = self.fetch(result["image_url"])
+            except Exception as e:
+                logger.warning(f"Could not store remote image, keeping its upstream URL: {e}")
+                return result
+        else:
+            return result
+        externalized = {k: v for k, v in result.items() if k != "image_data"}
+        externalized["media_path"] = relative
+        externalized["image_url"] = self.url(relative)
+        return externalized
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "root": self.root,
+            "writes": self.writes,
+            "duplicates": self.duplicates,
+            "bytes_written": self.bytes_written
+        }
+
+
+# Shared store, so providers can write downloads straight into it
+media_store = MediaStore.from_env()
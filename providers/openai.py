@@ -6,7 +6,11 @@ import os
 import time
 import json
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+
+from providers.http_client import get_async_client, httpx_timeout
+from providers.rate_limiter import parse_rate_limit_headers
+from providers.result import GenerationResult, KEEP_RAW_RESPONSES
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -14,7 +18,7 @@ logger = logging.getLogger("openai")
 
 try:
     import openai
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI
     HAS_OPENAI = True
 except ImportError:
     logger.warning("OpenAI package not installed. Install with: pip install openai")
@@ -33,8 +37,70 @@ class OpenAIProvider:
         if not self.api_key:
             logger.warning("No OpenAI API key provided. Set OPENAI_API_KEY env variable.")
         
-        # Initialize client
-        self.client = OpenAI(api_key=self.api_key)
+        # Initialize client; retries belong to the dispatcher's budgeted RetryPolicy, not the SDK
+        self.client = OpenAI(api_key=self.api_key, max_retries=0)
+        self._async_client = None
+    
+    @property
+    def async_client(self):
+        """Async OpenAI client backed by the shared pooled HTTP client"""
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                http_client=get_async_client("openai"),
+                max_retries=0
+            )
+        return self._async_client
+    
+    def _text_result(self, raw_response, model: str, start_time: float) -> GenerationResult:
+        """Turn a raw chat completion response into a result dict"""
+        response = raw_response.parse()
+        
+        # Extract the generated text
+        generated_text = response.choices[0].message.content
+        
+        return GenerationResult(
+            success=True,
+            text=generated_text,
+            model=model,
+            provider="openai",
+            response_time=time.time() - start_time,
+            tokens={
+                "prompt": response.usage.prompt_tokens,
+                "completion": response.usage.completion_tokens,
+                "total": response.usage.total_tokens
+            },
+            raw_response=response.model_dump() if KEEP_RAW_RESPONSES else None,
+            rate_limit=parse_rate_limit_headers(raw_response.headers)
+        )
+    
+    def _image_result(self, response, model: str, start_time: float) -> GenerationResult:
+        """Turn an image generation response into a result dict"""
+        return GenerationResult(
+            success=True,
+            image_url=response.data[0].url,  # URL of the generated image
+            model=model,
+            provider="openai",
+            response_time=time.time() - start_time,
+            raw_response=response.model_dump() if KEEP_RAW_RESPONSES else None
+        )
+    
+    def _error_result(self, error: Exception, model: str, start_time: float) -> GenerationResult:
+        """Build a result dict for a failed call"""
+        # API errors carry the HTTP response, including any rate limit headers
+        response = getattr(error, "response", None)
+        return GenerationResult(
+            success=False,
+            error=str(error),
+            error_type=type(error).__name__,
+            response_time=time.time() - start_time,
+            model=model,
+            provider="openai",
+            status_code=getattr(error, "status_code", None),
+            rate_limit=parse_rate_limit_headers(
+                getattr(response, "headers", None), getattr(response, "status_code", None)
+            )
+        )
     
     def generate_text(self, 
                     prompt: str, 
@@ -42,6 +108,7 @@ class OpenAIProvider:
                     max_tokens: int = 1000, 
                     temperature: float = 0.7, 
                     system_message: str = "You are a helpful assistant.", 
+                    timeout: Optional[Tuple[float, float]] = None, 
                     **kwargs) -> Dict[str, Any]:
         """Generate text using OpenAI models"""
         if not HAS_OPENAI or not self.api_key:
@@ -55,40 +122,81 @@ class OpenAIProvider:
                 {"role": "user", "content": prompt}
             ]
             
-            response = self.client.chat.completions.create(
+            response = self.client.chat.completions.with_raw_response.create(
                 model=model,
                 messages=messages,
                 max_tokens=max_tokens,
                 temperature=temperature,
+                timeout=httpx_timeout(timeout),
                 **kwargs
             )
+            return self._text_result(response, model, start_time)
             
-            # Extract the generated text
-            generated_text = response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"Error generating text with OpenAI: {e}")
+            return self._error_result(e, model, start_time)
+    
+    async def agenerate_text(self, 
+                    prompt: str, 
+                    model: str = "gpt-3.5-turbo", 
+                    max_tokens: int = 1000, 
+                    temperature: float = 0.7, 
+                    system_message: str = "You are a helpful assistant.", 
+                    timeout: Optional[Tuple[float, float]] = None, 
+                    **kwargs) -> Dict[str, Any]:
+        """Generate text using OpenAI models without blocking the event loop"""
+        if not HAS_OPENAI or not self.api_key:
+            return {"success": False, "error": "OpenAI package not installed or API key not provided"}
             
-            return {
-                "success": True,
-                "text": generated_text,
-                "model": model,
-                "provider": "openai",
-                "response_time": time.time() - start_time,
-                "tokens": {
-                    "prompt": response.usage.prompt_tokens,
-                    "completion": response.usage.completion_tokens,
-                    "total": response.usage.total_tokens
-                },
-                "raw_response": response.model_dump()
-            }
+        start_time = time.time()
+        
+        try:
+            messages = [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ]
+            
+            response = await self.async_client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                timeout=httpx_timeout(timeout),
+                **kwargs
+            )
+            return self._text_result(response, model, start_time)
             
         except Exception as e:
             logger.error(f"Error generating text with OpenAI: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "response_time": time.time() - start_time,
-                "model": model,
-                "provider": "openai"
-            }
+            return self._error_result(e, model, start_time)
+    
+    async def astream_text(self, 
+                    prompt: str, 
+                    model: str = "gpt-3.5-turbo", 
+                    max_tokens: int = 1000, 
+                    temperature: float = 0.7, 
+                    system_message: str = "You are a helpful assistant.", 
+                    **kwargs) -> AsyncIterator[str]:
+        """Stream generated text from OpenAI models as it is produced"""
+        if not HAS_OPENAI or not self.api_key:
+            raise ValueError("OpenAI package not installed or API key not provided")
+        
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt}
+        ]
+        
+        stream = await self.async_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            **kwargs
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     
     def generate_image(self, 
                     prompt: str, 
@@ -96,6 +204,7 @@ class OpenAIProvider:
                     size: str = "1024x1024", 
                     quality: str = "standard", 
                     n: int = 1, 
+                    timeout: Optional[Tuple[float, float]] = None, 
                     **kwargs) -> Dict[str, Any]:
         """Generate image using OpenAI DALL-E models"""
         if not HAS_OPENAI or not self.api_key:
@@ -110,27 +219,44 @@ class OpenAIProvider:
                 size=size,
                 quality=quality,
                 n=n,
+                timeout=httpx_timeout(timeout),
                 **kwargs
             )
+            return self._image_result(response, model, start_time)
             
-            return {
-                "success": True,
-                "image_url": response.data[0].url,  # URL of the generated image
-                "model": model,
-                "provider": "openai",
-                "response_time": time.time() - start_time,
-                "raw_response": response.model_dump()
-            }
+        except Exception as e:
+            logger.error(f"Error generating image with OpenAI: {e}")
+            return self._error_result(e, model, start_time)
+    
+    async def agenerate_image(self, 
+                    prompt: str, 
+                    model: str = "dall-e-3", 
+                    size: str = "1024x1024", 
+                    quality: str = "standard", 
+                    n: int = 1, 
+                    timeout: Optional[Tuple[float, float]] = None, 
+                    **kwargs) -> Dict[str, Any]:
+        """Generate image using OpenAI DALL-E models without blocking the event loop"""
+        if not HAS_OPENAI or not self.api_key:
+            return {"success": False, "error": "OpenAI package not installed or API key not provided"}
+            
+        start_time = time.time()
+        
+        try:
+            response = await self.async_client.images.generate(
+                model=model,
+                prompt=prompt,
+                size=size,
+                quality=quality,
+                n=n,
+                timeout=httpx_timeout(timeout),
+                **kwargs
+            )
+            return self._image_result(response, model, start_time)
             
         except Exception as e:
             logger.error(f"Error generating image with OpenAI: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "response_time": time.time() - start_time,
-                "model": model,
-                "provider": "openai"
-            }
+            return self._error_result(e, model, start_time)
     
     def get_available_models(self) -> List[Dict[str, Any]]:
         """Get available OpenAI models"""
@@ -175,4 +301,4 @@ if __name__ == "__main__":
     # Test the provider
     provider = OpenAIProvider()
     result = provider.generate_text("Write a short poem about AI.")
-    print(json.dumps(result, indent=2)) 
\ No newline at end of file
+    print(json.dumps(dict(result), indent=2)) 
\ No newline at end of file
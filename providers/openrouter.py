@@ -3,11 +3,15 @@ OpenRouter Provider Integration
 Handles API calls to OpenRouter for AI model inference across multiple providers
 """
 import os
-import requests
 import time
 import json
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+
+from providers.http_client import get_async_client, get_session, iter_chat_deltas, request_timeout, httpx_timeout, METADATA_TIMEOUT
+from providers.rate_limiter import parse_rate_limit_headers
+from providers.result import GenerationResult
+from providers.logs import log_event, log_payload
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -33,93 +37,183 @@ class OpenRouterProvider:
         # Default model if none specified
         self.default_model = "meta-llama/llama-2-70b-chat"
     
+    @property
+    def session(self):
+        """Shared keep-alive session for blocking calls"""
+        return get_session("openrouter")
+    
+    @property
+    def async_client(self):
+        """Shared pooled client for async calls"""
+        return get_async_client("openrouter")
+    
+    def _chat_payload(self, 
+                     prompt: str, 
+                     model: Optional[str], 
+                     max_tokens: int, 
+                     temperature: float, 
+                     system_message: str, 
+                     **kwargs) -> Dict[str, Any]:
+        """Build the chat completions request payload"""
+        # Use default model if none specified or if specified model is "default"
+        model_to_use = model if model and model != "default" else self.default_model
+        
+        log_event(logger, "openrouter.model_selected", logging.DEBUG, requested=model, selected=model_to_use)
+        
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt}
+        ]
+        
+        payload = {
+            "model": model_to_use,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            **kwargs
+        }
+        
+        # Full payloads only at DEBUG or for a sampled fraction of calls
+        log_payload(logger, "openrouter.request", payload)
+        
+        return payload
+    
+    def _chat_result(self, response, model_to_use: str, start_time: float) -> GenerationResult:
+        """Turn a chat completions HTTP response into a result dict"""
+        log_payload(logger, "openrouter.response", response.text)
+        
+        # Check for errors
+        if response.status_code != 200:
+            error_message = f"Error from OpenRouter API: {response.status_code} - {response.text}"
+            logger.error(error_message)
+            return GenerationResult(
+                success=False,
+                error=error_message,
+                response_time=time.time() - start_time,
+                model=model_to_use,
+                provider="openrouter",
+                status_code=response.status_code,
+                rate_limit=parse_rate_limit_headers(response.headers, response.status_code)
+            )
+        
+        result = response.json()
+        
+        # Extract the generated text
+        generated_text = result["choices"][0]["message"]["content"]
+        
+        return GenerationResult(
+            success=True,
+            text=generated_text,
+            model=model_to_use,
+            provider="openrouter",
+            response_time=time.time() - start_time,
+            tokens={
+                "prompt": result.get("usage", {}).get("prompt_tokens", 0),
+                "completion": result.get("usage", {}).get("completion_tokens", 0),
+                "total": result.get("usage", {}).get("total_tokens", 0)
+            },
+            raw_response=result,
+            rate_limit=parse_rate_limit_headers(response.headers)
+        )
+    
+    def _error_result(self, error: Exception, model_to_use: Optional[str], start_time: float) -> GenerationResult:
+        """Build a result dict for a failed call"""
+        error_message = f"Error generating text with OpenRouter: {str(error)}"
+        logger.error(error_message)
+        return GenerationResult(
+            success=False,
+            error=error_message,
+            response_time=time.time() - start_time,
+            model=model_to_use or self.default_model,
+            provider="openrouter",
+            error_type=type(error).__name__
+        )
+    
     def generate_text(self, 
                      prompt: str, 
                      model: Optional[str] = None, 
                      max_tokens: int = 1000, 
                      temperature: float = 0.7, 
                      system_message: str = "You are a helpful assistant.", 
+                     timeout: Optional[Tuple[float, float]] = None, 
                      **kwargs) -> Dict[str, Any]:
         """Generate text using OpenRouter models"""
         if not self.api_key:
             raise ValueError("OpenRouter API key not provided. Please set OPENROUTER_API_KEY in your environment variables.")
             
         start_time = time.time()
+        payload = None
         
         try:
-            # Use default model if none specified or if specified model is "default"
-            model_to_use = model if model and model != "default" else self.default_model
-            
-            # Log the model selection process
-            logger.info(f"Model selection - Input model: {model}, Selected model: {model_to_use}")
+            payload = self._chat_payload(prompt, model, max_tokens, temperature, system_message, **kwargs)
             
-            messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ]
+            response = self.session.post(
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                json=payload,
+                timeout=request_timeout(timeout)
+            )
+            return self._chat_result(response, payload["model"], start_time)
             
-            payload = {
-                "model": model_to_use,
-                "messages": messages,
-                "max_tokens": max_tokens,
-                "temperature": temperature,
-                **kwargs
-            }
+        except Exception as e:
+            return self._error_result(e, payload["model"] if payload else None, start_time)
+    
+    async def agenerate_text(self, 
+                     prompt: str, 
+                     model: Optional[str] = None, 
+                     max_tokens: int = 1000, 
+                     temperature: float = 0.7, 
+                     system_message: str = "You are a helpful assistant.", 
+                     timeout: Optional[Tuple[float, float]] = None, 
+                     **kwargs) -> Dict[str, Any]:
+        """Generate text using OpenRouter models without blocking the event loop"""
+        if not self.api_key:
+            raise ValueError("OpenRouter API key not provided. Please set OPENROUTER_API_KEY in your environment variables.")
             
-            # Log the full request payload for debugging
-            logger.info(f"OpenRouter request payload: {json.dumps(payload, indent=2)}")
+        start_time = time.time()
+        payload = None
+        
+        try:
+            payload = self._chat_payload(prompt, model, max_tokens, temperature, system_message, **kwargs)
             
-            response = requests.post(
+            response = await self.async_client.post(
                 f"{self.base_url}/chat/completions",
                 headers=self.headers,
                 json=payload,
-                timeout=30  # Add timeout
+                timeout=httpx_timeout(timeout)
             )
+            return self._chat_result(response, payload["model"], start_time)
             
-            # Log the raw response for debugging
-            logger.info(f"OpenRouter raw response: {response.text}")
-            
-            # Check for errors
+        except Exception as e:
+            return self._error_result(e, payload["model"] if payload else None, start_time)
+    
+    async def astream_text(self, 
+                     prompt: str, 
+                     model: Optional[str] = None, 
+                     max_tokens: int = 1000, 
+                     temperature: float = 0.7, 
+                     system_message: str = "You are a helpful assistant.", 
+                     **kwargs) -> AsyncIterator[str]:
+        """Stream generated text from OpenRouter models as it is produced"""
+        if not self.api_key:
+            raise ValueError("OpenRouter API key not provided. Please set OPENROUTER_API_KEY in your environment variables.")
+        
+        payload = self._chat_payload(prompt, model, max_tokens, temperature, system_message, stream=True, **kwargs)
+        
+        async with self.async_client.stream(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            headers=self.headers,
+            json=payload
+        ) as response:
             if response.status_code != 200:
+                await response.aread()
                 error_message = f"Error from OpenRouter API: {response.status_code} - {response.text}"
                 logger.error(error_message)
-                return {
-                    "success": False,
-                    "error": error_message,
-                    "response_time": time.time() - start_time,
-                    "model": model_to_use,
-                    "provider": "openrouter"
-                }
-            
-            result = response.json()
-            
-            # Extract the generated text
-            generated_text = result["choices"][0]["message"]["content"]
+                raise RuntimeError(error_message)
             
-            return {
-                "success": True,
-                "text": generated_text,
-                "model": model_to_use,
-                "provider": "openrouter",
-                "response_time": time.time() - start_time,
-                "tokens": {
-                    "prompt": result.get("usage", {}).get("prompt_tokens", 0),
-                    "completion": result.get("usage", {}).get("completion_tokens", 0),
-                    "total": result.get("usage", {}).get("total_tokens", 0)
-                },
-                "raw_response": result
-            }
-            
-        except Exception as e:
-            error_message = f"Error generating text with OpenRouter: {str(e)}"
-            logger.error(error_message)
-            return {
-                "success": False,
-                "error": error_message,
-                "response_time": time.time() - start_time,
-                "model": model_to_use if 'model_to_use' in locals() else self.default_model,
-                "provider": "openrouter"
-            }
+            async for content in iter_chat_deltas(response):
+                yield content
     
     def get_available_models(self) -> List[Dict[str, Any]]:
         """Get available OpenRouter models"""
@@ -127,10 +221,10 @@ class OpenRouterProvider:
             return []
             
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/models",
                 headers=self.headers,
-                timeout=10
+                timeout=METADATA_TIMEOUT
             )
             
             if response.status_code != 200:
@@ -152,8 +246,8 @@ class OpenRouterProvider:
                     }
                 })
             
-            # Log available models
-            logger.info(f"Available OpenRouter models: {json.dumps([m['id'] for m in models], indent=2)}")
+            log_event(logger, "openrouter.models_listed", count=len(models))
+            log_payload(logger, "openrouter.models", [m["id"] for m in models])
             
             return models
             
@@ -175,7 +269,7 @@ if __name__ == "__main__":
     # Test the provider
     provider = OpenRouterProvider()
     result = provider.generate_text("Write a short poem about AI.")
-    print(json.dumps(result, indent=2))
+    print(json.dumps(dict(result), indent=2))
     
     # Get all models
     models = provider.get_available_models()
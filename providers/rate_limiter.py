@@ -0,0 +1,384 @@
+"""
+Rate Limiting
+Client-side token buckets for each provider API key's request and token limits
+"""
+import os
+import re
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from typing import Dict, Any, Optional, List, Tuple, Mapping
+
+from providers.executor import ProviderBusyError
+from providers.key_pool import mask_key
+from providers.timeouts import remaining_time
+
+# Setup logging
+logger = logging.getLogger("rate_limiter")
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitExceededError(ProviderBusyError):
+    """Raised when a call would wait too long for its API key's rate limit and is shed"""
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Parse a reset duration such as "1s", "6m0s" or "20ms" into seconds"""
+    parts = _DURATION_PART.findall(value)
+    if parts:
+        return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _parse_reset(value: str) -> Optional[float]:
+    """Parse a reset header into seconds from now
+
+    Accepts durations ("6m0s") and absolute epoch timestamps in seconds or
+    milliseconds, as sent by OpenRouter.
+    """
+    seconds = _parse_duration(value)
+    if seconds is None:
+        return None
+    if seconds > 1e11:
+        return max(0.0, seconds / 1000.0 - time.time())
+    if seconds > 1e9:
+        return max(0.0, seconds - time.time())
+    return seconds
+
+
+def parse_rate_limit_headers(headers: Optional[Mapping[str, str]], status_code: Optional[int] = None) -> Dict[str, float]:
+    """
+    Extract rate limit state from upstream response headers
+
+    Understands OpenAI style per-requests and per-tokens headers
+    (x-ratelimit-remaining-requests), the single-limit form used by
+    OpenRouter (x-ratelimit-remaining) and Retry-After.
+
+    Args:
+        headers: Response headers
+        status_code: HTTP status, so a 429 without Retry-After still backs off
+
+    Returns:
+        Dict with any of requests_limit, requests_remaining, requests_reset,
+        tokens_limit, tokens_remaining, tokens_reset and retry_after
+    """
+    info: Dict[str, float] = {}
+    if headers:
+        lowered = {key.lower(): value for key, value in headers.items()}
+        for kind in ("requests", "tokens"):
+            for field in ("limit", "remaining"):
+                value = lowered.get(f"x-ratelimit-{field}-{kind}")
+                if value is not None:
+                    try:
+                        info[f"{kind}_{field}"] = float(value)
+                    except ValueError:
+                        pass
+            reset = lowered.get(f"x-ratelimit-reset-{kind}")
+            if reset is not None and _parse_reset(reset) is not None:
+                info[f"{kind}_reset"] = _parse_reset(reset)
+
+        # Single request limit (OpenRouter)
+        for field in ("limit", "remaining"):
+            value = lowered.get(f"x-ratelimit-{field}")
+            if value is not None and f"requests_{field}" not in info:
+                try:
+                    info[f"requests_{field}"] = float(value)
+                except ValueError:
+                    pass
+        reset = lowered.get("x-ratelimit-reset")
+        if reset is not None and "requests_reset" not in info and _parse_reset(reset) is not None:
+            info["requests_reset"] = _parse_reset(reset)
+
+        retry_after = lowered.get("retry-after")
+        if retry_after is not None and _parse_duration(retry_after) is not None:
+            info["retry_after"] = _parse_duration(retry_after)
+
+    if status_code == 429 and "retry_after" not in info:
+        info["retry_after"] = info.get("requests_reset", 1.0)
+    return info
+
+
+def estimate_tokens(prompt: str, max_tokens: int = 0) -> int:
+    """Estimate the tokens a call counts against tokens/min: ~4 chars per prompt token plus the completion budget"""
+    return len(prompt or "") // 4 + (max_tokens or 0)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously over a one-minute window
+
+    A capacity of None means the limit is unknown; the bucket then never
+    blocks until upstream headers report a real limit.
+    """
+
+    def __init__(self, capacity: Optional[float] = None, period: float = 60.0):
+        self.period = period
+        self.capacity = capacity
+        self.level = capacity or 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.capacity is not None:
+            rate = self.capacity / self.period
+            self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Get how long until amount can be taken"""
+        if self.capacity is None:
+            return 0.0
+        self._refill(now)
+        # Requests larger than the bucket only wait for a full bucket
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed * self.period / self.capacity) if self.capacity > 0 else float("inf")
+
+    def take(self, amount: float, now: float):
+        if self.capacity is None:
+            return
+        self._refill(now)
+        self.level -= amount
+
+    def refund(self, amount: float):
+        if self.capacity is not None:
+            self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], now: float):
+        """Adopt the limit and remaining budget reported by the upstream"""
+        learned = self.capacity is None
+        if limit is not None and limit > 0:
+            self.capacity = limit
+        if self.capacity is None:
+            return
+        if learned:
+            # Nothing was tracked locally yet, so the upstream's figure is the level
+            self.level = min(self.capacity, remaining) if remaining is not None else self.capacity
+            self.updated = now
+        elif remaining is not None:
+            self._refill(now)
+            self.level = min(self.level, remaining)
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        return {"capacity": self.capacity, "level": self.level if self.capacity is not None else None}
+
+
+class _KeyLimiter:
+    """Request and token buckets plus the priority wait queue for one API key"""
+
+    def __init__(self, rpm: Optional[float], tpm: Optional[float]):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.waiters: List[Tuple[float, int, asyncio.Future, int]] = []
+        self.pump: Optional[asyncio.Task] = None
+        self.granted = 0
+        self.queued = 0
+        self.shed = 0
+        self.throttled = 0
+        self.total_wait_time = 0.0
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        return max(
+            self.blocked_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(tokens, now)
+        )
+
+    def take(self, tokens: int, now: float):
+        self.requests.take(1, now)
+        self.tokens.take(tokens, now)
+        self.granted += 1
+
+    def queued_tokens(self) -> int:
+        return sum(tokens for _, _, future, tokens in self.waiters if not future.done())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests.stats(),
+            "tokens": self.tokens.stats(),
+            "blocked_for": max(0.0, self.blocked_until - time.monotonic()),
+            "waiting": sum(1 for _, _, future, _ in self.waiters if not future.done()),
+            "granted": self.granted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "throttled": self.throttled,
+            "avg_wait_time": self.total_wait_time / self.queued if self.queued else 0.0
+        }
+
+
+class RateLimiter:
+    """Client-side rate limiter modelling requests/min and tokens/min per API key
+
+    Limits start from configuration (RATE_LIMIT_<PROVIDER>_RPM / _TPM) and are
+    corrected from the rate limit headers on every upstream response; a 429
+    blocks the key until its Retry-After passes. Calls that cannot go out
+    immediately wait in a priority queue, highest priority first. Calls whose
+    estimated wait exceeds max_wait (or the request deadline) are shed with
+    RateLimitExceededError instead of being sent into a certain 429.
+    """
+
+    def __init__(self,
+                 limits: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+                 max_wait: float = 10.0,
+                 max_queue: int = 100):
+        """
+        Args:
+            limits: Optional (requests/min, tokens/min) per provider
+            max_wait: Longest a call may wait for budget before it is shed
+            max_queue: Most calls allowed to wait per API key
+        """
+        self.limits = limits or {}
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self._limiters: Dict[Tuple[str, Optional[str]], _KeyLimiter] = {}
+        self._sequence = itertools.count()
+
+    @classmethod
+    def from_env(cls, providers: List[str]) -> "RateLimiter":
+        """Build a rate limiter configured from RATE_LIMIT_* environment variables"""
+        limits = {}
+        for provider in providers:
+            rpm = os.getenv(f"RATE_LIMIT_{provider.upper()}_RPM")
+            tpm = os.getenv(f"RATE_LIMIT_{provider.upper()}_TPM")
+            limits[provider] = (float(rpm) if rpm else None, float(tpm) if tpm else None)
+        return cls(
+            limits=limits,
+            max_wait=float(os.getenv("RATE_LIMIT_MAX_WAIT", "10")),
+            max_queue=int(os.getenv("RATE_LIMIT_MAX_QUEUE", "100"))
+        )
+
+    def _get(self, provider: str, api_key: Optional[str]) -> _KeyLimiter:
+        limiter = self._limiters.get((provider, api_key))
+        if limiter is None:
+            rpm, tpm = self.limits.get(provider, (None, None))
+            limiter = self._limiters[(provider, api_key)] = _KeyLimiter(rpm, tpm)
+        return limiter
+
+    async def acquire(self, provider: str, api_key: Optional[str], tokens: int = 0, priority: float = 0.0):
+        """
+        Wait until the API key has budget for one request of the given size
+
+        Args:
+            provider: Provider name
+            api_key: API key the call will use
+            tokens: Estimated prompt plus completion tokens
+            priority: Higher values are served first when calls are queued
+
+        Raises:
+            RateLimitExceededError: If the call would wait longer than allowed
+        """
+        limiter = self._get(provider, api_key)
+        now = time.monotonic()
+        if not limiter.waiters and limiter.wait_time(tokens, now) <= 0:
+            limiter.take(tokens, now)
+            return
+
+        budget = self.max_wait
+        remaining = remaining_time()
+        if remaining is not None:
+            budget = min(budget, remaining)
+        # Everyone already waiting is served first in the worst case
+        estimate = max(
+            limiter.blocked_until - now,
+            limiter.requests.wait_time(len(limiter.waiters) + 1, now),
+            limiter.tokens.wait_time(limiter.queued_tokens() + tokens, now)
+        )
+        if len(limiter.waiters) >= self.max_queue or estimate > budget:
+            self._shed(provider, limiter, estimate)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(limiter.waiters, (-priority, next(self._sequence), future, tokens))
+        limiter.queued += 1
+        if limiter.pump is None or limiter.pump.done():
+            limiter.pump = asyncio.ensure_future(self._pump(limiter))
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=budget)
+        except asyncio.TimeoutError:
+            # Overtaken by higher priority calls; give up our place
+            if not future.done():
+                future.cancel()
+                self._shed(provider, limiter, limiter.wait_time(tokens, time.monotonic()))
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled():
+                # Granted but the caller went away; return the budget
+                limiter.requests.refund(1)
+                limiter.tokens.refund(tokens)
+            raise
+        finally:
+            limiter.total_wait_time += time.monotonic() - now
+
+    def _shed(self, provider: str, limiter: _KeyLimiter, estimate: float):
+        limiter.shed += 1
+        retry_after = max(1, int(estimate + 0.999))
+        logger.warning(f"Shedding call to {provider}: rate limit budget exhausted, retry after {retry_after}s")
+        raise RateLimitExceededError(provider, retry_after)
+
+    async def _pump(self, limiter: _KeyLimiter):
+        """Grant queued calls in priority order as budget becomes available"""
+        while limiter.waiters:
+            _, _, future, tokens = limiter.waiters[0]
+            if future.done():
+                heapq.heappop(limiter.waiters)
+                continue
+            now = time.monotonic()
+            wait = limiter.wait_time(tokens, now)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            heapq.heappop(limiter.waiters)
+            limiter.take(tokens, now)
+            future.set_result(None)
+
+    def update(self, provider: str, api_key: Optional[str], info: Optional[Dict[str, float]]):
+        """
+        Correct a key's buckets from parsed upstream rate limit headers
+
+        Args:
+            provider: Provider name
+            api_key: API key the call used
+            info: Output of parse_rate_limit_headers
+        """
+        if not info:
+            return
+        limiter = self._get(provider, api_key)
+        now = time.monotonic()
+        limiter.requests.sync(info.get("requests_limit"), info.get("requests_remaining"), now)
+        limiter.tokens.sync(info.get("tokens_limit"), info.get("tokens_remaining"), now)
+        if "retry_after" in info:
+            limiter.throttled += 1
+            limiter.blocked_until = max(limiter.blocked_until, now + info["retry_after"])
+            logger.warning(f"{provider} throttled, pausing key for {info['retry_after']:.1f}s")
+
+    def headroom(self, provider: str, api_key: Optional[str]) -> float:
+        """Get the share of a key's budget left right now, from 0 (exhausted) to 1 (full or unknown)"""
+        limiter = self._get(provider, api_key)
+        now = time.monotonic()
+        if limiter.blocked_until > now:
+            return 0.0
+        shares = [1.0]
+        for bucket in (limiter.requests, limiter.tokens):
+            if bucket.capacity:
+                bucket.wait_time(0, now)
+                shares.append(max(0.0, bucket.level) / bucket.capacity)
+        return min(shares)
+
+    def settle(self, provider: str, api_key: Optional[str], estimated: int, actual: Optional[int]):
+        """Return the difference between the estimated and actual tokens of a finished call"""
+        if actual:
+            self._get(provider, api_key).tokens.refund(estimated - actual)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get current bucket levels and queue counters for every API key"""
+        report: Dict[str, Dict[str, Any]] = {}
+        for (provider, api_key), limiter in self._limiters.items():
+            report.setdefault(provider, {})[mask_key(api_key)] = limiter.stats()
+        return report
@@ -0,0 +1,148 @@
+"""
+Provider Registry
+Builds each provider once per (provider, api_key) and manages its lifecycle
+"""
+import time
+import logging
+import threading
+from collections.abc import Mapping
+from typing import Dict, Any, Optional, Tuple
+
+from providers.http_client import close_clients
+
+# Setup logging
+logger = logging.getLogger("registry")
+
+
+class _ProviderUsage:
+    """Usage and health counters for one registered provider instance"""
+
+    def __init__(self):
+        self.created_at = time.time()
+        self.calls = 0
+        self.failures = 0
+        self.total_response_time = 0.0
+        self.last_used: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "created_at": self.created_at,
+            "calls": self.calls,
+            "failures": self.failures,
+            "error_rate": self.failures / self.calls if self.calls else 0.0,
+            "avg_response_time": self.total_response_time / self.calls if self.calls else 0.0,
+            "last_used": self.last_used,
+            "last_success": self.last_success,
+            "last_error": self.last_error
+        }
+
+
+class ProviderRegistry:
+    """Process-wide registry of provider instances
+
+    Providers (and the HTTP/SDK clients they hold) are expensive to build, so
+    each (provider, api_key) pair is constructed once and reused for every
+    request. The registry also keeps per-instance usage counters for health
+    reporting and closes the underlying transports on shutdown.
+    """
+
+    def __init__(self, provider_classes: Dict[str, type]):
+        """
+        Args:
+            provider_classes: Mapping of provider name to provider class
+        """
+        self.provider_classes = provider_classes
+        self._instances: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._usage: Dict[Tuple[str, Optional[str]], _ProviderUsage] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider_name: str, api_key: Optional[str] = None):
+        """
+        Get the shared instance for a provider, building it on first use
+
+        Args:
+            provider_name: Name of the provider ('huggingface', 'openai', etc.)
+            api_key: Optional API key; None uses the provider's environment key
+
+        Returns:
+            Provider instance or None if provider not found
+        """
+        name = provider_name.lower()
+        provider_class = self.provider_classes.get(name)
+        if not provider_class:
+            return None
+
+        key = (name, api_key)
+        instance = self._instances.get(key)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(key)
+                if instance is None:
+                    instance = provider_class(api_key=api_key)
+                    self._instances[key] = instance
+                    self._usage[key] = _ProviderUsage()
+                    logger.info(f"Registered provider instance for {name}")
+        return instance
+
+    async def warm(self):
+        """Build every provider with its default key and open its HTTP client"""
+        for name in self.provider_classes:
+            try:
+                instance = self.get(name)
+                # Touching the client creates the pooled connection holder up front
+                getattr(instance, "async_client", None)
+            except Exception as e:
+                logger.error(f"Error warming provider {name}: {e}")
+
+    def record_call(self, provider_name: str, result: Any, api_key: Optional[str] = None):
+        """
+        Record the outcome of a provider call for health reporting
+
+        Args:
+            provider_name: Name of the provider that served the call
+            result: Result dict returned by the provider
+            api_key: API key the instance was registered under
+        """
+        usage = self._usage.get((provider_name.lower(), api_key))
+        if usage is None:
+            return
+
+        now = time.time()
+        usage.calls += 1
+        usage.last_used = now
+        if isinstance(result, Mapping):
+            usage.total_response_time += result.get("response_time", 0) or 0
+            if result.get("success"):
+                usage.last_success = now
+            else:
+                usage.failures += 1
+                usage.last_error = result.get("error")
+        else:
+            usage.failures += 1
+
+    def health(self) -> Dict[str, Any]:
+        """Get usage counters and configuration status for every instance"""
+        report = {}
+        for (name, api_key), instance in self._instances.items():
+            label = name if api_key is None else f"{name}:...{api_key[-4:]}"
+            report[label] = {
+                "provider": name,
+                "configured": bool(getattr(instance, "api_key", None)),
+                **self._usage[(name, api_key)].to_dict()
+            }
+        return report
+
+    async def close(self):
+        """Close provider SDK clients and the shared HTTP clients"""
+        for (name, _), instance in list(self._instances.items()):
+            client = getattr(instance, "client", None)
+            if client is not None and hasattr(client, "close"):
+                try:
+                    client.close()
+                except Exception as e:
+                    logger.error(f"Error closing {name} client: {e}")
+        self._instances.clear()
+        self._usage.clear()
+        await close_clients()
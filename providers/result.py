@@ -0,0 +1,93 @@
+"""
+Generation Results
+Compact, dict-compatible result type returned by provider calls
+"""
+import os
+from collections.abc import MutableMapping
+from typing import Dict, Any, Iterator, Optional
+
+# Full upstream payloads are only kept on results when debugging or auditing
+KEEP_RAW_RESPONSES = os.getenv("PROVIDER_KEEP_RAW_RESPONSES", "false").lower() == "true"
+
+_UNSET = object()
+
+
+class GenerationResult(MutableMapping):
+    """Result of a provider call
+
+    The fields every result has, plus the ones the dispatcher adds, live in
+    slots rather than a per-instance dict. Anything else goes into a small
+    overflow dict that is only created when needed. Results read and write
+    like dicts, so callers keep using result.get("text") or
+    result["cached"] = True. Fields that were never set are missing, as they
+    would be from a dict.
+    """
+
+    __slots__ = (
+        "success", "text", "model", "provider", "response_time", "tokens",
+        "error", "error_type", "status_code", "rate_limit",
+        "retries", "cached", "coalesced", "_extra"
+    )
+    _FIELDS = frozenset(__slots__[:-1])
+
+    def __init__(self, raw_response: Any = None, **fields):
+        """
+        Args:
+            raw_response: Upstream payload, dropped unless PROVIDER_KEEP_RAW_RESPONSES is on;
+                callers should avoid building it at all when the flag is off
+            **fields: Result fields, e.g. success, text, model, provider
+        """
+        for name in self._FIELDS:
+            setattr(self, name, fields.pop(name, _UNSET))
+        if raw_response is not None and KEEP_RAW_RESPONSES:
+            fields["raw_response"] = raw_response
+        self._extra: Optional[Dict[str, Any]] = fields or None
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELDS:
+            value = getattr(self, key)
+            if value is _UNSET:
+                raise KeyError(key)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: Any):
+        if key in self._FIELDS:
+            setattr(self, key, value)
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key: str):
+        if key in self._FIELDS:
+            if getattr(self, key) is _UNSET:
+                raise KeyError(key)
+            setattr(self, key, _UNSET)
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self.__slots__[:-1]:
+            if getattr(self, name) is not _UNSET:
+                yield name
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"GenerationResult({self.to_dict()!r})"
+
+    def copy(self) -> "GenerationResult":
+        """Shallow copy, like dict.copy()"""
+        return GenerationResult(**self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict for JSON encoding and templates"""
+        return dict(self.items())
@@ -0,0 +1,182 @@
+"""
+Retry Policy
+Retries transient provider failures with jittered backoff under a global retry budget
+"""
+import os
+import random
+import threading
+from collections.abc import Mapping
+from typing import Dict, Any, Optional
+
+# Upstream statuses worth retrying: throttling, timeouts and gateway errors
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Exception types (by name, across requests, httpx and the OpenAI SDK) that mean
+# the request never got a proper answer
+TRANSIENT_ERROR_TYPES = {
+    "ConnectionError",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "Timeout",
+    "ChunkedEncodingError",
+    "ConnectError",
+    "ReadError",
+    "WriteError",
+    "RemoteProtocolError",
+    "PoolTimeout",
+    "APIConnectionError",
+    "APITimeoutError",
+    "RateLimitError",
+    "InternalServerError"
+}
+
+
+def is_transient(result: Any) -> bool:
+    """Check whether a failed provider result, or the exception a call raised, is worth retrying"""
+    if isinstance(result, BaseException):
+        return type(result).__name__ in TRANSIENT_ERROR_TYPES
+    if not isinstance(result, Mapping) or result.get("success"):
+        return False
+    if result.get("status_code") in TRANSIENT_STATUS_CODES:
+        return True
+    return result.get("error_type") in TRANSIENT_ERROR_TYPES
+
+
+class RetryBudget:
+    """Caps retries at a fixed share of first attempts
+
+    Every first attempt deposits `ratio` tokens and every retry withdraws one,
+    so retries can never add more than ratio extra load however bad an outage
+    gets. The budget starts with initial_tokens, so a freshly started service
+    can retry before it has served enough calls to fund retries.
+    """
+
+    def __init__(self, ratio: float = 0.1, initial_tokens: float = 10.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.max_tokens = max(max_tokens, initial_tokens)
+        self.tokens = initial_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for transient provider failures
+
+    Attempt n waits a random time in [0, min(max_delay, base_delay * 2**n)],
+    or the upstream's Retry-After when it sent one. Failed results and raised
+    exceptions are classified the same way. A retry is skipped when the
+    wait would exceed max_retry_after or the request deadline, or when the
+    shared retry budget is spent.
+    """
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 base_delay: float = 0.5,
+                 max_delay: float = 8.0,
+                 max_retry_after: float = 20.0,
+                 budget: Optional[RetryBudget] = None):
+        """
+        Args:
+            max_attempts: Most attempts per call, including the first
+            base_delay: Backoff cap for the first retry
+            max_delay: Largest backoff cap
+            max_retry_after: Longest Retry-After we are prepared to wait
+            budget: Shared retry budget
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.budget = budget or RetryBudget()
+        self.calls = 0
+        self.retries = 0
+        self.recovered = 0
+        self.budget_exhausted = 0
+        self.gave_up = 0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """Build a retry policy configured from RETRY_* environment variables"""
+        return cls(
+            max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("RETRY_MAX_DELAY", "8")),
+            max_retry_after=float(os.getenv("RETRY_MAX_RETRY_AFTER", "20")),
+            budget=RetryBudget(
+                ratio=float(os.getenv("RETRY_BUDGET_RATIO", "0.1")),
+                initial_tokens=float(os.getenv("RETRY_BUDGET_INITIAL", "10"))
+            )
+        )
+
+    def start(self):
+        """Record a new call; its first attempt funds the retry budget"""
+        self.calls += 1
+        self.budget.deposit()
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter backoff before retry number attempt (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def next_delay(self,
+                   attempt: int,
+                   result: Any,
+                   retry_after: Optional[float] = None,
+                   remaining: Optional[float] = None) -> Optional[float]:
+        """
+        Decide whether to retry a failed attempt
+
+        Args:
+            attempt: Number of attempts made so far
+            result: Result of the last attempt, or the exception it raised
+            retry_after: Seconds the upstream asked us to wait, if any
+            remaining: Seconds left before the request deadline, if any
+
+        Returns:
+            Seconds to wait before retrying, or None to give up
+        """
+        if not is_transient(result):
+            return None
+        if attempt >= self.max_attempts:
+            self.gave_up += 1
+            return None
+
+        delay = self.backoff(attempt)
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                self.gave_up += 1
+                return None
+            delay = max(delay, retry_after)
+        if remaining is not None and delay >= remaining:
+            self.gave_up += 1
+            return None
+        if not self.budget.withdraw():
+            self.budget_exhausted += 1
+            return None
+
+        self.retries += 1
+        return delay
+
+    def record_recovery(self):
+        """Record a call that succeeded after at least one retry"""
+        self.recovered += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "retry_rate": self.retries / self.calls if self.calls else 0.0,
+            "recovered": self.recovered,
+            "budget_exhausted": self.budget_exhausted,
+            "gave_up": self.gave_up,
+            "budget_tokens": self.budget.tokens
+        }
@@ -0,0 +1,83 @@
+"""
+Request Coalescing
+Shares one upstream call between identical concurrent generation requests
+"""
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable, Tuple
+
+# Setup logging
+logger = logging.getLogger("singleflight")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key
+
+    The first caller for a key (the leader) starts the upstream call as a
+    task; callers arriving while it is in flight wait on the same task. Each
+    waiter is shielded, so a waiter that is cancelled (for example because its
+    client disconnected) never cancels the call for everyone else. Only when
+    the last waiter goes away is the upstream call itself cancelled.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.abandoned = 0
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        self._waiters.pop(task, None)
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run func once for all concurrent callers with the same key
+
+        Args:
+            key: Identity of the call (e.g. the response cache key)
+            func: Zero-argument coroutine function performing the call
+
+        Returns:
+            Tuple of (result, shared) where shared is True for followers
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logger.debug(f"Coalesced request onto in-flight call {key[:12]}")
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if not task.done():
+                self._waiters[task] -= 1
+                if self._waiters[task] <= 0:
+                    self.abandoned += 1
+                    # Drop the key now so a caller arriving before the done-callback starts afresh
+                    if self._calls.get(key) is task:
+                        del self._calls[key]
+                    task.cancel()
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Get coalescing counters"""
+        total = self.leaders + self.followers
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "abandoned": self.abandoned,
+            "coalescing_ratio": self.followers / total if total else 0.0
+        }
@@ -0,0 +1,217 @@
+"""
+Adaptive Timeouts
+Derives provider call timeouts from observed latency percentiles and request deadlines
+"""
+import os
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Tuple, Iterator
+
+from providers.http_client import CONNECT_TIMEOUT, READ_TIMEOUT
+from providers.latency import LatencyTracker
+
+# Setup logging
+logger = logging.getLogger("timeouts")
+
+# Exception types (by name, across requests, httpx and the OpenAI SDK) raised when
+# a provider call ran out of time
+TIMEOUT_ERROR_TYPES = {
+    "ConnectTimeout",
+    "ReadTimeout",
+    "WriteTimeout",
+    "PoolTimeout",
+    "Timeout",
+    "TimeoutException",
+    "APITimeoutError"
+}
+
+# Absolute time.monotonic() deadline of the request being served, if any
+_request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """Raised when the incoming request's deadline passes before a provider answers"""
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Bound every provider call made inside the block by a request deadline
+
+    Nested scopes can only shorten the deadline, never extend it.
+
+    Args:
+        seconds: Time budget from now, or None for no deadline
+    """
+    deadline = _request_deadline.get()
+    if seconds is not None:
+        candidate = time.monotonic() + seconds
+        deadline = candidate if deadline is None else min(deadline, candidate)
+    token = _request_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Get the seconds left before the current request's deadline, or None without one"""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def max_tokens_bucket(max_tokens: int) -> int:
+    """Round max_tokens up to a power of two so similar requests share a histogram"""
+    bucket = 256
+    while bucket < max_tokens:
+        bucket *= 2
+    return bucket
+
+
+class TimeoutManager:
+    """Adaptive connect and read timeouts per (provider, model, max_tokens bucket)
+
+    The read timeout is the observed latency percentile (p99 by default) times
+    a safety multiplier, clamped to [read_floor, read_ceiling]. Until a key has
+    min_samples observations the configured default is used. Calls that time
+    out are recorded at the timeout they hit, so a slow spell pushes the
+    percentile up instead of being invisible to it. The connect
+    timeout scales with the median latency of the key inside its own floor
+    and ceiling, since none of the clients report connect time separately.
+    Per-tool overrides replace the derived read timeout, and an active request
+    deadline caps both values.
+    """
+
+    def __init__(self,
+                 latencies: Optional[LatencyTracker] = None,
+                 percentile: float = 99.0,
+                 multiplier: float = 1.5,
+                 min_samples: int = 20,
+                 default_read: float = READ_TIMEOUT,
+                 read_floor: float = 5.0,
+                 read_ceiling: float = 180.0,
+                 connect_floor: float = 2.0,
+                 connect_ceiling: float = CONNECT_TIMEOUT,
+                 tool_overrides: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            latencies: Tracker to keep the histograms in
+            percentile: Latency percentile the read timeout is derived from
+            multiplier: Safety factor applied to the percentile
+            min_samples: Observations required before the percentile is trusted
+            default_read: Read timeout used until enough samples exist
+            read_floor: Smallest read timeout ever used
+            read_ceiling: Largest read timeout ever used
+            connect_floor: Smallest connect timeout ever used
+            connect_ceiling: Largest connect timeout ever used
+            tool_overrides: Fixed read timeouts keyed by tool ID
+        """
+        self.latencies = latencies or LatencyTracker()
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.default_read = default_read
+        self.read_floor = read_floor
+        self.read_ceiling = read_ceiling
+        self.connect_floor = connect_floor
+        self.connect_ceiling = connect_ceiling
+        self.tool_overrides = dict(tool_overrides or {})
+
+    @classmethod
+    def from_env(cls, tool_overrides: Optional[Dict[str, float]] = None) -> "TimeoutManager":
+        """Build a timeout manager configured from PROVIDER_TIMEOUT_* environment variables"""
+        return cls(
+            percentile=float(os.getenv("PROVIDER_TIMEOUT_PERCENTILE", "99")),
+            multiplier=float(os.getenv("PROVIDER_TIMEOUT_MULTIPLIER", "1.5")),
+            min_samples=int(os.getenv("PROVIDER_TIMEOUT_MIN_SAMPLES", "20")),
+            default_read=float(os.getenv("PROVIDER_TIMEOUT_DEFAULT_READ", str(READ_TIMEOUT))),
+            read_floor=float(os.getenv("PROVIDER_TIMEOUT_READ_FLOOR", "5")),
+            read_ceiling=float(os.getenv("PROVIDER_TIMEOUT_READ_CEILING", "180")),
+            connect_floor=float(os.getenv("PROVIDER_TIMEOUT_CONNECT_FLOOR", "2")),
+            connect_ceiling=float(os.getenv("PROVIDER_TIMEOUT_CONNECT_CEILING", str(CONNECT_TIMEOUT))),
+            tool_overrides=tool_overrides
+        )
+
+    def record(self, provider: str, model: str, max_tokens: int, seconds: float):
+        """Record the latency of a successful call"""
+        self.latencies.record((provider, model, max_tokens_bucket(max_tokens)), seconds)
+
+    def record_timeout(self, provider: str, model: str, max_tokens: int, timeout: float, seconds: float):
+        """
+        Record a call that timed out
+
+        The real latency is unknown but at least the timeout, so that is what
+        goes into the histogram.
+
+        Args:
+            provider: Provider name
+            model: Model ID
+            max_tokens: Requested output length
+            timeout: Read timeout the call was given
+            seconds: Time the call took before failing
+        """
+        self.record(provider, model, max_tokens, max(timeout, seconds))
+
+    def _derive(self, key: Tuple[str, str, int], tool_id: Optional[str] = None) -> Tuple[float, float]:
+        observed = self.latencies.percentile(key, self.percentile, min_samples=self.min_samples)
+        median = self.latencies.percentile(key, 50, min_samples=self.min_samples)
+
+        if tool_id is not None and tool_id in self.tool_overrides:
+            read = self.tool_overrides[tool_id]
+        elif observed is not None:
+            read = min(max(observed * self.multiplier, self.read_floor), self.read_ceiling)
+        else:
+            read = self.default_read
+
+        if median is not None:
+            connect = min(max(median, self.connect_floor), self.connect_ceiling)
+        else:
+            connect = self.connect_ceiling
+        return connect, read
+
+    def get_timeout(self,
+                    provider: str,
+                    model: str,
+                    max_tokens: int = 1000,
+                    tool_id: Optional[str] = None) -> Tuple[float, float]:
+        """
+        Get the timeout for a provider call
+
+        Args:
+            provider: Provider name
+            model: Model ID
+            max_tokens: Requested output length
+            tool_id: Tool making the call, for per-tool overrides
+
+        Returns:
+            (connect, read) timeout in seconds
+
+        Raises:
+            DeadlineExceededError: If the request deadline has already passed
+        """
+        connect, read = self._derive((provider, model, max_tokens_bucket(max_tokens)), tool_id)
+
+        remaining = remaining_time()
+        if remaining is not None:
+            if remaining <= 0:
+                raise DeadlineExceededError(f"Request deadline passed before calling {provider}/{model}")
+            read = min(read, remaining)
+            connect = min(connect, remaining)
+        return connect, read
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get the latency summary and current timeout for every tracked key"""
+        report = {}
+        for key in self.latencies.keys():
+            provider, model, bucket = key
+            connect, read = self._derive(key)
+            report[f"{provider}/{model}/{bucket}"] = {
+                **self.latencies.get(key).summary(),
+                "connect_timeout": connect,
+                "read_timeout": read
+            }
+        return report
@@ -0,0 +1,178 @@
+"""
+Model Warm-up
+Tracks which Hugging Face models are loaded and keeps the ones we use warm
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
+
+# Setup logging
+logger = logging.getLogger("warmup")
+
+
+def _parse_range(value: str) -> Tuple[int, int]:
+    start, _, end = value.partition("-")
+    return int(start), int(end or start)
+
+
+class ModelWarmth:
+    """Last known load state of each hosted model
+
+    A model is warm once it has answered within warm_ttl seconds, loading
+    while the estimated_time from its last 503 has not passed, and unknown
+    otherwise. The state is shared by every provider instance and read by the
+    model selector.
+    """
+
+    def __init__(self, warm_ttl: float = 900.0):
+        self.warm_ttl = warm_ttl
+        self._warm_at: Dict[str, float] = {}
+        self._loading_until: Dict[str, float] = {}
+        self._cold_starts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def mark_warm(self, model: str):
+        """Record that a model just answered"""
+        with self._lock:
+            self._warm_at[model] = time.monotonic()
+            self._loading_until.pop(model, None)
+
+    def mark_loading(self, model: str, estimated_time: Optional[float]):
+        """Record that a model answered 503 while loading"""
+        with self._lock:
+            self._warm_at.pop(model, None)
+            self._loading_until[model] = time.monotonic() + (estimated_time or 30.0)
+            self._cold_starts[model] = self._cold_starts.get(model, 0) + 1
+
+    def is_warm(self, model: str) -> Optional[bool]:
+        """
+        Get whether a model is loaded
+
+        Returns:
+            True if warm, False if known to be loading, None if unknown
+        """
+        now = time.monotonic()
+        warm_at = self._warm_at.get(model)
+        if warm_at is not None and now - warm_at < self.warm_ttl:
+            return True
+        if self._loading_until.get(model, 0) > now:
+            return False
+        return None
+
+    def estimated_wait(self, model: str) -> float:
+        """Seconds until a loading model is expected to be ready"""
+        return max(0.0, self._loading_until.get(model, 0) - time.monotonic())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        models = set(self._warm_at) | set(self._loading_until)
+        return {
+            model: {
+                "warm": self.is_warm(model),
+                "last_seen_warm": now - self._warm_at[model] if model in self._warm_at else None,
+                "estimated_wait": self.estimated_wait(model),
+                "cold_starts": self._cold_starts.get(model, 0)
+            }
+            for model in sorted(models)
+        }
+
+
+# Shared by every Hugging Face provider instance
+model_warmth = ModelWarmth(warm_ttl=float(os.getenv("HF_WARM_TTL", "900")))
+
+
+class WarmupPinger:
+    """Background task that pings hosted models so they stay loaded
+
+    Runs every `interval` seconds during business hours (WARMUP_HOURS, e.g.
+    "8-20", and WARMUP_DAYS, e.g. "0-4" for Monday to Friday, local time),
+    sending the cheapest possible request to each model.
+    """
+
+    def __init__(self,
+                 provider,
+                 text_models: List[str],
+                 image_models: Optional[List[str]] = None,
+                 interval: float = 240.0,
+                 hours: Tuple[int, int] = (8, 20),
+                 days: Tuple[int, int] = (0, 4)):
+        """
+        Args:
+            provider: Provider instance with aping_model(model, image=False)
+            text_models: Text models to keep warm
+            image_models: Image models to keep warm
+            interval: Seconds between ping rounds
+            hours: First and last local hour (inclusive) to ping in
+            days: First and last weekday (0 = Monday, inclusive) to ping on
+        """
+        self.provider = provider
+        self.text_models = list(dict.fromkeys(text_models))
+        self.image_models = list(dict.fromkeys(image_models or []))
+        self.interval = interval
+        self.hours = hours
+        self.days = days
+        self.pings = 0
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, provider, text_models: List[str], image_models: Optional[List[str]] = None) -> "WarmupPinger":
+        """Build a pinger configured from WARMUP_* environment variables"""
+        return cls(
+            provider,
+            text_models,
+            image_models,
+            interval=float(os.getenv("WARMUP_INTERVAL", "240")),
+            hours=_parse_range(os.getenv("WARMUP_HOURS", "8-20")),
+            days=_parse_range(os.getenv("WARMUP_DAYS", "0-4"))
+        )
+
+    def in_business_hours(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now()
+        return self.days[0] <= now.weekday() <= self.days[1] and self.hours[0] <= now.hour <= self.hours[1]
+
+    async def ping_all(self):
+        """Ping every model once, concurrently"""
+        jobs = [self.provider.aping_model(model) for model in self.text_models]
+        jobs += [self.provider.aping_model(model, image=True) for model in self.image_models]
+        for ok in await asyncio.gather(*jobs, return_exceptions=True):
+            self.pings += 1
+            if ok is not True:
+                self.failures += 1
+
+    async def _run(self):
+        while True:
+            if self.in_business_hours():
+                try:
+                    await self.ping_all()
+                except Exception as e:
+                    logger.error(f"Warm-up round failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start pinging in the background"""
+        if (self.text_models or self.image_models) and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._run())
+            logger.info(f"Keeping {len(self.text_models) + len(self.image_models)} models warm every {self.interval:.0f}s")
+
+    async def stop(self):
+        """Stop the background task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "models": self.text_models + self.image_models,
+            "pings": self.pings,
+            "failures": self.failures
+        }
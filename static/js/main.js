@@ -183,6 +183,93 @@ function submitFormAsync(formId, successCallback, errorCallback) {
     });
 }
 
+// Stream a tool's output token by token from a Server-Sent Events endpoint
+function submitFormStreaming(formId, streamUrl, outputId, errorTarget) {
+    const form = document.getElementById(formId);
+    if (!form) return;
+    
+    form.addEventListener('submit', async function(event) {
+        event.preventDefault();
+        
+        if (!validateForm(formId)) return;
+        
+        const output = document.getElementById(outputId);
+        const outputText = document.getElementById(`${outputId}-text`);
+        const errorElement = errorTarget ? document.getElementById(errorTarget) : null;
+        const submitButton = form.querySelector('button[type="submit"]');
+        const originalText = submitButton ? submitButton.innerHTML : '';
+        
+        if (errorElement) errorElement.style.display = 'none';
+        if (submitButton) {
+            submitButton.disabled = true;
+            submitButton.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Generating...';
+        }
+        outputText.textContent = '';
+        output.style.display = 'block';
+        
+        const showError = message => {
+            if (errorElement) {
+                errorElement.textContent = message;
+                errorElement.style.display = 'block';
+            }
+        };
+        
+        try {
+            const response = await fetch(streamUrl, {
+                method: 'POST',
+                body: new FormData(form)
+            });
+            
+            if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
+                throw new Error(data.error || 'Server error occurred: ' + response.statusText);
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                
+                // Events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    
+                    let eventType = 'message';
+                    let data = '';
+                    rawEvent.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) eventType = line.slice(6).trim();
+                        if (line.startsWith('data:')) data += line.slice(5).trim();
+                    });
+                    if (!data) continue;
+                    
+                    const payload = JSON.parse(data);
+                    if (eventType === 'error') {
+                        showError(payload.error);
+                    } else if (eventType === 'done') {
+                        updateCredits(payload.user_credits);
+                    } else if (payload.token) {
+                        outputText.textContent += payload.token;
+                    }
+                }
+            }
+        } catch (error) {
+            console.error('Error during streaming request:', error);
+            showError(error.message);
+        } finally {
+            if (submitButton) {
+                submitButton.disabled = false;
+                submitButton.innerHTML = originalText;
+            }
+        }
+    });
+}
+
 // Document ready event
 document.addEventListener('DOMContentLoaded', function() {
     console.log('MegicAI application initialized');
@@ -196,7 +283,12 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Check if the form is for HTML-based operations like process-request
         const actionUrl = form.getAttribute('action');
-        if (actionUrl && (actionUrl.includes('/process-request') || actionUrl.includes('/watch-ad'))) {
+        const streamUrl = form.getAttribute('data-stream-url');
+        if (streamUrl) {
+            // Text tools stream their output into the page instead of loading a result page
+            form.removeAttribute('data-async-submit');
+            submitFormStreaming(formId, streamUrl, form.getAttribute('data-stream-target'), errorTarget);
+        } else if (actionUrl && (actionUrl.includes('/process-request') || actionUrl.includes('/watch-ad'))) {
             // These endpoints return HTML, not JSON - use regular form submission
             console.log('Form will use direct submission:', actionUrl);
             form.removeAttribute('data-async-submit');
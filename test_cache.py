@@ -0,0 +1,67 @@
+import asyncio
+
+from providers.cache import ResponseCache, make_cache_key
+
+
+def result(text="hello"):
+    return {"success": True, "text": text, "model": "model-a", "provider": "fake"}
+
+
+def test_cache_key_ignores_whitespace_but_not_parameters():
+    key = make_cache_key("fake", "model-a", "write a  poem", max_tokens=100, temperature=0.7)
+    assert key == make_cache_key("Fake", "model-a", " write a poem ", max_tokens=100, temperature=0.7)
+    assert key != make_cache_key("fake", "model-a", "write a poem", max_tokens=200, temperature=0.7)
+    assert key != make_cache_key("fake", "model-b", "write a poem", max_tokens=100, temperature=0.7)
+
+
+def test_only_successful_results_are_cached():
+    cache = ResponseCache(enabled=True)
+    cache.set("ok", result())
+    cache.set("failed", {"success": False, "error": "upstream error"})
+    assert cache.get("ok") == {**result(), "cached": True}
+    assert cache.get("failed") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_the_ttl():
+    cache = ResponseCache(enabled=True, ttl=-1)
+    cache.set("ok", result())
+    assert cache.get("ok") is None
+
+
+def test_memory_tier_evicts_least_recently_used_entries():
+    entry_bytes = len(ResponseCache(enabled=True)._payload(result("a")))
+    cache = ResponseCache(enabled=True, max_bytes=entry_bytes * 2, max_entry_bytes=entry_bytes)
+    cache.set("a", result("a"))
+    cache.set("b", result("b"))
+    cache.get("a")
+    cache.set("c", result("c"))
+    assert cache.get("b") is None
+    assert cache.get("a")["text"] == "a"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_survives_a_restart_through_the_async_api(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+
+    async def store():
+        cache = ResponseCache(enabled=True, db_path=db_path)
+        await cache.aset("ok", result())
+        cache.close()
+
+    async def load():
+        cache = ResponseCache(enabled=True, db_path=db_path)
+        first = await cache.aget("ok")
+        second = await cache.aget("ok")
+        stats = cache.stats()
+        cache.close()
+        return first, second, stats
+
+    asyncio.run(store())
+    first, second, stats = asyncio.run(load())
+    assert first["text"] == "hello"
+    assert first["cached"] is True
+    assert second["text"] == "hello"
+    assert stats["disk_hits"] == 1
+    assert stats["hits"] == 1
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from providers.cache import ResponseCache
+from providers.circuit_breaker import CircuitBreakerBoard, HALF_OPEN
+from providers.dispatcher import GenerationDispatcher
+from providers.executor import ProviderExecutor
+from providers.rate_limiter import RateLimiter
+from providers.registry import ProviderRegistry
+from providers.retry import RetryPolicy
+from providers.timeouts import DeadlineExceededError, TimeoutManager, deadline_scope
+
+
+class FakeProvider:
+    """In-process provider with blocking and async text methods and a blocking image method"""
+
+    failing_models = set()
+    timing_out_models = set()
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self.calls = []
+
+    def generate_text(self, prompt, model, max_tokens=1000, temperature=0.7, system_message=None, timeout=None):
+        raise AssertionError("the dispatcher should prefer agenerate_text")
+
+    async def agenerate_text(self, prompt, model, max_tokens=1000, temperature=0.7, system_message=None, timeout=None):
+        self.calls.append(("text", model))
+        if model in self.failing_models:
+            return {"success": False, "error": "upstream error", "error_type": "server_error", "status_code": 400, "model": model, "provider": "fake"}
+        if model in self.timing_out_models:
+            return {"success": False, "error": "read timed out", "error_type": "ReadTimeout", "model": model, "provider": "fake"}
+        return {
+            "success": True,
+            "text": f"{model}: {prompt}",
+            "model": model,
+            "provider": "fake",
+            "tokens": {"prompt": 3, "completion": 5, "total": 8}
+        }
+
+    def generate_image(self, prompt, model, timeout=None, **kwargs):
+        self.calls.append(("image", model))
+        return {"success": True, "image_url": "https://example.com/image.png", "model": model, "provider": "fake"}
+
+
+class SlowRateLimiter(RateLimiter):
+    """Rate limiter whose budget takes a while to free up"""
+
+    async def acquire(self, provider, api_key, tokens, priority=0.0):
+        await asyncio.sleep(0.05)
+
+
+def make_dispatcher(cache=None, **kwargs):
+    FakeProvider.failing_models = set()
+    FakeProvider.timing_out_models = set()
+    registry = ProviderRegistry({"fake": FakeProvider, "backup": FakeProvider})
+    return registry, GenerationDispatcher(registry, ProviderExecutor(), cache, **kwargs)
+
+
+def test_generate_text_calls_the_provider_with_the_selected_model():
+    registry, dispatcher = make_dispatcher()
+    result = asyncio.run(dispatcher.generate_text("fake", prompt="hello", model="model-a"))
+    assert result["success"] is True
+    assert result["text"] == "model-a: hello"
+    assert result["cached"] is False
+    assert registry.get("fake").calls == [("text", "model-a")]
+
+
+def test_generate_image_runs_blocking_provider_methods():
+    registry, dispatcher = make_dispatcher()
+    result = asyncio.run(dispatcher.generate_image("fake", prompt="a cat", model="image-model", size="512x512"))
+    assert result["success"] is True
+    assert result["model"] == "image-model"
+    assert registry.get("fake").calls == [("image", "image-model")]
+
+
+def test_failed_primary_fails_over_to_the_fallback():
+    registry, dispatcher = make_dispatcher()
+    FakeProvider.failing_models = {"model-a"}
+    result = asyncio.run(dispatcher.generate_text(
+        "fake", prompt="hello", model="model-a", fallbacks=[("backup", "model-b")]
+    ))
+    assert result["success"] is True
+    assert result["model"] == "model-b"
+    assert result["failover_from"] == "fake/model-a"
+
+
+def test_repeat_request_is_served_from_cache():
+    registry, dispatcher = make_dispatcher(ResponseCache(enabled=True))
+
+    async def run_twice():
+        first = await dispatcher.generate_text("fake", prompt="hello", model="model-a")
+        second = await dispatcher.generate_text("fake", prompt="hello", model="model-a")
+        return first, second
+
+    first, second = asyncio.run(run_twice())
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["text"] == first["text"]
+    assert registry.get("fake").calls == [("text", "model-a")]
+
+
+def test_deadline_passing_while_waiting_for_budget_releases_the_probe():
+    breakers = CircuitBreakerBoard()
+    registry, dispatcher = make_dispatcher(breakers=breakers, rate_limiter=SlowRateLimiter())
+    breaker = breakers.get("fake", "model-a")
+    breaker.state = HALF_OPEN
+
+    async def run():
+        with deadline_scope(0.01):
+            await dispatcher.generate_text("fake", prompt="hello", model="model-a")
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(run())
+    assert breaker.state == HALF_OPEN
+    assert breaker.probes_in_flight == 0
+    assert breaker.allow() is True
+
+
+def test_timed_out_calls_raise_the_adaptive_timeout():
+    timeouts = TimeoutManager(min_samples=5, read_floor=1.0, default_read=30.0)
+    registry, dispatcher = make_dispatcher(timeouts=timeouts, retry_policy=RetryPolicy(max_attempts=1))
+    for _ in range(5):
+        timeouts.record("fake", "model-a", 1000, 0.1)
+    fast_read = timeouts.get_timeout("fake", "model-a")[1]
+
+    FakeProvider.timing_out_models = {"model-a"}
+
+    async def run():
+        for _ in range(5):
+            await dispatcher.generate_text("fake", prompt="hello", model="model-a")
+
+    asyncio.run(run())
+    assert timeouts.get_timeout("fake", "model-a")[1] > fast_read
+
+
+def test_batch_generates_duplicate_prompts_once_and_yields_every_item():
+    registry, dispatcher = make_dispatcher()
+    FakeProvider.failing_models = {"broken"}
+    items = [{"prompt": "a"}, {"prompt": "b"}, {"prompt": "a"}, {"prompt": "a", "system_message": "terse"}]
+
+    async def run(model):
+        return [result async for result in dispatcher.generate_batch("fake", items, model=model, concurrency=2)]
+
+    results = sorted(asyncio.run(run("model-a")), key=lambda result: result["index"])
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert [result["text"] for result in results] == ["model-a: a", "model-a: b", "model-a: a", "model-a: a"]
+    assert [result["deduplicated"] for result in results] == [False, False, True, False]
+    assert len(registry.get("fake").calls) == 3
+
+    failed = asyncio.run(run("broken"))
+    assert len(failed) == 4
+    assert not any(result["success"] for result in failed)
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+from providers.dispatcher import GenerationDispatcher
+from providers.executor import ProviderExecutor
+from providers.hedging import Hedger
+from providers.latency import LatencyTracker
+from providers.registry import ProviderRegistry
+
+
+def make_hedger():
+    return Hedger(LatencyTracker(), default_delay=0.02)
+
+
+def reply(text, total=8, success=True, delay=0.0):
+    async def call():
+        await asyncio.sleep(delay)
+        return {"success": success, "text": text, "tokens": {"total": total}}
+    return call
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = make_hedger()
+    result = asyncio.run(hedger.race("tool", ("a", "m"), reply("primary"), reply("backup"), max_hedge_rate=1.0))
+    assert result["text"] == "primary"
+    stats = hedger.stats()["tool"]
+    assert stats["hedges"] == 0
+    assert stats["loser_tokens_estimate"] == 0
+
+
+def test_slow_primary_loses_to_the_hedge_and_its_cost_is_estimated():
+    hedger = make_hedger()
+    result = asyncio.run(hedger.race(
+        "tool", ("a", "m"), reply("primary", delay=1.0), reply("backup"),
+        max_hedge_rate=1.0, estimated_tokens=300
+    ))
+    assert result["text"] == "backup"
+    assert result["hedged"] is True
+    stats = hedger.stats()["tool"]
+    assert stats["hedge_wins"] == 1
+    assert stats["loser_tokens"] == 0
+    assert stats["loser_tokens_estimate"] == 300
+
+
+def test_losers_that_finish_report_their_tokens():
+    hedger = make_hedger()
+    result = asyncio.run(hedger.race(
+        "tool", ("a", "m"), reply("primary", total=40, success=False, delay=0.05), reply("backup", delay=0.1),
+        max_hedge_rate=1.0, estimated_tokens=300
+    ))
+    assert result["text"] == "backup"
+    stats = hedger.stats()["tool"]
+    assert stats["loser_tokens"] == 40
+    assert stats["loser_tokens_estimate"] == 40
+
+
+class AsyncProvider:
+    calls = []
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+
+    def generate_text(self, prompt, model, **kwargs):
+        raise AssertionError("the dispatcher should prefer agenerate_text")
+
+    async def agenerate_text(self, prompt, model, timeout=None, **kwargs):
+        self.calls.append(model)
+        await asyncio.sleep(1.0 if model == "slow" else 0)
+        return {"success": True, "text": model, "model": model, "tokens": {"total": 8}}
+
+
+class BlockingProvider:
+    calls = []
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+
+    def generate_text(self, prompt, model, timeout=None, **kwargs):
+        self.calls.append(model)
+        time.sleep(0.1)
+        return {"success": True, "text": model, "model": model, "tokens": {"total": 8}}
+
+
+def test_dispatcher_only_hedges_async_providers():
+    AsyncProvider.calls = []
+    BlockingProvider.calls = []
+    registry = ProviderRegistry({"fast": AsyncProvider, "blocking": BlockingProvider, "backup": AsyncProvider})
+    dispatcher = GenerationDispatcher(registry, ProviderExecutor(), hedger=make_hedger())
+
+    async def run():
+        blocking = await dispatcher.generate_text(
+            "blocking", prompt="hi", model="sync", fallbacks=[("backup", "spare")], hedge_group="tool", max_hedge_rate=1.0
+        )
+        hedged = await dispatcher.generate_text(
+            "fast", prompt="hi", model="slow", fallbacks=[("backup", "spare")], hedge_group="tool", max_hedge_rate=1.0
+        )
+        return blocking, hedged
+
+    blocking, hedged = asyncio.run(run())
+    assert blocking["text"] == "sync"
+    assert hedged["text"] == "spare"
+    assert hedged["hedged"] is True
+    assert BlockingProvider.calls == ["sync"]
+    assert AsyncProvider.calls == ["slow", "spare"]
@@ -0,0 +1,74 @@
+import asyncio
+
+from providers.jobs import JobQueue
+
+
+def make_queue(tmp_path, **kwargs):
+    return JobQueue(str(tmp_path / "jobs.db"), **kwargs)
+
+
+def test_higher_priority_jobs_are_claimed_first(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.register("echo", None)
+    low = queue.submit("echo", {}, user_id="a", priority=0)
+    high = queue.submit("echo", {}, user_id="b", priority=5)
+    assert queue.position(low) == 1
+    assert queue._claim()["id"] == high
+    assert queue._claim()["id"] == low
+
+
+def test_per_user_cap_holds_back_a_users_extra_jobs(tmp_path):
+    queue = make_queue(tmp_path, max_per_user=1)
+    queue.register("echo", None)
+    first = queue.submit("echo", {}, user_id="a")
+    queue.submit("echo", {}, user_id="a")
+    other = queue.submit("echo", {}, user_id="b")
+    assert queue._claim()["id"] == first
+    assert queue._claim()["id"] == other
+    assert queue._claim() is None
+
+
+def test_workers_run_jobs_and_record_results_and_failures(tmp_path):
+    queue = make_queue(tmp_path, workers=2, poll_interval=0.01)
+
+    async def handler(params):
+        if params.get("fail"):
+            raise RuntimeError("provider error")
+        return {"success": True, "text": params["prompt"]}
+
+    queue.register("generate", handler)
+
+    async def run():
+        queue.start()
+        ok = await queue.asubmit("generate", {"prompt": "hi"}, user_id="a")
+        bad = await queue.asubmit("generate", {"fail": True}, user_id="b")
+        for _ in range(200):
+            jobs = [await queue.aget(ok), await queue.aget(bad)]
+            if all(job["status"] in ("succeeded", "failed") for job in jobs):
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return jobs
+
+    done, failed = asyncio.run(run())
+    assert done["status"] == "succeeded"
+    assert done["result"] == {"success": True, "text": "hi"}
+    assert failed["status"] == "failed"
+    assert failed["error"] == "provider error"
+
+
+def test_interrupted_job_is_failed_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    abandoned = []
+    queue.register("echo", None, on_abandon=abandoned.append)
+    job_id = queue.submit("echo", {"cost": 1}, user_id="a")
+
+    queue._claim()
+    assert queue.recover() == 1
+    assert queue.get(job_id)["status"] == "queued"
+
+    queue._claim()
+    queue.recover()
+    assert queue.get(job_id)["status"] == "failed"
+    assert abandoned == [{"cost": 1}]
+    assert queue._claim() is None
@@ -0,0 +1,47 @@
+from providers.key_pool import ApiKeyPool, ApiKeyPools, mask_key
+
+
+def test_calls_spread_across_keys_with_the_fewest_in_flight():
+    pool = ApiKeyPool("fake", ["key-1", "key-2"])
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first, second} == {"key-1", "key-2"}
+    pool.release(first)
+    assert pool.acquire() == first
+
+
+def test_budget_strategy_picks_the_key_with_most_headroom():
+    pool = ApiKeyPool("fake", ["key-1", "key-2"], strategy="budget")
+    headroom = {"key-1": 0.1, "key-2": 0.8}
+    assert pool.acquire(headroom.get) == "key-2"
+
+
+def test_rejected_keys_are_quarantined():
+    pool = ApiKeyPool("fake", ["key-1", "key-2"])
+    pool.release(pool.acquire(), status_code=401)
+    assert [pool.acquire() for _ in range(3)] == ["key-2"] * 3
+    assert pool.stats()[mask_key("key-1")]["quarantines"] == 1
+
+
+def test_throttled_key_rests_for_its_retry_after():
+    pool = ApiKeyPool("fake", ["key-1", "key-2"], throttle_quarantine=60)
+    pool.release(pool.acquire(), status_code=429, retry_after=5)
+    quarantined_for = pool.stats()[mask_key("key-1")]["quarantined_for"]
+    assert 0 < quarantined_for <= 5
+
+
+def test_fully_quarantined_pool_uses_the_key_released_soonest():
+    pool = ApiKeyPool("fake", ["key-1", "key-2"])
+    pool.release(pool.acquire(), status_code=401)
+    pool.release(pool.acquire(), status_code=429, retry_after=5)
+    assert pool.acquire() == "key-2"
+
+
+def test_pools_are_only_built_for_providers_with_several_keys(monkeypatch):
+    monkeypatch.setenv("FAKE_API_KEY", "key-1")
+    monkeypatch.setenv("FAKE_API_KEYS", "key-2, key-1")
+    monkeypatch.setenv("SINGLE_API_KEY", "key-3")
+    monkeypatch.delenv("SINGLE_API_KEYS", raising=False)
+    pools = ApiKeyPools.from_env(["fake", "single"])
+    assert pools.get("single") is None
+    assert len(pools.get("fake")) == 2
@@ -0,0 +1,41 @@
+import json
+import logging
+import queue
+
+from providers.logs import JsonFormatter, _DeferredQueueHandler, log_event
+
+
+def make_record(msg, *args, **extra):
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_message_is_merged_before_the_record_is_queued():
+    handler = _DeferredQueueHandler(queue.SimpleQueue())
+    items = ["first"]
+    record = make_record("items=%s", items)
+
+    handler.enqueue(handler.prepare(record))
+    items.append("second")
+
+    queued = handler.queue.get_nowait()
+    assert queued.msg == "items=['first']"
+    assert queued.args is None
+    assert queued.getMessage() == "items=['first']"
+    assert record.args == (items,)
+
+
+def test_structured_events_keep_their_fields_for_json():
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger("test_logs.events")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(_DeferredQueueHandler(log_queue))
+
+    log_event(logger, "cache.hit", provider="fake", method="generate_text")
+
+    data = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+    assert data["message"] == "cache.hit"
+    assert data["provider"] == "fake"
+    assert data["method"] == "generate_text"
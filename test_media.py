@@ -0,0 +1,80 @@
+import asyncio
+import base64
+import os
+
+from providers.media import MediaStore, sniff_extension
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"pixels" * 100
+
+
+def make_store(tmp_path):
+    return MediaStore(root=str(tmp_path / "media"), url_prefix="/media/")
+
+
+def test_identical_images_are_stored_once(tmp_path):
+    store = make_store(tmp_path)
+    first = store.put(PNG)
+    second = store.put(PNG)
+    assert first == second
+    assert first.endswith(".png")
+    assert store.stats()["writes"] == 1
+    assert store.stats()["duplicates"] == 1
+    with open(store.resolve(first), "rb") as f:
+        assert f.read() == PNG
+
+
+def test_streamed_writes_land_at_the_same_address(tmp_path):
+    store = make_store(tmp_path)
+    chunks = [PNG[:5], PNG[5:300], PNG[300:]]
+
+    async def agen():
+        for chunk in chunks:
+            yield chunk
+
+    relative = store.put_chunks(iter(chunks))
+    assert asyncio.run(store.aput_chunks(agen())) == relative
+    assert store.put(PNG) == relative
+    assert store.stats()["writes"] == 1
+    # No temporary files are left behind
+    path = store.resolve(relative)
+    assert os.listdir(store.root) == [relative[:2]]
+    assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+
+
+def test_resolve_rejects_malformed_and_traversing_paths(tmp_path):
+    store = make_store(tmp_path)
+    relative = store.put(PNG)
+    assert store.resolve(relative) is not None
+    assert store.resolve("../" + relative) is None
+    assert store.resolve(relative.replace(".png", ".jpg")) is None
+    assert store.resolve("ab/../../etc/passwd") is None
+
+
+def test_sniff_extension_recognizes_common_formats():
+    assert sniff_extension(PNG) == "png"
+    assert sniff_extension(b"\xff\xd8\xff\xe0") == "jpg"
+    assert sniff_extension(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "webp"
+    assert sniff_extension(b"plain text") == "bin"
+
+
+def test_externalize_replaces_inline_base64_with_a_url(tmp_path):
+    store = make_store(tmp_path)
+    result = {"success": True, "image_data": base64.b64encode(PNG).decode(), "model": "m"}
+    stored = store.externalize(result)
+    assert "image_data" not in stored
+    assert stored["image_url"] == f"/media/{stored['media_path']}"
+    assert store.externalize(stored) is stored
+
+
+def test_externalize_downloads_remote_urls_and_keeps_them_on_failure(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    monkeypatch.setattr(store, "fetch", lambda url: store.put(PNG))
+    stored = store.externalize({"success": True, "image_url": "https://example.com/signed.png"})
+    assert stored["image_url"].startswith("/media/")
+
+    def unreachable(url):
+        raise ConnectionError("expired link")
+
+    monkeypatch.setattr(store, "fetch", unreachable)
+    result = {"success": True, "image_url": "https://example.com/expired.png"}
+    assert store.externalize(result) == result
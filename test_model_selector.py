@@ -0,0 +1,49 @@
+import logging
+
+from agents.model_selector import ModelSelector
+from agents.telemetry import ModelTelemetry
+from tools import TOOLS
+
+
+def make_selector():
+    telemetry = ModelTelemetry(min_samples=2)
+    return ModelSelector(telemetry=telemetry), telemetry
+
+
+def test_tools_with_an_objective_have_candidate_models():
+    selector, _ = make_selector()
+    for tool in TOOLS:
+        if tool.objective is None:
+            continue
+        for provider in tool.providers:
+            assert (tool.id, provider) in selector.knowledge.provider_models, (tool.id, provider)
+
+
+def test_fastest_objective_switches_to_the_faster_candidate():
+    selector, telemetry = make_selector()
+    for _ in range(3):
+        telemetry.record("huggingface", "mistralai/Mistral-7B-Instruct-v0.2", True, 6.0, 100)
+        telemetry.record("huggingface", "mistralai/Mixtral-8x7B-Instruct-v0.1", True, 1.5, 100)
+
+    model_id, _ = selector.select_model("ai_copywriter", "huggingface", context_length=400, objective="fastest")
+    assert model_id == "mistralai/Mixtral-8x7B-Instruct-v0.1"
+    assert selector.stats()["objective_choices"]["ai-copywriter"]["switched"] == 1
+
+
+def test_quality_objective_keeps_the_preferred_model_within_the_slo():
+    selector, telemetry = make_selector()
+    for _ in range(3):
+        telemetry.record("openai", "gpt-3.5-turbo", True, 2.0, 100)
+        telemetry.record("openai", "gpt-4", True, 1.0, 100)
+
+    model_id, _ = selector.select_model("blog_writer", "openai", context_length=400, objective="quality", latency_slo=30.0)
+    assert model_id == "gpt-3.5-turbo"
+
+
+def test_objective_without_candidates_is_reported(caplog):
+    selector, _ = make_selector()
+    with caplog.at_level(logging.WARNING, logger="model_selector"):
+        selector.select_model("ai_poetry_generator", "huggingface", objective="fastest")
+        selector.select_model("ai_poetry_generator", "huggingface", objective="fastest")
+    warnings = [record for record in caplog.records if "ignored" in record.getMessage()]
+    assert len(warnings) == 1
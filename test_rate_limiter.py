@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from providers.rate_limiter import RateLimiter, TokenBucket, parse_rate_limit_headers
+
+
+def test_first_sync_adopts_the_reported_remaining_budget():
+    bucket = TokenBucket()
+    now = time.monotonic()
+    bucket.sync(30000, 28750, now)
+    assert bucket.capacity == 30000
+    assert bucket.level == 28750
+    assert bucket.wait_time(1250, now) == 0.0
+
+
+def test_later_syncs_only_lower_the_level():
+    bucket = TokenBucket(100)
+    now = time.monotonic()
+    bucket.take(10, now)
+    bucket.sync(100, 50, now)
+    assert bucket.level == 50
+    bucket.sync(100, 95, now)
+    assert bucket.level == 50
+
+
+def test_learned_limit_lets_calls_through_without_waiting():
+    limiter = RateLimiter(max_wait=30)
+    limiter.update("openai", "key", parse_rate_limit_headers({
+        "x-ratelimit-limit-tokens": "30000",
+        "x-ratelimit-remaining-tokens": "28750"
+    }))
+
+    async def five_calls():
+        start = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire("openai", "key", 1250)
+        return time.monotonic() - start
+
+    assert asyncio.run(five_calls()) < 0.5
+
+
+def test_unknown_capacity_never_blocks():
+    bucket = TokenBucket()
+    now = time.monotonic()
+    bucket.sync(None, 10, now)
+    assert bucket.capacity is None
+    assert bucket.wait_time(1000, now) == 0.0
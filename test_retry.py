@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from providers.dispatcher import GenerationDispatcher
+from providers.executor import ProviderExecutor
+from providers.registry import ProviderRegistry
+from providers.retry import RetryBudget, RetryPolicy, is_transient
+
+
+class ConnectError(Exception):
+    """Stands in for httpx.ConnectError, which is matched by name"""
+
+
+def test_transient_results_and_exceptions_are_classified_alike():
+    assert is_transient({"success": False, "status_code": 503})
+    assert is_transient({"success": False, "error_type": "ConnectError"})
+    assert is_transient(ConnectError("connection refused"))
+    assert not is_transient({"success": False, "status_code": 400})
+    assert not is_transient(ValueError("bad prompt"))
+    assert not is_transient({"success": True})
+
+
+def test_policy_stops_at_max_attempts():
+    policy = RetryPolicy(max_attempts=2, base_delay=0)
+    failure = {"success": False, "status_code": 503}
+    assert policy.next_delay(1, failure) == 0
+    assert policy.next_delay(2, failure) is None
+    assert policy.gave_up == 1
+
+
+def test_budget_limits_retries_to_its_balance():
+    policy = RetryPolicy(max_attempts=5, base_delay=0, budget=RetryBudget(ratio=0.5, initial_tokens=1))
+    failure = {"success": False, "status_code": 503}
+    assert policy.next_delay(1, failure) == 0
+    assert policy.next_delay(1, failure) is None
+    assert policy.budget_exhausted == 1
+
+    policy.start()
+    policy.start()
+    assert policy.next_delay(1, failure) == 0
+
+
+class FlakyProvider:
+    failures = 0
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+
+    def generate_text(self, prompt, model, timeout=None, **kwargs):
+        if FlakyProvider.failures:
+            FlakyProvider.failures -= 1
+            raise ConnectError("connection refused")
+        return {"success": True, "text": prompt, "model": model}
+
+
+def make_dispatcher():
+    registry = ProviderRegistry({"flaky": FlakyProvider})
+    return GenerationDispatcher(registry, ProviderExecutor(), retry_policy=RetryPolicy(max_attempts=3, base_delay=0))
+
+
+def test_raised_transport_errors_are_retried():
+    FlakyProvider.failures = 2
+    dispatcher = make_dispatcher()
+    result = asyncio.run(dispatcher.generate_text("flaky", prompt="hello", model="m"))
+    assert result["success"] is True
+    assert result["retries"] == 2
+    assert dispatcher.retry_policy.recovered == 1
+
+
+def test_error_is_raised_once_retries_run_out():
+    FlakyProvider.failures = 5
+    dispatcher = make_dispatcher()
+    with pytest.raises(ConnectError):
+        asyncio.run(dispatcher.generate_text("flaky", prompt="hello", model="m"))
+    assert dispatcher.retry_policy.retries == 2
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from providers.singleflight import SingleFlight
+
+
+class Upstream:
+    """Counts calls and finishes each one when released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+        self.release = None
+
+    async def call(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"result {self.calls}"
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    upstream = Upstream()
+
+    async def run():
+        upstream.release = asyncio.Event()
+        waiters = [asyncio.ensure_future(flight.do("key", upstream.call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(run())
+    assert results == [("result 1", False), ("result 1", True), ("result 1", True)]
+    assert upstream.calls == 1
+    assert flight.stats()["followers"] == 2
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_leaves_the_call_running_for_the_others():
+    flight = SingleFlight()
+    upstream = Upstream()
+
+    async def run():
+        upstream.release = asyncio.Event()
+        leader = asyncio.ensure_future(flight.do("key", upstream.call))
+        follower = asyncio.ensure_future(flight.do("key", upstream.call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == ("result 1", True)
+    assert upstream.cancelled == 0
+
+
+def test_abandoned_call_is_cancelled_and_the_next_caller_starts_afresh():
+    flight = SingleFlight()
+    upstream = Upstream()
+
+    async def run():
+        upstream.release = asyncio.Event()
+        waiter = asyncio.ensure_future(flight.do("key", upstream.call))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert waiter.cancelled()
+        # Arrives before the cancelled call's done-callback has run
+        retry = asyncio.ensure_future(flight.do("key", upstream.call))
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await retry
+
+    assert asyncio.run(run()) == ("result 2", False)
+    assert upstream.calls == 2
+    assert upstream.cancelled == 1
+    assert flight.stats()["abandoned"] == 1
@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+from providers.timeouts import DeadlineExceededError, TimeoutManager, deadline_scope
+
+
+def make_manager(**kwargs):
+    return TimeoutManager(min_samples=10, read_floor=1.0, read_ceiling=60.0, default_read=30.0, **kwargs)
+
+
+def test_default_read_timeout_is_used_until_enough_samples():
+    timeouts = make_manager()
+    for _ in range(9):
+        timeouts.record("fake", "model-a", 1000, 0.2)
+    assert timeouts.get_timeout("fake", "model-a")[1] == 30.0
+    timeouts.record("fake", "model-a", 1000, 0.2)
+    assert timeouts.get_timeout("fake", "model-a")[1] < 30.0
+
+
+def test_timeouts_pull_the_read_timeout_back_up():
+    timeouts = make_manager()
+    for _ in range(20):
+        timeouts.record("fake", "model-a", 1000, 0.2)
+    _, read = timeouts.get_timeout("fake", "model-a")
+    assert read == 1.0
+
+    for _ in range(5):
+        timeouts.record_timeout("fake", "model-a", 1000, read, read)
+    assert timeouts.get_timeout("fake", "model-a")[1] >= read * timeouts.multiplier
+
+
+def test_request_deadline_caps_the_timeout():
+    timeouts = make_manager()
+    with deadline_scope(2.0):
+        connect, read = timeouts.get_timeout("fake", "model-a")
+    assert read <= 2.0
+    assert connect <= 2.0
+
+    with deadline_scope(0.001):
+        time.sleep(0.01)
+        with pytest.raises(DeadlineExceededError):
+            timeouts.get_timeout("fake", "model-a")
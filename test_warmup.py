@@ -0,0 +1,84 @@
+import asyncio
+import time
+from datetime import datetime
+
+from providers.huggingface import HuggingFaceProvider
+from providers.warmup import ModelWarmth, WarmupPinger
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+        self.headers = {}
+
+    def json(self):
+        return self.body
+
+
+def make_provider():
+    provider = HuggingFaceProvider(api_key="test-key")
+    provider.warmth = ModelWarmth()
+    return provider
+
+
+def test_model_warmth_follows_answers_and_cold_starts():
+    warmth = ModelWarmth(warm_ttl=60)
+    assert warmth.is_warm("model-a") is None
+    warmth.mark_loading("model-a", 20)
+    assert warmth.is_warm("model-a") is False
+    assert 0 < warmth.estimated_wait("model-a") <= 20
+    warmth.mark_warm("model-a")
+    assert warmth.is_warm("model-a") is True
+    assert warmth.estimated_wait("model-a") == 0
+    assert warmth.stats()["model-a"]["cold_starts"] == 1
+
+
+def test_loading_503_marks_the_model_and_later_calls_wait_for_it():
+    provider = make_provider()
+    assert provider._should_wait("model-a", None) is False
+
+    result = provider._text_result(FakeResponse(503, {"estimated_time": 25.0}), "model-a", time.time())
+    assert result["success"] is False
+    assert result["loading"] is True
+    assert result["estimated_time"] == 25.0
+
+    assert provider._should_wait("model-a", None) is True
+    assert provider._should_wait("model-a", False) is False
+    assert provider._text_payload("hi", 10, 0.7, wait=True)["options"] == {"wait_for_model": True}
+    connect, read = provider._wait_timeout("model-a", (2.0, 10.0))
+    assert connect == 2.0
+    assert 30.0 < read <= 35.0
+
+
+def test_successful_answer_marks_the_model_warm():
+    provider = make_provider()
+    result = provider._text_result(FakeResponse(200, [{"generated_text": "hello"}]), "model-a", time.time())
+    assert result["text"] == "hello"
+    assert provider.warmth.is_warm("model-a") is True
+
+
+class FakePingProvider:
+    def __init__(self):
+        self.pinged = []
+
+    async def aping_model(self, model, image=False):
+        self.pinged.append((model, image))
+        return model != "broken"
+
+
+def test_pinger_pings_every_model_once_per_round():
+    provider = FakePingProvider()
+    pinger = WarmupPinger(provider, ["model-a", "broken", "model-a"], ["image-model"])
+    asyncio.run(pinger.ping_all())
+    assert sorted(provider.pinged) == [("broken", False), ("image-model", True), ("model-a", False)]
+    assert pinger.stats()["pings"] == 3
+    assert pinger.stats()["failures"] == 1
+
+
+def test_pinger_only_runs_in_business_hours():
+    pinger = WarmupPinger(FakePingProvider(), ["model-a"], hours=(8, 20), days=(0, 4))
+    assert pinger.in_business_hours(datetime(2024, 1, 3, 9))
+    assert not pinger.in_business_hours(datetime(2024, 1, 3, 22))
+    assert not pinger.in_business_hours(datetime(2024, 1, 6, 9))
@@ -2,8 +2,8 @@
 Tool definitions for AI Tool Hub
 Defines available tools and their configurations
 """
-from typing import List, Dict, Any, Optional
-from agents import ModelSelector
+from typing import List, Dict, Any, Optional, Tuple
+from agents import model_selector
 
 class Tool:
     def __init__(self, 
@@ -16,7 +16,12 @@ class Tool:
                  providers: List[str],
                  ad_duration: int = 60,
                  credits: Optional[float] = None,
-                 ad_reward: float = 1.0):
+                 ad_reward: float = 1.0,
+                 hedge: bool = False,
+                 max_hedge_rate: float = 0.1,
+                 timeout: Optional[float] = None,
+                 objective: Optional[str] = None,
+                 latency_slo: Optional[float] = None):
         self.id = id
         self.name = name
         self.description = description
@@ -27,7 +32,15 @@ class Tool:
         self.ad_duration = ad_duration
         self.credits = credits if credits is not None else cost
         self.ad_reward = ad_reward
-        self.model_selector = ModelSelector()
+        # Latency-critical tools race a backup provider when the primary is slow
+        self.hedge = hedge
+        self.max_hedge_rate = max_hedge_rate
+        # Fixed read timeout in seconds, replacing the adaptive one
+        self.timeout = timeout
+        # Live-telemetry selection goal: "fastest", "cheapest" or "quality" (within latency_slo seconds)
+        self.objective = objective
+        self.latency_slo = latency_slo
+        self.model_selector = model_selector
 
     def get_info(self) -> Dict[str, Any]:
         """Return a summary of the tool's information."""
@@ -42,6 +55,11 @@ class Tool:
             "ad_duration": self.ad_duration,
             "credits": self.credits,
             "ad_reward": self.ad_reward,
+            "hedge": self.hedge,
+            "max_hedge_rate": self.max_hedge_rate,
+            "timeout": self.timeout,
+            "objective": self.objective,
+            "latency_slo": self.latency_slo,
             "recommended_providers": self.get_recommended_providers()
         }
 
@@ -64,6 +82,38 @@ class Tool:
         """Get capabilities of a specific model"""
         return self.model_selector.get_model_capabilities(model_id)
 
+    def get_fallback_candidates(self,
+                                provider: str,
+                                primary_model: str,
+                                task_type: Optional[str] = None,
+                                context_length: Optional[int] = None) -> List[Tuple[str, str]]:
+        """Get (provider, model) pairs to fail over to when the primary choice is unavailable
+
+        The provider's configured fallback model comes first, followed by the
+        selected model of each other provider this tool supports.
+        """
+        tool_type = self.id.replace("-", "_")
+        candidates = []
+
+        fallback_model = self.model_selector.get_fallback_model(tool_type, provider)
+        if fallback_model and fallback_model != primary_model:
+            candidates.append((provider, fallback_model))
+
+        for alternative in self.providers:
+            if alternative == provider:
+                continue
+            model_id, _ = self.model_selector.select_model(
+                tool_type=tool_type,
+                provider=alternative,
+                task_type=task_type,
+                context_length=context_length,
+                objective=self.objective,
+                latency_slo=self.latency_slo
+            )
+            candidates.append((alternative, model_id))
+
+        return candidates
+
 # Define the tools with associated prompts
 TOOLS = [
     Tool(
@@ -112,7 +162,9 @@ TOOLS = [
         providers=["openai", "deepseek", "openrouter"],
         ad_duration=60,
         credits=2.0,
-        ad_reward=1
+        ad_reward=1,
+        objective="quality",
+        latency_slo=20.0
     ),
     Tool(
         id="ai-copywriter",
@@ -127,7 +179,9 @@ TOOLS = [
         providers=["huggingface", "openrouter", "openai"],
         ad_duration=60,
         credits=0.20,
-        ad_reward=1
+        ad_reward=1,
+        hedge=True,
+        objective="fastest"
     ),
     Tool(
         id="email-generator",
@@ -142,7 +196,9 @@ TOOLS = [
         providers=["huggingface", "deepseek", "openai"],
         ad_duration=60,
         credits=0.18,
-        ad_reward=1
+        ad_reward=1,
+        hedge=True,
+        objective="fastest"
     ),
     Tool(
         id="blog-writer",
@@ -157,7 +213,9 @@ TOOLS = [
         providers=["huggingface", "deepseek", "openai"],
         ad_duration=60,
         credits=0.30,
-        ad_reward=1
+        ad_reward=1,
+        objective="quality",
+        latency_slo=30.0
     ),
     Tool(
         id="resume-builder",
@@ -232,7 +290,8 @@ TOOLS = [
         providers=["huggingface", "deepseek"],
         ad_duration=60,
         credits=0.18,
-        ad_reward=1
+        ad_reward=1,
+        objective="fastest"
     ),
     Tool(
         id="ai-image-generator",